@@ -17,8 +17,26 @@ please see
 Note: this file is for support purposes only, and is not part of your
 submission.
 """
-from algorithms import PushyPassenger, RandomAlgorithm, ShortSighted, RandomArrivals, FileArrivals
+import os
+import queue
+import random
+
+import pytest
+
+from algorithms import PushyPassenger, RandomAlgorithm, ShortSighted, RandomArrivals, FileArrivals, \
+    StreamingFileArrivals
+from checkpoint import load_checkpoint, save_checkpoint
+from entities import Person, Elevator
+from floors import FloorQueues
 from simulation import Simulation
+from startup import measure_import_time
+from profiling import MemoryProfiler, StageProfiler
+from recorder import RoundRecorder, read_binary
+from renderer import SnapshotPublisher, draw_snapshot, screen_size
+from replay import LogWriter, RecordingAlgorithm, RecordingArrivals, \
+    ReplayAlgorithm, ReplayArrivals, diff_logs, read_log
+from stats import WaitStats
+from sweep import MOVING_ALGORITHMS, make_grid, run_sweep
 
 
 def test_random_arrival_generator_zero() -> None:
@@ -52,6 +70,63 @@ def test_random_arrival_generator_zero() -> None:
             assert p.start != p.target
 
 
+def test_seeded_random_arrivals_are_reproducible() -> None:
+    """Test that random arrival generators with the same seed generate the
+    same people.
+    """
+    def floors(arrivals):
+        return {floor: [(p.start, p.target) for p in people]
+                for floor, people in arrivals.items()}
+
+    first = RandomArrivals(10, 20, seed=148)
+    second = RandomArrivals(10, 20, seed=148)
+    for round_num in range(3):
+        assert floors(first.generate(round_num)) == \
+            floors(second.generate(round_num))
+
+    # Without a seed, arrivals follow the random module's seed.
+    random.seed(148)
+    first = RandomArrivals(10, 20)
+    random.seed(148)
+    second = RandomArrivals(10, 20)
+    assert floors(first.generate(0)) == floors(second.generate(0))
+
+    pytest.importorskip('numpy')
+    import generators
+    blocked = generators.VectorRandomArrivals(10, 20, seed=148,
+                                              block_rounds=4)
+    again = generators.VectorRandomArrivals(10, 20, seed=148, block_rounds=4)
+    for round_num in [5, 0, 5, 9]:
+        arrivals = floors(blocked.generate(round_num))
+        assert arrivals == floors(again.generate(round_num))
+        assert sum(len(people) for people in arrivals.values()) == 20
+        for floor, people in arrivals.items():
+            for start, target in people:
+                assert start == floor
+                assert 1 <= target <= 10 and target != start
+
+
+def test_poisson_arrivals_follow_profiles() -> None:
+    """Test that Poisson arrivals in an up-peak all start at the lobby and
+    travel to other floors, reproducibly.
+    """
+    pytest.importorskip('numpy')
+    import generators
+    profiles = [generators.up_peak(10, peak_round=50, width=20,
+                                   peak_rate=30)]
+    first = generators.PoissonArrivals(10, profiles, seed=7)
+    second = generators.PoissonArrivals(10, profiles, seed=7,
+                                        block_rounds=first.block_rounds)
+    starts, targets = first.generate_arrays(50)
+    again = second.generate_arrays(50)
+    assert starts.tolist() == again[0].tolist()
+    assert targets.tolist() == again[1].tolist()
+
+    assert len(starts) > 0
+    assert (starts == 1).all()
+    assert ((targets >= 2) & (targets <= 10)).all()
+
+
 def test_file_arrival_generator() -> None:
     """Test the CSV arrival generator for the given sample_arrivals file.
     """
@@ -89,6 +164,188 @@ def test_file_arrival_generator() -> None:
             assert len(people) == 0
 
 
+def test_streaming_file_arrivals_match_file_arrivals() -> None:
+    """Test that the streaming CSV generator produces the same arrivals as
+    FileArrivals, round by round.
+    """
+    file_generator = FileArrivals(5, 'sample_arrivals.csv')
+    stream_generator = StreamingFileArrivals(5, 'sample_arrivals.csv')
+    for round_num in range(8):
+        expected = file_generator.generate(round_num)
+        actual = stream_generator.generate(round_num)
+        assert {floor: [(p.start, p.target) for p in people]
+                for floor, people in actual.items()} == \
+            {floor: [(p.start, p.target) for p in people]
+             for floor, people in expected.items() if people}
+
+
+def test_streaming_file_arrivals_rejects_out_of_order(tmp_path) -> None:
+    """Test that lines out of order by more than the reorder window are
+    rejected, and lines within it are reordered.
+    """
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0, 1, 2\n2, 3, 4\n1, 2, 3\n')
+
+    reordered = StreamingFileArrivals(5, str(trace), reorder_window=1)
+    assert [sorted(reordered.generate(r)) for r in range(3)] == \
+        [[1], [2], [3]]
+
+    strict = StreamingFileArrivals(5, str(trace))
+    with pytest.raises(ValueError):
+        for round_num in range(3):
+            strict.generate(round_num)
+
+
+def test_mapped_arrivals_match_file_arrivals(tmp_path) -> None:
+    """Test that a binary trace converted from sample_arrivals.csv produces
+    the same arrivals as FileArrivals.
+    """
+    pytest.importorskip('numpy')
+    import arrival_trace
+    trace = str(tmp_path / 'sample.trace')
+    assert arrival_trace.convert_csv('sample_arrivals.csv', trace) == 4
+
+    file_generator = FileArrivals(5, 'sample_arrivals.csv')
+    mapped_generator = arrival_trace.MappedArrivals(5, trace)
+    for round_num in range(8):
+        expected = file_generator.generate(round_num)
+        actual = mapped_generator.generate(round_num)
+        assert {floor: [(p.start, p.target) for p in people]
+                for floor, people in actual.items()} == \
+            {floor: [(p.start, p.target) for p in people]
+             for floor, people in expected.items() if people}
+
+
+def test_fast_forward_skips_idle_rounds(tmp_path) -> None:
+    """Test that fast-forwarding over the idle rounds of a sparse trace
+    gives the same statistics as simulating every round.
+    """
+    filename = str(tmp_path / 'sparse.csv')
+    with open(filename, 'w') as csv_file:
+        csv_file.write('2, 1, 4, 5, 3\n40, 3, 1\n41\n5000, 5, 2, 2, 5\n')
+    generators = [lambda: FileArrivals(5, filename),
+                  lambda: StreamingFileArrivals(5, filename)]
+    for make_generator in generators:
+        for algorithm in [PushyPassenger, ShortSighted]:
+            results = []
+            rounds_simulated = []
+            for fast_forward in [False, True]:
+                config = {
+                    'num_floors': 5,
+                    'num_elevators': 2,
+                    'elevator_capacity': 1,
+                    'arrival_generator': make_generator(),
+                    'moving_algorithm': algorithm(),
+                    'visualize': False,
+                    'fast_forward': fast_forward
+                }
+                sim = Simulation(config)
+                profiler = StageProfiler()
+                sim.add_stage_hook(profiler)
+                results.append(sim.run(6000))
+                rounds_simulated.append(profiler.calls['arrivals'])
+            assert results[0] == results[1]
+            assert results[1]['num_iterations'] == 6000
+            assert results[1]['people_completed'] == 5
+            assert rounds_simulated[0] == 6000
+            assert rounds_simulated[1] < 100
+
+
+def test_checkpoint_resumes_run(tmp_path) -> None:
+    """Test that a simulation restored from a checkpoint continues exactly
+    as the original does, and that forks of a checkpoint are independent.
+    """
+    filename = str(tmp_path / 'arrivals.csv')
+    with open(filename, 'w') as csv_file:
+        for round_num in range(0, 60, 3):
+            csv_file.write(f'{round_num}, 1, 5, 4, 2, 2, 3\n')
+    generators = [lambda: RandomArrivals(5, 3),
+                  lambda: StreamingFileArrivals(5, filename)]
+    for make_generator in generators:
+        for algorithm in [RandomAlgorithm, ShortSighted]:
+            random.seed(148)
+            config = {
+                'num_floors': 5,
+                'num_elevators': 2,
+                'elevator_capacity': 2,
+                'arrival_generator': make_generator(),
+                'moving_algorithm': algorithm(),
+                'visualize': False
+            }
+            sim = Simulation(config)
+            sim.run(15)
+            checkpoint_file = str(tmp_path / 'sim.checkpoint')
+            save_checkpoint(sim, checkpoint_file)
+            expected = sim.run(25)
+
+            state = random.getstate()
+            load_checkpoint(checkpoint_file)
+            assert random.getstate() == state
+
+            first = load_checkpoint(checkpoint_file, restore_random=True)
+            assert first.run(25) == expected
+            second = load_checkpoint(checkpoint_file, restore_random=True)
+            assert second.num_rounds == 15
+            assert second.run(25) == expected
+            assert expected['num_iterations'] == 40
+
+
+def test_replay_matches_recorded_run(tmp_path) -> None:
+    """Test that replaying a recorded run of random arrivals and moves gives
+    the same statistics, with or without fast-forwarding, and that diff_logs
+    finds where two runs differ.
+    """
+    logs = []
+    results = []
+    for seed in [1, 2]:
+        random.seed(seed)
+        filename = str(tmp_path / f'run{seed}.log')
+        with LogWriter(filename, 6, flush_records=7) as log:
+            config = {
+                'num_floors': 6,
+                'num_elevators': 3,
+                'elevator_capacity': 2,
+                'arrival_generator': RecordingArrivals(
+                    RandomArrivals(6, 2), log),
+                'moving_algorithm': RecordingAlgorithm(RandomAlgorithm(),
+                                                       log),
+                'visualize': False
+            }
+            results.append(Simulation(config).run(50))
+        logs.append(read_log(filename))
+
+    replay_log = logs[0]
+    config = {
+        'num_floors': 6,
+        'num_elevators': 3,
+        'elevator_capacity': 2,
+        'arrival_generator': ReplayArrivals(replay_log),
+        'moving_algorithm': ReplayAlgorithm(replay_log),
+        'visualize': False
+    }
+    assert Simulation(config).run(50) == results[0]
+    assert diff_logs(logs[0], logs[0]) == []
+    assert diff_logs(logs[0], logs[1])[0] == (0, 'arrivals')
+
+    # Random moves in an empty building must not be fast-forwarded over.
+    random.seed(3)
+    sparse = str(tmp_path / 'sparse.csv')
+    with open(sparse, 'w') as csv_file:
+        csv_file.write('2, 1, 4, 5, 3\n40, 3, 1\n90, 6, 2\n')
+    filename = str(tmp_path / 'sparse.log')
+    with LogWriter(filename, 6) as log:
+        config['arrival_generator'] = RecordingArrivals(
+            FileArrivals(6, sparse), log)
+        config['moving_algorithm'] = RecordingAlgorithm(RandomAlgorithm(),
+                                                        log)
+        expected = Simulation(config).run(150)
+    sparse_log = read_log(filename)
+    config['arrival_generator'] = ReplayArrivals(sparse_log)
+    config['moving_algorithm'] = ReplayAlgorithm(sparse_log)
+    config['fast_forward'] = True
+    assert Simulation(config).run(150) == expected
+
+
 def test_random_moving_algorithm() -> None:
     """Test the random moving algorithm.
 
@@ -203,6 +460,522 @@ def test_short_sighted_moving_algorithm() -> None:
     assert results['avg_time'] == 4
 
 
+def test_wait_stats_are_exact_for_short_waits() -> None:
+    """Test that WaitStats reports exact statistics for wait times below
+    its first shared bucket, and that merged summaries agree.
+    """
+    waits = [(7 * i) % 100 for i in range(1000)]
+    stats = WaitStats()
+    for wait in waits:
+        stats.add(wait)
+    ranked = sorted(waits)
+    assert stats.quantile(0.5) == ranked[499]
+    assert stats.quantile(0.9) == ranked[899]
+    assert stats.quantile(0.99) == ranked[989]
+    mean = sum(waits) / len(waits)
+    variance = sum((wait - mean) ** 2 for wait in waits) / len(waits)
+    assert stats.std() == pytest.approx(variance ** 0.5)
+
+    merged = WaitStats()
+    merged.add_counts([500, 20000], [2, 1])
+    merged.merge(stats)
+    assert merged.count == 1003
+    assert merged.maximum == 20000
+    assert 500 <= merged.quantile(0.999) <= 500 * (1 + 1 / 64)
+
+
+def test_wait_time_of_unfinished_people(tmp_path) -> None:
+    """Test that people still waiting or riding at the end of a run have
+    waited through every round since they arrived, including the last.
+    """
+    filename = str(tmp_path / 'two.csv')
+    with open(filename, 'w') as csv_file:
+        csv_file.write('0, 1, 5, 1, 5\n')
+    config = {
+        'num_floors': 5,
+        'num_elevators': 1,
+        'elevator_capacity': 1,
+        'arrival_generator': FileArrivals(5, filename),
+        'moving_algorithm': PushyPassenger(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    sim.run(3)
+    rider = sim.elevators[0].passengers[0]
+    waiter = sim.waiting[1][0]
+    assert (rider.wait_time, waiter.wait_time) == (3, 3)
+    sim.run(1)
+    assert waiter.wait_time == 4
+
+
+def test_completed_people_are_not_kept() -> None:
+    """Test that a simulation only keeps completed people when asked to,
+    and reports the same statistics either way.
+    """
+    results = []
+    for record in [False, True]:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 1,
+            'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False,
+            'record_completed': record
+        }
+        sim = Simulation(config)
+        results.append(sim.run(10))
+        assert len(sim.completed) == (3 if record else 0)
+    assert results[0] == results[1]
+    assert results[0]['p50_time'] == 3
+    assert results[0]['p99_time'] == 6
+
+
+def test_round_recorder(tmp_path) -> None:
+    """Test that a RoundRecorder's per-round counts add up to a run's
+    statistics, and that its binary file holds the same rows.
+    """
+    filename = str(tmp_path / 'rounds.bin')
+    with RoundRecorder(filename, binary=True, flush_rounds=4) as recorder:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 1,
+            'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False,
+            'recorder': RoundRecorder()
+        }
+        results = Simulation(config).run(10)
+        memory = config['recorder']
+        config['arrival_generator'] = FileArrivals(5, 'sample_arrivals.csv')
+        config['moving_algorithm'] = ShortSighted()
+        config['recorder'] = recorder
+        Simulation(config).run(10)
+
+    assert memory.num_rows() == 10
+    assert memory.column('round') == list(range(10))
+    assert sum(memory.column('arrivals')) == results['total_people']
+    assert sum(memory.column('completions')) == results['people_completed']
+    assert memory.column('floor_1')[:3] == [1, 2, 3]
+    columns, rows = read_binary(filename)
+    assert columns == memory.columns
+    assert rows == memory.rows
+
+
+class _SlottedAlgorithm:
+    """A moving algorithm whose instances have no attribute dictionary."""
+    __slots__ = ('algorithm',)
+
+    def __init__(self) -> None:
+        self.algorithm = ShortSighted()
+
+    def move_elevators(self, elevators, waiting, max_floor):
+        return self.algorithm.move_elevators(elevators, waiting, max_floor)
+
+
+def test_stage_hooks() -> None:
+    """Test that stage hooks see every stage of every round, without
+    changing the simulation or its moving algorithm.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 1,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    profiler = StageProfiler()
+    finished = []
+    sim.add_stage_hook(profiler)
+    sim.add_stage_hook(lambda stage, round_num, seconds:
+                       finished.append((stage, round_num)))
+    results = sim.run(10)
+
+    assert results['people_completed'] == 3
+    report = profiler.report()
+    assert set(report) == {'arrivals', 'leaving', 'boarding', 'moving',
+                           'algorithm'}
+    assert all(row['calls'] == 10 for row in report.values())
+    assert report['moving']['total'] >= report['algorithm']['total']
+    assert finished[:5] == [('arrivals', 0), ('leaving', 0), ('boarding', 0),
+                            ('algorithm', 0), ('moving', 0)]
+    assert '_move_elevators' not in vars(sim)
+    assert 'move_elevators' not in vars(sim.moving_algorithm)
+
+    # A moving algorithm that cannot be given attributes is timed too.
+    config['arrival_generator'] = FileArrivals(5, 'sample_arrivals.csv')
+    config['moving_algorithm'] = _SlottedAlgorithm()
+    sim = Simulation(config)
+    profiler = StageProfiler()
+    sim.add_stage_hook(profiler)
+    assert sim.run(10) == results
+    assert profiler.calls['algorithm'] == 10
+
+
+def test_memory_profiler_report(tmp_path) -> None:
+    """Test that MemoryProfiler writes a report covering every stage and
+    round, and finds where arrivals allocate memory.
+    """
+    import json
+    import tracemalloc
+    config = {
+        'num_floors': 10,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'arrival_generator': RandomArrivals(10, 20, seed=0),
+        'moving_algorithm': PushyPassenger(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    filename = str(tmp_path / 'memory.json')
+    sim.add_stage_hook(MemoryProfiler(filename, snapshot_rounds=5))
+    sim.run(20)
+    assert not tracemalloc.is_tracing()
+
+    with open(filename) as report_file:
+        report = json.load(report_file)
+    assert set(report['stages']) == {'arrivals', 'leaving', 'boarding',
+                                     'moving', 'algorithm'}
+    assert report['stages']['arrivals']['allocated_bytes'] > 0
+    assert len(report['round_peaks']) == 20
+    assert report['peak_bytes'] == max(report['round_peaks'])
+    assert any(site['file'].endswith('algorithms.py')
+               for site in report['top_sites']['arrivals'])
+
+
+def test_benchmark_flags_regressions() -> None:
+    """Test that a small benchmark runs every case, and that comparing it
+    with a faster, leaner baseline reports each case as a regression.
+    """
+    import json
+    pytest.importorskip('numpy')
+    import benchmark
+    cases = benchmark.make_cases([(5, 2)], [2], ['pushy'], ['random', 'trace'],
+                                 ['objects'], 2)
+    results = benchmark.run_benchmarks(cases, 10, repeat=1)
+    assert [case['name'] for case in results['cases']] == [
+        '5x2/rate=2/pushy/random/objects',
+        '5x2/rate=2/short_sighted/trace/objects']
+    assert all(case['rounds_per_second'] > 0 and case['peak_bytes'] > 0
+               for case in results['cases'])
+
+    assert benchmark.compare(results, results, 0.1, 0.1) == []
+    baseline = {'cases': [dict(case,
+                               rounds_per_second=case['rounds_per_second'] * 2,
+                               peak_bytes=case['peak_bytes'] // 2)
+                          for case in results['cases']]}
+    assert len(benchmark.compare(results, baseline, 0.1, 0.1)) == 4
+    assert len(benchmark.compare(results, baseline, None, 0.1)) == 2
+
+    # The committed baseline covers the default matrix.
+    with open(benchmark.BASELINE) as baseline_file:
+        saved = json.load(baseline_file)
+    default = benchmark.make_cases(benchmark.SIZES, benchmark.RATES,
+                                   list(MOVING_ALGORITHMS),
+                                   benchmark.GENERATORS, benchmark.ENGINES, 10)
+    assert [case['name'] for case in saved['cases']] == \
+        [case['name'] for case in default]
+
+
+def test_sweep_is_independent_of_process_count() -> None:
+    """Test that a parameter sweep gives the same table whether it runs in
+    this process or in a pool of workers.
+    """
+    points = make_grid([5, 8], [2], [1, 2], ['random', 'short_sighted'],
+                       ['random:2'], [0, 1])
+    assert len(points) == 16
+
+    def table(rows):
+        return sorted(tuple(sorted(row.items())) for row in rows)
+
+    inline = table(run_sweep(points, 20, processes=1))
+    pooled = table(run_sweep(points, 20, processes=2))
+    assert inline == pooled
+
+
+def test_entities_are_headless() -> None:
+    """Test that people and elevators carry no sprite until visualized.
+    """
+    person = Person(1, 3)
+    elevator = Elevator(2)
+    assert person.sprite is None
+    assert elevator.sprite is None
+
+    # Entities use __slots__, so they have no per-instance dictionary.
+    assert not hasattr(person, '__dict__')
+    assert not hasattr(elevator, '__dict__')
+
+
+def test_passengers_are_read_only() -> None:
+    """Test that changing an elevator's passengers directly fails rather
+    than being ignored.
+    """
+    elevator = Elevator(2)
+    elevator.board(Person(1, 3))
+    with pytest.raises(AttributeError):
+        elevator.passengers.append(Person(1, 4))
+    with pytest.raises(AttributeError):
+        elevator.passengers = []
+    with pytest.raises(TypeError):
+        elevator.passengers += [Person(1, 4)]
+    assert elevator.num_passengers() == len(elevator.passengers) == 1
+
+
+def test_floor_queues_are_fifo() -> None:
+    """Test that people board in the order they arrived on each floor.
+    """
+    waiting = FloorQueues(100)
+    first, second, other = Person(7, 1), Person(7, 2), Person(3, 1)
+    waiting.enqueue(7, first)
+    waiting.enqueue(3, other)
+    waiting.enqueue(7, second)
+
+    assert waiting.count(7) == 2
+    assert waiting.total() == 3
+    assert list(waiting[7]) == [first, second]
+    assert not waiting[50]
+    assert len(waiting) == 100
+
+    assert waiting.dequeue(7) is first
+    assert waiting.dequeue(7) is second
+    assert waiting.count(7) == 0
+    assert sorted(waiting.occupied()) == [3]
+
+
+class _ListPushyPassenger(PushyPassenger):
+    """PushyPassenger written against the dictionary of lists that
+    Simulation.waiting used to be.
+    """
+
+    def move_elevators(self, elevators, waiting, max_floor):
+        lowest = None
+        for key in waiting:
+            if not waiting[key] == []:
+                lowest = key
+                break
+        for elevator in elevators:
+            elevator.target_floor = 0
+            if elevator.num_passengers() == 0:
+                if lowest is not None:
+                    elevator.target_floor = lowest
+            else:
+                elevator.target_floor = elevator.first_passenger().target
+        return self.choose_direction(elevators)
+
+
+def test_algorithms_accept_plain_dictionaries() -> None:
+    """Test that the moving algorithms decide the same for a plain
+    dictionary of waiting people as for FloorQueues.
+    """
+    for algorithm in [PushyPassenger, ShortSighted]:
+        decisions = []
+        for plain in [True, False]:
+            elevators = [Elevator(2), Elevator(2)]
+            elevators[1].current_floor = 4
+            queues = FloorQueues(5)
+            for person in [Person(2, 1), Person(5, 1)]:
+                queues.enqueue(person.start, person)
+            if plain:
+                waiting = {floor: list(queues[floor]) for floor in range(1, 6)}
+            else:
+                waiting = queues
+            decisions.append(algorithm().move_elevators(elevators, waiting, 5))
+        assert decisions[0] == decisions[1]
+
+
+def test_floor_queues_work_like_lists() -> None:
+    """Test that a moving algorithm comparing floor queues with lists
+    behaves as it did when they were lists.
+    """
+    waiting = FloorQueues(5)
+    person = Person(2, 4)
+    waiting.enqueue(2, person)
+    assert waiting[1] == [] and [] == waiting[1]
+    assert waiting[2] != [] and waiting[2] == [person]
+    assert waiting[2][:1] == [person]
+
+    results = []
+    for algorithm in [PushyPassenger(), _ListPushyPassenger()]:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 1,
+            'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+            'moving_algorithm': algorithm,
+            'visualize': False
+        }
+        results.append(Simulation(config).run(15))
+    assert results[0] == results[1]
+    assert results[0]['people_completed'] > 0
+
+
+def test_headless_import_skips_pygame() -> None:
+    """Test that importing the simulation in a new process leaves pygame
+    unloaded.
+    """
+    stats = measure_import_time('simulation')
+    assert stats['error'] == ''
+    assert not stats['pygame_loaded']
+
+
+def test_visualizer_batches_animations(tmp_path, monkeypatch) -> None:
+    """Test that everybody boarding or leaving in a round is animated
+    together, on a dummy display.
+    """
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    import visualizer
+    monkeypatch.setattr(visualizer, 'FPS', 0)
+    filename = str(tmp_path / 'crowd.csv')
+    with open(filename, 'w') as csv_file:
+        csv_file.write('0' + ', 1, 3' * 10 + '\n')
+    config = {
+        'num_floors': 3,
+        'num_elevators': 1,
+        'elevator_capacity': 10,
+        'arrival_generator': FileArrivals(3, filename),
+        'moving_algorithm': PushyPassenger(),
+        'visualize': True
+    }
+    sim = Simulation(config)
+    renders = []
+    render = sim.visualizer.render
+    monkeypatch.setattr(sim.visualizer, 'render',
+                        lambda: renders.append(render()))
+    monkeypatch.setattr(sim.visualizer, 'wait', lambda wait_time: None)
+    results = sim.run(3)
+    assert results['people_completed'] == 10
+    # Three rounds of elevator moves, plus one boarding and one leaving
+    # animation for all ten people.
+    assert len(renders) < 6 * visualizer.ANIMATION_FRAMES
+
+
+def test_snapshot_publisher_drops_frames(monkeypatch) -> None:
+    """Test that a simulation publishing snapshots to a full queue drops
+    them instead of waiting, and that the final snapshot is still sent.
+    """
+    snapshot_queue = queue.Queue(2)
+    publisher = SnapshotPublisher(snapshot_queue)
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False,
+        'publisher': publisher
+    }
+    results = Simulation(config).run(20)
+    assert (publisher.published, publisher.dropped) == (2, 18)
+    assert snapshot_queue.get()[0] == 0
+    snapshot_queue.get()
+
+    publisher.close()
+    final = snapshot_queue.get()
+    assert snapshot_queue.get() is None
+    round_num, num_floors, waiting, elevators, completed = final
+    assert (round_num, num_floors, completed) == \
+        (19, 5, results['people_completed'])
+    assert len(elevators) == 2
+
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame = pytest.importorskip('pygame')
+    surface = pygame.Surface(screen_size(num_floors))
+    draw_snapshot(surface, final)
+
+
+def test_export_frames_from_replay_log(tmp_path, monkeypatch) -> None:
+    """Test that a recorded run is exported as one PNG frame per round by
+    several worker processes, without a display.
+    """
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame = pytest.importorskip('pygame')
+    import export_frames
+    log_file = str(tmp_path / 'run.log')
+    with LogWriter(log_file, 5) as log:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'arrival_generator': RecordingArrivals(
+                FileArrivals(5, 'sample_arrivals.csv'), log),
+            'moving_algorithm': RecordingAlgorithm(ShortSighted(), log),
+            'visualize': False
+        }
+        Simulation(config).run(12)
+
+    snapshots = export_frames.replay_snapshots(log_file, 3, 12)
+    assert [snapshot[0] for snapshot in snapshots] == list(range(12))
+    frames = str(tmp_path / 'frames')
+    assert export_frames.export_frames(snapshots, frames, processes=2,
+                                       chunk_rounds=5) == 12
+    assert sorted(os.listdir(frames))[-1] == 'frame_000011.png'
+    image = pygame.image.load(os.path.join(frames, 'frame_000011.png'))
+    assert image.get_size() == screen_size(5)
+
+
+def test_array_engine_matches_simulation() -> None:
+    """Test that ArraySimulation reports the same statistics as Simulation
+    for the deterministic moving algorithms.
+    """
+    pytest.importorskip('numpy')
+    import engine
+    for algorithm in [PushyPassenger, ShortSighted]:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 1,
+            'num_people_per_round': 2,
+            'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+            'moving_algorithm': algorithm(),
+            'visualize': False
+        }
+        expected = Simulation(config).run(10)
+        config['arrival_generator'] = FileArrivals(5, 'sample_arrivals.csv')
+        assert engine.ArraySimulation(config).run(10) == expected
+
+
+def test_replicas_match_array_engine() -> None:
+    """Test that each replica of a ReplicaSimulation reports the same
+    statistics as an ArraySimulation with the same arrivals.
+    """
+    pytest.importorskip('numpy')
+    import engine
+    import replicas
+    from generators import VectorRandomArrivals
+    for algorithm in [PushyPassenger, ShortSighted]:
+        config = {
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'moving_algorithm': algorithm(),
+            'visualize': False
+        }
+        generators = [VectorRandomArrivals(8, 3, seed) for seed in range(5)]
+        stats = replicas.ReplicaSimulation(config, generators).run(40)
+        for seed in range(5):
+            config['arrival_generator'] = VectorRandomArrivals(8, 3, seed)
+            assert engine.ArraySimulation(config).run(40) == stats[seed]
+
+    # A single replica moves at random exactly as an ArraySimulation with
+    # the same seed does.
+    config['moving_algorithm'] = RandomAlgorithm()
+    for seed in range(3):
+        config['seed'] = seed
+        generator = VectorRandomArrivals(8, 3, seed)
+        replica = replicas.ReplicaSimulation(config, [generator])
+        config['arrival_generator'] = VectorRandomArrivals(8, 3, seed)
+        assert replica.run(40) == [engine.ArraySimulation(config).run(40)]
+
+    summary = replicas.confidence_intervals(stats)
+    mean, low, high = summary['avg_time']
+    assert low <= mean <= high
+    assert summary['total_people'] == (120, 120, 120)
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main(['a1_sample_test.py'])
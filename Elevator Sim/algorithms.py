@@ -17,11 +17,15 @@ See the 'Arrival generation algorithms' and 'Elevator moving algorithsm'
 sections of the assignment handout for a complete description of each algorithm
 you are expected to implement in this file.
 """
+import bisect
 import csv
 from enum import Enum
+import heapq
+import itertools
 import random
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
 from entities import Person, Elevator
+from floors import FloorQueues
 
 
 ###############################################################################
@@ -64,6 +68,16 @@ class ArrivalGenerator:
         """
         raise NotImplementedError
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after <round_num> in which people
+        may arrive, or None if nobody will arrive in any of them.
+
+        Simulations running with fast_forward use this to skip idle rounds.
+        This default cannot tell, so it returns <round_num>, and no rounds
+        are ever skipped; subclasses that know their arrivals override it.
+        """
+        return round_num
+
 
 class RandomArrivals(ArrivalGenerator):
     """Generate a fixed number of random people each round.
@@ -75,17 +89,32 @@ class RandomArrivals(ArrivalGenerator):
     sure to keep the header the same!
 
     Hint: look up the 'sample' function from random.
+
+    === Attributes ===
+    rng: the random number generator used to draw people; pass a seed to
+         the initializer to make the arrivals reproducible
+
+    Without a seed, rng is seeded from the random module, so calling
+    random.seed before creating the generator still makes its arrivals
+    reproducible, as it did when people were drawn with the random module
+    itself. The arrivals differ from those older versions drew, though.
     """
-    tom: Person
+    rng: random.Random
 
-    def __init__(self, max_floor: int, num_people: Optional[int]) -> None:
+    def __init__(self, max_floor: int, num_people: Optional[int],
+                 seed: Optional[int] = None) -> None:
         """Initialize a new ArrivalGenerator.
 
+        If <seed> is None, the generator is seeded from the random module.
+
                Preconditions:
                    max_floor >= 2
                    num_people is None or num_people >= 0
                """
         ArrivalGenerator.__init__(self, max_floor, num_people)
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.rng = random.Random(seed)
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Return the new arrivals for the simulation at the given round.
@@ -99,28 +128,34 @@ class RandomArrivals(ArrivalGenerator):
         You can choose whether to include floors where no people arrived.
         """
         newcomers = {}
-        existing_floors = []
-        count = 0
-        while not count == self.num_people:
-            rand1 = random.randint(1, self.max_floor)
-            if count == 0:
-                newcomers[rand1] = []
-                existing_floors.append(rand1)
-            elif rand1 not in existing_floors:
-                newcomers[rand1] = []
-                existing_floors.append(rand1)
-            rand2 = random.randint(1, self.max_floor)
-            while rand1 == rand2:
-                rand2 = random.randint(1, self.max_floor)
-            newcomers[rand1].append(Person(rand1, rand2))
-            count += 1
+        for _ in range(self.num_people or 0):
+            start = self.rng.randint(1, self.max_floor)
+            # Draw from the other max_floor - 1 floors directly, instead of
+            # drawing again until the target differs from the start.
+            target = self.rng.randint(1, self.max_floor - 1)
+            if target >= start:
+                target += 1
+            if start in newcomers:
+                newcomers[start].append(Person(start, target))
+            else:
+                newcomers[start] = [Person(start, target)]
         return newcomers
 
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return <round_num> if people arrive every round, or None if
+        nobody ever arrives.
+        """
+        return round_num if self.num_people else None
+
 
 class FileArrivals(ArrivalGenerator):
     """Generate arrivals from a CSV file.
+
+    === Private Attributes ===
+    _round_list: the rounds listed in the file, in increasing order
     """
     rounds: Dict[int, List[int]]
+    _round_list: List[int]
 
     def __init__(self, max_floor: int, filename: str) -> None:
         """Initialize a new FileArrivals algorithm from the given file.
@@ -144,6 +179,7 @@ class FileArrivals(ArrivalGenerator):
                 for char in line:
                     ints.append(int(char.strip()))
                 self.rounds[ints.pop(0)] = ints
+        self._round_list = sorted(self.rounds)
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Return the new arrivals for the simulation at the given round.
@@ -156,22 +192,186 @@ class FileArrivals(ArrivalGenerator):
         You can choose whether to include floors where no people arrived.
         """
         newcomers = {}
-        keys = self.rounds.keys()
-        if round_num in keys:
-            while not len(self.rounds[round_num]) == 0:
-                # print(len(self.rounds[round_num]))
-                hold1 = self.rounds[round_num].pop(0)
-                hold2 = self.rounds[round_num].pop(0)
-                print(hold1)
-                print(hold2)
-                if hold1 in newcomers.keys():
-                    newcomers[hold1].append(Person(hold1, hold2))
+        floors = self.rounds.pop(round_num, [])
+        for i in range(0, len(floors), 2):
+            start, target = floors[i], floors[i + 1]
+            if start in newcomers:
+                newcomers[start].append(Person(start, target))
+            else:
+                newcomers[start] = [Person(start, target)]
+        return newcomers
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after <round_num> listed in the
+        file, or None if there is none.
+        """
+        index = bisect.bisect_left(self._round_list, round_num)
+        if index == len(self._round_list):
+            return None
+        return self._round_list[index]
+
+
+class StreamingFileArrivals(ArrivalGenerator):
+    """Generate arrivals from a CSV file, reading it as the simulation runs.
+
+    The file has the same format as for FileArrivals, but is never loaded
+    all at once: only the lines for rounds that have not been generated yet,
+    and are within <reorder_window> rounds of the latest round read, are kept
+    in memory.
+
+    Lines should be in increasing order of round number, although several
+    lines may share a round. A line may appear after lines for up to
+    <reorder_window> later rounds; a line that is out of order by more than
+    that, or that is for a round that was already generated, raises a
+    ValueError.
+
+    Rounds must be generated in increasing order. Lines for rounds that are
+    skipped over are discarded.
+
+    A StreamingFileArrivals can be pickled part way through its file: the
+    open file is left out, and is reopened at the same line when the next
+    round is generated.
+
+    === Attributes ===
+    filename: the CSV file to read arrivals from
+    reorder_window: how many rounds out of order a line may be
+
+    === Private Attributes ===
+    _file: the open file, or None if it has not been opened yet or has been
+           read to the end
+    _lines: the CSV reader for _file
+    _finished: whether the whole file has been read
+    _pending: a heap of (round, line number, floors) for lines that have
+              been read but not generated yet
+    _latest: the highest round read so far, or -1
+    _next_round: the lowest round that may still be generated
+    _line_num: the number of lines read so far
+    """
+    filename: str
+    reorder_window: int
+    _file: Optional[TextIO]
+    _lines: Optional[Iterator[List[str]]]
+    _finished: bool
+    _pending: List[Tuple[int, int, List[int]]]
+    _latest: int
+    _next_round: int
+    _line_num: int
+
+    def __init__(self, max_floor: int, filename: str,
+                 reorder_window: int = 0) -> None:
+        """Initialize a new StreamingFileArrivals algorithm from the given
+        file.
+
+        Like FileArrivals, num_people is set to None. The file is not opened
+        until the first round is generated.
+
+        Precondition:
+            reorder_window >= 0
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.filename = filename
+        self.reorder_window = reorder_window
+        self._file = None
+        self._lines = None
+        self._finished = False
+        self._pending = []
+        self._latest = -1
+        self._next_round = 0
+        self._line_num = 0
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        All of the lines for <round_num> are read and returned together,
+        mapped from starting floor to the people starting there.
+
+        Raise ValueError if <round_num> is lower than a round that was
+        already generated, or if the file is out of order by more than
+        reorder_window rounds.
+        """
+        if round_num < self._next_round:
+            raise ValueError(f'round {round_num} was requested after round '
+                             f'{self._next_round - 1}')
+        self._read_until(round_num + self.reorder_window)
+        self._next_round = round_num + 1
+
+        newcomers = {}
+        while self._pending and self._pending[0][0] <= round_num:
+            line_round, _, floors = heapq.heappop(self._pending)
+            if line_round < round_num:
+                continue
+            for i in range(0, len(floors), 2):
+                start, target = floors[i], floors[i + 1]
+                if start in newcomers:
+                    newcomers[start].append(Person(start, target))
                 else:
-                    newcomers[hold1] = [Person(hold1, hold2)]
-            return newcomers
-        else:
-            newcomers[round_num] = []
-            return newcomers
+                    newcomers[start] = [Person(start, target)]
+        return newcomers
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after <round_num> with a line in
+        the file that lists people, or None if there is none.
+
+        Lines are read ahead only as far as needed to be sure, so skipping
+        a long idle stretch never holds more than one line past it.
+
+        Raise ValueError under the same conditions as generate.
+        """
+        while True:
+            upcoming = [line_round for line_round, _, floors in self._pending
+                        if line_round >= round_num and floors]
+            best = min(upcoming, default=None)
+            if self._finished:
+                return best
+            # Lines still to be read are for rounds of at least
+            # _latest - reorder_window.
+            if best is not None and \
+                    best <= self._latest - self.reorder_window:
+                return best
+            self._read_until(max(self._latest, round_num))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this generator for pickling, without its open
+        file.
+        """
+        state = self.__dict__.copy()
+        state['_file'] = None
+        state['_lines'] = None
+        return state
+
+    def _read_until(self, last_round: int) -> None:
+        """Read lines into _pending until a line for a round after
+        <last_round> has been read, or the file ends.
+        """
+        if self._finished or self._latest > last_round:
+            return
+        if self._lines is None:
+            self._file = open(self.filename, newline='')
+            self._lines = csv.reader(self._file)
+            # Skip the lines already read before this generator was pickled.
+            next(itertools.islice(self._lines, self._line_num,
+                                  self._line_num), None)
+        for line in self._lines:
+            self._line_num += 1
+            if not line:
+                continue
+            ints = [int(field) for field in line]
+            line_round = ints[0]
+            if line_round < self._latest - self.reorder_window:
+                raise ValueError(f'{self.filename}, line {self._line_num}: '
+                                 f'round {line_round} is out of order')
+            if line_round < self._next_round:
+                raise ValueError(f'{self.filename}, line {self._line_num}: '
+                                 f'round {line_round} was already generated')
+            heapq.heappush(self._pending,
+                           (line_round, self._line_num, ints[1:]))
+            self._latest = max(self._latest, line_round)
+            if line_round > last_round:
+                return
+        self._file.close()
+        self._file = None
+        self._lines = None
+        self._finished = True
 
 
 ###############################################################################
@@ -190,9 +390,43 @@ class Direction(Enum):
     DOWN = -1
 
 
+def _lowest_occupied(waiting: Dict[int, List[Person]]) -> Optional[int]:
+    """Return the lowest floor in <waiting> where somebody is waiting, or
+    None if nobody is waiting.
+
+    The index of a FloorQueues is used if <waiting> is one; any other
+    dictionary is scanned.
+    """
+    if isinstance(waiting, FloorQueues):
+        return waiting.lowest_occupied()
+    return min((floor for floor, people in waiting.items() if people),
+               default=None)
+
+
+def _nearest_occupied(waiting: Dict[int, List[Person]],
+                      floor: int) -> Optional[int]:
+    """Return the floor in <waiting> closest to <floor> where somebody is
+    waiting, or None if nobody is waiting.
+
+    Ties are broken in favour of the lower floor. The index of a FloorQueues
+    is used if <waiting> is one; any other dictionary is scanned.
+    """
+    if isinstance(waiting, FloorQueues):
+        return waiting.nearest_occupied(floor)
+    return min((other for other, people in waiting.items() if people),
+               key=lambda other: (abs(other - floor), other), default=None)
+
+
 class MovingAlgorithm:
     """An algorithm to make decisions for moving an elevator at each round.
+
+    === Attributes ===
+    deterministic: whether the directions returned by move_elevators depend
+                   only on its arguments. Simulations running with
+                   fast_forward only skip rounds for deterministic
+                   algorithms.
     """
+    deterministic: bool = False
 
     def move_elevators(self,
                        elevators: List[Elevator],
@@ -201,7 +435,7 @@ class MovingAlgorithm:
         """Return a list of directions for each elevator to move to.
 
         As input, this method receives the list of elevators in the simulation,
-        a dictionary mapping floor number to a list of people waiting on
+        a dictionary mapping floor number to the queue of people waiting on
         that floor, and the maximum floor number in the simulation.
 
         Note that each returned direction should be valid:
@@ -221,7 +455,7 @@ class RandomAlgorithm(MovingAlgorithm):
         This method generates directions randomly.
 
         As input, this method receives the list of elevators in the simulation,
-        a dictionary mapping floor number to a list of people waiting on
+        a dictionary mapping floor number to the queue of people waiting on
         that floor, and the maximum floor number in the simulation.
 
         Note that each returned direction should be valid:
@@ -265,6 +499,7 @@ class PushyPassenger(MovingAlgorithm):
     If the elevator isn't empty, it moves towards the target floor of the
     *first* passenger who boarded the elevator.
     """
+    deterministic = True
 
     def choose_direction(self, elevators: List[Elevator]) -> List[Direction]:
         """Return a list of directions based on the target floor
@@ -295,31 +530,23 @@ class PushyPassenger(MovingAlgorithm):
         provided
 
         As input, this method receives the list of elevators in the simulation,
-        a dictionary mapping floor number to a list of people waiting on
-        that floor, and the maximum floor number in the simulation.
+        a dictionary mapping floor number to the queue of people waiting on
+        that floor, and the maximum floor number in the simulation. If the
+        dictionary is a FloorQueues, its index of occupied floors is used to
+        find the lowest floor where somebody is waiting.
 
         Note that each returned direction should be valid:
             - An elevator at Floor 1 cannot move down.
             - An elevator at the top floor cannot move up.
         """
-        keys = waiting.keys()
-        floors_with_people = []
-        for key in keys:
-            if not waiting[key] == []:
-                floors_with_people.append(key)
-
+        lowest = _lowest_occupied(waiting)
         for elevator in elevators:
             elevator.target_floor = 0
-            if len(elevator.passengers) == 0:
-                if not floors_with_people == []:
-                    floor = 1
-                    while elevator.target_floor == 0:
-                        if floor in floors_with_people:
-                            elevator.target_floor = floor
-                        else:
-                            floor += 1
+            if elevator.num_passengers() == 0:
+                if lowest is not None:
+                    elevator.target_floor = lowest
             else:
-                elevator.target_floor = elevator.passengers[0].target
+                elevator.target_floor = elevator.first_passenger().target
         return self.choose_direction(elevators)
 
 
@@ -334,6 +561,7 @@ class ShortSighted(MovingAlgorithm):
 
     In this case, the order in which people boarded does *not* matter.
     """
+    deterministic = True
 
     def choose_direction(self, elevators: List[Elevator]) -> List[Direction]:
         """Return a list of directions based on the target floor
@@ -365,49 +593,26 @@ class ShortSighted(MovingAlgorithm):
         provided
 
         As input, this method receives the list of elevators in the simulation,
-        a dictionary mapping floor number to a list of people waiting on
-        that floor, and the maximum floor number in the simulation.
+        a dictionary mapping floor number to the queue of people waiting on
+        that floor, and the maximum floor number in the simulation. If the
+        dictionary is a FloorQueues, its index of occupied floors is used to
+        find the floor nearest each empty elevator where somebody is waiting.
 
         Note that each returned direction should be valid:
             - An elevator at Floor 1 cannot move down.
             - An elevator at the top floor cannot move up.
         """
-        keys = waiting.keys()
-        floors_with_people = []
-        for key in keys:
-            if not waiting[key] == []:
-                floors_with_people.append(key)
         for elevator in elevators:
             elevator.target_floor = 0
-            if len(elevator.passengers) == 0:
-                if not floors_with_people == []:
-                    add = 1
-                    while elevator.target_floor == 0:
-                        if (elevator.current_floor - add) in floors_with_people:
-                            elevator.target_floor = elevator.current_floor - add
-                        elif(elevator.current_floor + add) in floors_with_people:
-                            elevator.target_floor = elevator.current_floor + add
-                        else:
-                            add += 1
+            if elevator.num_passengers() == 0:
+                nearest = _nearest_occupied(waiting, elevator.current_floor)
+                if nearest is not None:
+                    elevator.target_floor = nearest
                 else:
                     elevator.target_floor = elevator.current_floor
             else:
-                new_target = 0
-                distance = 6
-                for passenger in elevator.passengers:
-                    test = passenger.target - elevator.current_floor
-                    if test < 0:
-                        if (test * -1) < distance:
-                            new_target = passenger.target
-                            distance = test * -1
-                        elif (test * -1) == distance:
-                            new_target = passenger.target
-                            distance = test * -1
-                    else:
-                        if test < distance:
-                            new_target = passenger.target
-                            distance = test
-                elevator.target_floor = new_target
+                elevator.target_floor = \
+                    elevator.nearest_target(elevator.current_floor)
         return self.choose_direction(elevators)
 
 
@@ -0,0 +1,221 @@
+"""CSC148 Assignment 1 - Binary arrival traces
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains a compact binary format for arrival traces, a converter
+from the CSV format read by FileArrivals, and MappedArrivals, an arrival
+generator that memory-maps a binary trace.
+
+A trace file holds three fixed-width integer columns (round, start floor and
+target floor, one entry per person) sorted by round, plus an index giving
+where each round's people begin. Generating a round is just slicing these
+columns, with no parsing, and any number of processes can map the same file
+and share its pages.
+
+The layout, all little-endian, is:
+    header: the magic bytes b'ELVTRACE', then the version (uint32), a
+            reserved uint32, the first round (int64), the number of rounds
+            covered (uint64) and the number of people (uint64)
+    offsets: int64[number of rounds + 1]; the people arriving in round
+             first_round + k are entries offsets[k] to offsets[k + 1] - 1
+             of the columns below
+    round, start, target: int32[number of people] each
+Each section starts at a multiple of 8 bytes.
+
+Run this file directly to convert a CSV trace:
+
+    python arrival_trace.py sample_arrivals.csv sample_arrivals.trace
+"""
+import csv
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from algorithms import ArrivalGenerator
+from entities import Person
+from generators import people_by_floor
+
+MAGIC = b'ELVTRACE'
+VERSION = 1
+_HEADER = struct.Struct('<8sIIqQQ')
+
+
+def _padded(size: int) -> int:
+    """Return <size> rounded up to a multiple of 8."""
+    return (size + 7) // 8 * 8
+
+
+def write_trace(filename: str, rounds: np.ndarray, starts: np.ndarray,
+                targets: np.ndarray) -> None:
+    """Write a binary trace of the given arrivals to <filename>.
+
+    Entry i of <rounds>, <starts> and <targets> describes one person; they
+    need not be sorted by round. People arriving in the same round keep their
+    relative order.
+    """
+    order = np.argsort(rounds, kind='stable')
+    rounds = np.asarray(rounds, dtype='<i4')[order]
+    starts = np.asarray(starts, dtype='<i4')[order]
+    targets = np.asarray(targets, dtype='<i4')[order]
+
+    if len(rounds) == 0:
+        first_round, num_rounds = 0, 0
+    else:
+        first_round = int(rounds[0])
+        num_rounds = int(rounds[-1]) - first_round + 1
+    offsets = np.searchsorted(
+        rounds, np.arange(first_round, first_round + num_rounds + 1),
+        side='left').astype('<i8')
+
+    with open(filename, 'wb') as trace:
+        header = _HEADER.pack(MAGIC, VERSION, 0, first_round, num_rounds,
+                              len(rounds))
+        trace.write(header + bytes(_padded(len(header)) - len(header)))
+        for column in (offsets, rounds, starts, targets):
+            data = column.tobytes()
+            trace.write(data + bytes(_padded(len(data)) - len(data)))
+
+
+def convert_csv(csv_filename: str, trace_filename: str) -> int:
+    """Convert the CSV arrivals in <csv_filename> to a binary trace in
+    <trace_filename>, and return the number of people in it.
+
+    The CSV file has the format read by algorithms.FileArrivals; its lines
+    may be in any order.
+    """
+    rounds = array('i')
+    starts = array('i')
+    targets = array('i')
+    with open(csv_filename, newline='') as csvfile:
+        for line in csv.reader(csvfile):
+            if not line:
+                continue
+            ints = [int(field) for field in line]
+            people = (len(ints) - 1) // 2
+            rounds.extend([ints[0]] * people)
+            starts.extend(ints[1::2])
+            targets.extend(ints[2::2])
+    write_trace(trace_filename, np.frombuffer(rounds, dtype=np.int32),
+                np.frombuffer(starts, dtype=np.int32),
+                np.frombuffer(targets, dtype=np.int32))
+    return len(rounds)
+
+
+class MappedArrivals(ArrivalGenerator):
+    """Generate arrivals from a memory-mapped binary trace.
+
+    === Attributes ===
+    filename: the trace file
+    first_round: the first round covered by the trace
+    num_rounds: the number of rounds covered by the trace
+    offsets: the trace's round index
+    rounds: the round each person arrives in
+    starts: the floor each person starts on
+    targets: the floor each person wants to go to
+    """
+    filename: str
+    first_round: int
+    num_rounds: int
+    offsets: np.ndarray
+    rounds: np.ndarray
+    starts: np.ndarray
+    targets: np.ndarray
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new MappedArrivals algorithm from the given trace.
+
+        As for FileArrivals, num_people is set to None.
+
+        Raise ValueError if <filename> is not a binary trace of a version this
+        module can read.
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.filename = filename
+        self._map()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this generator for pickling, without the
+        mapped columns, which are mapped again when it is unpickled.
+        """
+        return {'max_floor': self.max_floor, 'num_people': self.num_people,
+                'filename': self.filename}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore this generator from a pickled state."""
+        self.__dict__.update(state)
+        self._map()
+
+    def _map(self) -> None:
+        """Memory-map the columns of this generator's trace file."""
+        with open(self.filename, 'rb') as trace:
+            header = trace.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f'{self.filename} is not an arrival trace')
+        magic, version, _, first_round, num_rounds, num_people = \
+            _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f'{self.filename} is not an arrival trace')
+        if version != VERSION:
+            raise ValueError(f'{self.filename} has unsupported trace version '
+                             f'{version}')
+        self.first_round = first_round
+        self.num_rounds = num_rounds
+
+        position = _padded(_HEADER.size)
+        columns = []
+        for dtype, length in (('<i8', num_rounds + 1), ('<i4', num_people),
+                              ('<i4', num_people), ('<i4', num_people)):
+            if length == 0:
+                columns.append(np.zeros(0, dtype=dtype))
+            else:
+                columns.append(np.memmap(self.filename, dtype=dtype, mode='r',
+                                         offset=position, shape=(length,)))
+            position += _padded(length * np.dtype(dtype).itemsize)
+        self.offsets, self.rounds, self.starts, self.targets = columns
+
+    def _bounds(self, round_num: int) -> Tuple[int, int]:
+        """Return the range of entries for the people arriving at
+        <round_num>.
+        """
+        k = round_num - self.first_round
+        if not 0 <= k < self.num_rounds:
+            return 0, 0
+        return int(self.offsets[k]), int(self.offsets[k + 1])
+
+    def generate_arrays(self, round_num: int) -> Tuple[np.ndarray,
+                                                       np.ndarray]:
+        """Return the start and target floors of the people arriving at the
+        given round, as read-only views of the mapped trace.
+        """
+        begin, end = self._bounds(round_num)
+        return self.starts[begin:end], self.targets[begin:end]
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after <round_num> in which somebody
+        arrives, or None if there is none.
+        """
+        index = int(np.searchsorted(self.rounds, round_num))
+        if index == len(self.rounds):
+            return None
+        return int(self.rounds[index])
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        The returned dictionary maps floor number to the people who
+        arrived starting at that floor.
+        """
+        return people_by_floor(*self.generate_arrays(round_num))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python arrival_trace.py ARRIVALS.csv OUTPUT.trace')
+    print(f'{convert_csv(sys.argv[1], sys.argv[2])} people written to '
+          f'{sys.argv[2]}')
@@ -0,0 +1,307 @@
+"""CSC148 Assignment 1 - Benchmarks
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module measures how fast the simulation runs, and how much memory it
+needs, over a matrix of building sizes and arrival rates:
+
+    - every moving algorithm, with RandomArrivals, on each engine
+    - every arrival generator, with ShortSighted, on the object engine
+
+Each case is run headless several times to time it, keeping the fastest run
+(giving rounds per second), and once more under tracemalloc to find its peak
+memory. Results are written as JSON, and are compared against a baseline:
+a case whose peak memory grows by more than the given tolerance is a
+regression, and the command exits with status 1.
+
+By default the baseline is benchmark_baseline.json, next to this file, which
+is committed with the code and was written by this module's own --save
+option. Speeds are only compared when a --speed-tolerance is given, and then
+only if the baseline was saved on the same platform with the same Python.
+Timings of unchanged code can vary by almost half from one run to the next,
+even on one machine, so use a generous tolerance, such as 0.5, and a baseline
+saved with --save on the machine itself. Run this file directly, for
+example:
+
+    python benchmark.py
+    python benchmark.py --save
+    python benchmark.py --baseline mine.json --speed-tolerance 0.5
+
+The file-based generators read arrivals written to a temporary directory
+from a seeded VectorRandomArrivals with the same rate.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sweep import MOVING_ALGORITHMS, build_simulation
+
+# The arrival generators benchmarked, by name.
+GENERATORS = ['random', 'vector', 'poisson', 'file', 'trace']
+ENGINES = ['objects', 'arrays']
+# (floors, elevators) of each building size in the default matrix.
+SIZES = [(5, 2), (50, 10), (500, 100)]
+# Arrivals per round in the default matrix.
+RATES = [1, 10, 100]
+# The baseline compared against by default.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmark_baseline.json')
+
+# The number of rounds in a simulated day for poisson arrivals, as a
+# multiple of the number of rounds benchmarked, so that a run covers the
+# busy part of the day.
+_POISSON_DAY = 2
+
+
+def make_cases(sizes: List[Tuple[int, int]], rates: List[int],
+               algorithms: List[str], generators: List[str],
+               engines: List[str], capacity: int) -> List[Dict[str, Any]]:
+    """Return the benchmark cases for the given matrix.
+
+    Every case is a dictionary with a unique 'name', its 'rate' and the keys
+    of a sweep grid point; its 'arrivals' names a generator from GENERATORS
+    rather than giving a full specification.
+    """
+    cases = []
+    for num_floors, num_elevators in sizes:
+        for rate in rates:
+            combinations = [(algorithm, 'random', engine)
+                            for algorithm in algorithms
+                            for engine in engines]
+            combinations.extend(('short_sighted', generator, 'objects')
+                                for generator in generators
+                                if generator != 'random')
+            for algorithm, generator, engine in combinations:
+                cases.append({
+                    'name': f'{num_floors}x{num_elevators}/rate={rate}/'
+                            f'{algorithm}/{generator}/{engine}',
+                    'rate': rate,
+                    'num_floors': num_floors,
+                    'num_elevators': num_elevators,
+                    'elevator_capacity': capacity,
+                    'moving_algorithm': algorithm,
+                    'arrivals': generator,
+                    'seed': 0,
+                    'engine': engine
+                })
+    return cases
+
+
+def _arrival_spec(case: Dict[str, Any], num_rounds: int,
+                  directory: str) -> str:
+    """Return the sweep arrival specification for <case>, writing any files
+    it reads into <directory>.
+    """
+    generator, rate = case['arrivals'], case['rate']
+    if generator in ('random', 'vector'):
+        return f'{generator}:{rate}'
+    if generator == 'poisson':
+        return f'poisson:{rate}:{_POISSON_DAY * num_rounds / 24}'
+
+    from generators import VectorRandomArrivals
+    arrivals = VectorRandomArrivals(case['num_floors'], rate, case['seed'],
+                                    block_rounds=num_rounds)
+    base = os.path.join(directory,
+                        f'{case["num_floors"]}_{rate}_{num_rounds}')
+    csv_name = base + '.csv'
+    if not os.path.exists(csv_name):
+        with open(csv_name, 'w') as csv_file:
+            for round_num in range(num_rounds):
+                starts, targets = arrivals.generate_arrays(round_num)
+                pairs = np.column_stack((starts, targets)).ravel().tolist()
+                csv_file.write(','.join(map(str, [round_num] + pairs)) + '\n')
+    if generator == 'file':
+        return f'file:{csv_name}'
+    from arrival_trace import convert_csv
+    trace_name = base + '.trace'
+    if not os.path.exists(trace_name):
+        convert_csv(csv_name, trace_name)
+    return f'trace:{trace_name}'
+
+
+def run_case(case: Dict[str, Any], num_rounds: int, directory: str,
+             measure_memory: bool = True, repeat: int = 3) -> Dict[str, Any]:
+    """Run <case> for <num_rounds> rounds and return its measurements.
+
+    The result has the keys name, rounds_per_second, seconds (of the
+    fastest of <repeat> runs) and peak_bytes (None unless
+    <measure_memory>), plus the case's own keys.
+
+    Precondition: repeat >= 1
+    """
+    point = dict(case, arrivals=_arrival_spec(case, num_rounds, directory))
+    times = []
+    for _ in range(repeat):
+        sim = build_simulation(point)
+        start = perf_counter()
+        sim.run(num_rounds)
+        times.append(perf_counter() - start)
+    seconds = min(times)
+
+    peak_bytes = None
+    if measure_memory:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        build_simulation(point).run(num_rounds)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - base
+        if not tracing:
+            tracemalloc.stop()
+
+    result = dict(case)
+    result.update({
+        'rounds_per_second': num_rounds / seconds,
+        'seconds': seconds,
+        'peak_bytes': peak_bytes
+    })
+    return result
+
+
+def run_benchmarks(cases: List[Dict[str, Any]], num_rounds: int,
+                   measure_memory: bool = True, repeat: int = 3,
+                   progress: Any = None) -> Dict[str, Any]:
+    """Run every case in <cases> as run_case does, and return the benchmark
+    results.
+
+    If <progress> is an open file, a line is written to it as each case
+    finishes.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases:
+            result = run_case(case, num_rounds, directory, measure_memory,
+                              repeat)
+            results.append(result)
+            if progress is not None:
+                memory = '' if result['peak_bytes'] is None else \
+                    f'{result["peak_bytes"] / 2 ** 20:10.2f} MiB'
+                print(f'{case["name"]:<50} '
+                      f'{result["rounds_per_second"]:12.1f} rounds/s'
+                      f'{memory}', file=progress, flush=True)
+    return {'num_rounds': num_rounds, 'repeat': repeat,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cases': results}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            speed_tolerance: Optional[float],
+            memory_tolerance: float) -> List[str]:
+    """Return a description of every regression in <results> compared to
+    <baseline>.
+
+    A case regresses if its rounds per second are more than a fraction
+    <speed_tolerance> below the baseline's, or its peak memory is more than
+    a fraction <memory_tolerance> above the baseline's. Speeds are not
+    compared if <speed_tolerance> is None. Cases missing from either side
+    are ignored.
+    """
+    previous = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        speed, old_speed = case['rounds_per_second'], old['rounds_per_second']
+        if speed_tolerance is not None and \
+                speed < old_speed * (1 - speed_tolerance):
+            regressions.append(f'{case["name"]}: {speed:.1f} rounds/s, '
+                               f'baseline {old_speed:.1f}')
+        memory, old_memory = case['peak_bytes'], old['peak_bytes']
+        if memory is not None and old_memory is not None and \
+                memory > old_memory * (1 + memory_tolerance):
+            regressions.append(f'{case["name"]}: peak {memory} bytes, '
+                               f'baseline {old_memory}')
+    return regressions
+
+
+def _sizes(text: str) -> List[Tuple[int, int]]:
+    """Return the building sizes in <text>, such as '5x2,50x10'."""
+    sizes = []
+    for size in text.split(','):
+        floors, elevators = size.split('x')
+        sizes.append((int(floors), int(elevators)))
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks described by <argv> and return the exit status."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the elevator simulation.')
+    parser.add_argument('--sizes', type=_sizes, default=SIZES,
+                        help='building sizes as FLOORSxELEVATORS,...')
+    parser.add_argument('--rates', default=RATES,
+                        type=lambda text: [int(v) for v in text.split(',')])
+    parser.add_argument('--algorithms', default=list(MOVING_ALGORITHMS),
+                        type=lambda text: text.split(','))
+    parser.add_argument('--generators', default=GENERATORS,
+                        type=lambda text: text.split(','))
+    parser.add_argument('--engines', default=ENGINES,
+                        type=lambda text: text.split(','))
+    parser.add_argument('--capacity', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs per case; the fastest is kept')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the peak memory runs')
+    parser.add_argument('--output', default=None,
+                        help='JSON file to write the results to')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='JSON results to compare against')
+    parser.add_argument('--save', action='store_true',
+                        help='write the results to the baseline file '
+                             'instead of comparing against it')
+    parser.add_argument('--speed-tolerance', type=float, default=None,
+                        help='also compare speeds, allowing this fraction '
+                             'of slowdown')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    cases = make_cases(args.sizes, args.rates, args.algorithms,
+                       args.generators, args.engines, args.capacity)
+    results = run_benchmarks(cases, args.rounds, not args.no_memory,
+                             args.repeat, sys.stdout)
+    outputs = [args.output, args.baseline if args.save else None]
+    for filename in outputs:
+        if filename is not None:
+            with open(filename, 'w') as output:
+                json.dump(results, output, indent=2)
+                output.write('\n')
+
+    if args.save:
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}; run with --save to make one')
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    speed_tolerance = args.speed_tolerance
+    machine = (results['platform'], results['python'])
+    saved_on = (baseline.get('platform'), baseline.get('python'))
+    if speed_tolerance is not None and saved_on != machine:
+        print(f'baseline is from {saved_on[0]}, Python {saved_on[1]}; '
+              f'comparing peak memory only')
+        speed_tolerance = None
+    regressions = compare(results, baseline, speed_tolerance,
+                          args.memory_tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
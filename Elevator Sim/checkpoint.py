@@ -0,0 +1,124 @@
+"""CSC148 Assignment 1 - Checkpoints
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module saves the full state of a running simulation (a
+simulation.Simulation or an engine.ArraySimulation) to a compact binary
+checkpoint, and restores it later, in the same process or another one.
+
+A checkpoint holds everything a run depends on: the people waiting on each
+floor, each elevator's floor and passengers, the wait time statistics so far,
+the number of rounds simulated, and the arrival generator's position in its
+arrivals, along with its own random number generator, if it has one. The
+state of the random module, which RandomAlgorithm draws from, is saved too,
+but only put back when asked for (see restore), since that changes the
+random numbers of the whole program. With it put back, running a restored
+simulation for n rounds gives the same statistics as running the original
+for n more rounds. Restoring the
+same checkpoint twice gives two independent simulations, which can be used
+to fork what-if scenarios from a warmed-up state: change one of them (say,
+its moving algorithm) and compare their runs.
+
+The visualizer, recorder and stage hooks of a simulation are not saved; see
+Simulation.__getstate__.
+
+The format is:
+    header: the magic bytes b'ELVCHKPT' and the version (uint32,
+            little-endian)
+    body: the zlib-compressed pickle of the simulation and random state
+
+Checkpoints are pickles, so only load checkpoints from sources you trust.
+"""
+import os
+import pickle
+import random
+import struct
+import zlib
+from typing import Any, Dict, Optional
+
+MAGIC = b'ELVCHKPT'
+VERSION = 1
+_HEADER = struct.Struct('<8sI')
+
+
+def snapshot(simulation: Any) -> bytes:
+    """Return a checkpoint of <simulation> and the random module's state."""
+    state = {'simulation': simulation, 'random_state': random.getstate()}
+    body = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+    return _HEADER.pack(MAGIC, VERSION) + body
+
+
+def restore(data: bytes, restore_random: bool = False) -> Any:
+    """Return the simulation saved in the checkpoint <data>.
+
+    If <restore_random>, the random module is also put back in the state it
+    was in when the checkpoint was taken.
+
+    Raise ValueError if <data> is not a checkpoint of a version this module
+    can read.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError('not a simulation checkpoint')
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a simulation checkpoint')
+    if version != VERSION:
+        raise ValueError(f'unsupported checkpoint version {version}')
+    state = pickle.loads(zlib.decompress(data[_HEADER.size:]))
+    if restore_random:
+        random.setstate(state['random_state'])
+    return state['simulation']
+
+
+def save_checkpoint(simulation: Any, filename: str) -> None:
+    """Save a checkpoint of <simulation> to <filename>.
+
+    The checkpoint is written to a temporary file first, so <filename> is
+    never left holding a partly written checkpoint.
+    """
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as checkpoint:
+        checkpoint.write(snapshot(simulation))
+    os.replace(temporary, filename)
+
+
+def load_checkpoint(filename: str, visualize: bool = False,
+                    restore_random: bool = False) -> Any:
+    """Return the simulation saved in the checkpoint file <filename>, as for
+    restore.
+
+    If <visualize>, a restored simulation.Simulation is given a new
+    Visualizer.
+    """
+    with open(filename, 'rb') as checkpoint:
+        simulation = restore(checkpoint.read(), restore_random)
+    if visualize:
+        from visualizer import Visualizer
+        simulation.visualizer = Visualizer(simulation.elevators,
+                                           simulation.num_floors, True)
+    return simulation
+
+
+def run_with_checkpoints(simulation: Any, num_rounds: int, filename: str,
+                         every: int,
+                         resume: bool = False) -> Optional[Dict[str, Any]]:
+    """Run <simulation> until it has simulated <num_rounds> rounds in all,
+    saving a checkpoint to <filename> every <every> rounds, and return the
+    statistics of the final run.
+
+    If <resume> and <filename> exists, the run carries on from the
+    checkpoint in it instead of from <simulation>, with the random module
+    put back in its saved state. Return None if no rounds were left to run.
+
+    Precondition: every >= 1
+    """
+    if resume and os.path.exists(filename):
+        simulation = load_checkpoint(filename, restore_random=True)
+    stats = None
+    while simulation.num_rounds < num_rounds:
+        stats = simulation.run(min(every, num_rounds - simulation.num_rounds))
+        save_checkpoint(simulation, filename)
+    return stats
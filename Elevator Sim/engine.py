@@ -0,0 +1,576 @@
+"""CSC148 Assignment 1 - Array simulation engine
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains ArraySimulation, an alternative to simulation.Simulation
+for very large buildings and crowds. It takes the same configuration
+dictionary, has the same run method and reports the same statistics, but
+stores people and elevators in NumPy arrays ("struct of arrays") instead of
+Person and Elevator objects, so that each stage of a round is a handful of
+batched array operations rather than a Python loop over every person.
+
+The moving algorithms are not called directly: the built-in algorithms
+(RandomAlgorithm, PushyPassenger and ShortSighted) are re-implemented here as
+array operations, and any other moving algorithm is rejected.
+ArraySimulation never visualizes anything.
+
+The arrays and the operations on them are kept in ArrayEngine, which is
+shared with replicas.ReplicaSimulation. The engine can hold several
+independent copies ("replicas") of the building at once: floors are then
+identified across replicas by a key,
+    replica * (num_floors + 1) + floor
+so that sorting by key groups each replica's floors together, in order.
+ArraySimulation has a single replica, whose keys are its floors.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+import algorithms
+from profiling import as_hook, call_stage, finish_run
+from stats import WaitStats
+
+if TYPE_CHECKING:
+    from recorder import RoundRecorder
+
+# Values of ArraySimulation._state.
+WAITING = 0
+RIDING = 1
+DONE = 2
+
+# Number of people the person arrays can hold before they first grow.
+_INITIAL_SIZE = 1024
+
+
+def arrival_arrays(generator: algorithms.ArrivalGenerator,
+                   round_num: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the start and target floors of the arrivals at <round_num>.
+
+    Generators that can produce arrays directly do so through a
+    generate_arrays method; for all others, the people returned by generate
+    are converted, in the order that they are listed for each floor.
+    """
+    generate_arrays = getattr(generator, 'generate_arrays', None)
+    if generate_arrays is not None:
+        return generate_arrays(round_num)
+    starts = []
+    targets = []
+    for people in generator.generate(round_num).values():
+        for person in people:
+            starts.append(person.start)
+            targets.append(person.target)
+    return (np.array(starts, dtype=np.int64),
+            np.array(targets, dtype=np.int64))
+
+
+class ArrayEngine:
+    """The people and elevators of one or more replicas of a building,
+    stored in NumPy arrays, with the array operations that simulate each
+    stage of a round.
+
+    Person i is described by entry i of each private person array; the
+    arrays are compacted from time to time, dropping people who have
+    completed their journey, so i is not a stable identifier. Elevators are
+    indexed by their flattened position in the elevator arrays.
+
+    This is an abstract class: subclasses decide whom the people belong to,
+    and what is done with the wait times of the people who complete their
+    journey.
+
+    === Attributes ===
+    moving_algorithm: the algorithm used to decide how to move elevators
+    num_floors: the number of floors in each replica
+    num_replicas: the number of replicas
+    num_rounds: the number of rounds simulated so far
+    current_floor: the floor that each elevator is on
+    load: the number of people on each elevator
+    capacity: the maximum number of people on each elevator
+
+    === Private Attributes ===
+    _stride: the difference between the keys of the same floor in
+             consecutive replicas
+    _size: the number of people in use in the person arrays
+    _start: the floor each person started on
+    _target: the floor each person wants to go to
+    _arrival: the round each person arrived in
+    _board: the round each person boarded an elevator, or -1
+    _state: WAITING, RIDING or DONE for each person
+    _elevator: the flattened index of the elevator each person boarded,
+               or -1
+    _seq: a number increasing in the order people boarded
+    _next_seq: the next value to use in _seq
+    _num_done: the number of DONE entries in the person arrays
+    _rng: the random number generator used by RandomAlgorithm
+
+    === Representation invariants ===
+    current_floor, load and capacity have the same shape, whose last
+    dimension is the number of elevators in each replica
+    0 <= load[e] <= capacity[e]
+    1 <= current_floor[e] <= num_floors
+    """
+    moving_algorithm: algorithms.MovingAlgorithm
+    num_floors: int
+    num_replicas: int
+    num_rounds: int
+    current_floor: np.ndarray
+    load: np.ndarray
+    capacity: np.ndarray
+
+    # The names of the person arrays.
+    _PERSON_ARRAYS = ('_start', '_target', '_arrival', '_board', '_state',
+                      '_elevator', '_seq')
+
+    def __init__(self, config: Dict[str, Any],
+                 shape: Tuple[int, ...]) -> None:
+        """Initialize a new engine for the building described by
+        <config>, with elevator arrays of the given shape.
+
+        The configuration has the same keys as for ArraySimulation.
+
+        Raise ValueError if <config> asks for a visualization, or for a
+        moving algorithm other than the built-in ones.
+        """
+        name = type(self).__name__
+        if config.get('visualize'):
+            raise ValueError(f'{name} cannot be visualized')
+        if not isinstance(config['moving_algorithm'],
+                          (algorithms.RandomAlgorithm,
+                           algorithms.PushyPassenger,
+                           algorithms.ShortSighted)):
+            raise ValueError(f'{name} only supports the built-in moving '
+                             f'algorithms')
+        self.moving_algorithm = config['moving_algorithm']
+        self.num_floors = config['num_floors']
+        self.num_replicas = int(np.prod(shape[:-1]))
+        self.num_rounds = 0
+        self._stride = self.num_floors + 1
+
+        self.current_floor = np.ones(shape, dtype=np.int64)
+        self.load = np.zeros(shape, dtype=np.int64)
+        self.capacity = np.full(shape, config['elevator_capacity'],
+                                dtype=np.int64)
+
+        self._size = 0
+        for name in self._PERSON_ARRAYS:
+            dtype = np.int8 if name == '_state' else np.int64
+            setattr(self, name, np.zeros(_INITIAL_SIZE, dtype=dtype))
+        self._next_seq = 0
+        self._num_done = 0
+        self._rng = np.random.default_rng(config.get('seed'))
+
+    ############################################################################
+    # Stages of a round
+    ############################################################################
+    def _add_people(self, now: int, starts: np.ndarray,
+                    targets: np.ndarray) -> slice:
+        """Add people arriving in round <now> with the given start and
+        target floors to the person arrays, and return the slice of the
+        arrays that holds them.
+        """
+        count = len(starts)
+        self._reserve(count)
+        new = slice(self._size, self._size + count)
+        self._start[new] = starts
+        self._target[new] = targets
+        self._arrival[new] = now
+        self._board[new] = -1
+        self._state[new] = WAITING
+        self._elevator[new] = -1
+        self._size += count
+        return new
+
+    def _handle_leaving(self, now: int) -> None:
+        """Remove every rider whose target is their elevator's floor."""
+        riding = np.flatnonzero(self._state[:self._size] == RIDING)
+        if len(riding) == 0:
+            return
+        elevators = self._elevator[riding]
+        arrived = self._target[riding] == self.current_floor.ravel()[elevators]
+        leaving = riding[arrived]
+        if len(leaving) == 0:
+            return
+        self._state[leaving] = DONE
+        self.load.ravel()[:] -= np.bincount(elevators[arrived],
+                                            minlength=self.load.size)
+        self._add_waits(leaving, now - self._arrival[leaving])
+
+        self._num_done += len(leaving)
+        if self._num_done * 2 > self._size:
+            self._compact()
+
+    def _add_waits(self, people: np.ndarray, waits: np.ndarray) -> None:
+        """Record that <people> have completed their journey, after waiting
+        for <waits> rounds.
+        """
+        raise NotImplementedError
+
+    def _handle_boarding(self, now: int) -> None:
+        """Board waiting people onto the elevators on their floor.
+
+        People board in the order they arrived, and elevators on the same
+        floor fill up in index order, as in simulation.Simulation. Floors are
+        matched by key, so people only board elevators of their own replica.
+        """
+        waiting = np.flatnonzero(self._state[:self._size] == WAITING)
+        if len(waiting) == 0:
+            return
+        keys = self._floor_keys(waiting)
+        order = np.argsort(keys, kind='stable')
+        waiting = waiting[order]
+        keys = keys[order]
+        # rank[i] is the number of people ahead of waiting[i] on its floor.
+        rank = np.arange(len(waiting)) - np.searchsorted(keys, keys)
+
+        # Lay the free places of all elevators out end to end, grouped by
+        # floor key; the people on a floor take that floor's places in order.
+        elevator_keys = self._elevator_keys().ravel()
+        by_key = np.argsort(elevator_keys, kind='stable')
+        free = (self.capacity - self.load).ravel()[by_key]
+        places_end = np.cumsum(free)
+        occupied_keys, first = np.unique(elevator_keys[by_key],
+                                         return_index=True)
+        num_keys = self.num_replicas * self._stride
+        key_offset = np.zeros(num_keys, dtype=np.int64)
+        key_places = np.zeros(num_keys, dtype=np.int64)
+        key_offset[occupied_keys] = (places_end - free)[first]
+        key_places[occupied_keys] = np.add.reduceat(free, first)
+
+        boards = rank < key_places[keys]
+        if not boards.any():
+            return
+        people = waiting[boards]
+        places = key_offset[keys[boards]] + rank[boards]
+        elevators = by_key[np.searchsorted(places_end, places, side='right')]
+
+        self._state[people] = RIDING
+        self._board[people] = now
+        self._elevator[people] = elevators
+        self._seq[people] = np.arange(self._next_seq,
+                                      self._next_seq + len(people))
+        self._next_seq += len(people)
+        self.load.ravel()[:] += np.bincount(elevators,
+                                            minlength=self.load.size)
+
+    def _move_elevators(self) -> None:
+        """Move the elevators according to this simulation's algorithm."""
+        if isinstance(self.moving_algorithm, algorithms.RandomAlgorithm):
+            self.current_floor += self._random_steps()
+            return
+        if isinstance(self.moving_algorithm, algorithms.PushyPassenger):
+            targets = self._pushy_targets()
+        else:
+            targets = self._short_sighted_targets()
+        steps = np.sign(targets - self.current_floor)
+        steps[targets == 0] = 0
+        self.current_floor += steps
+
+    ############################################################################
+    # Floor keys
+    ############################################################################
+    def _floor_keys(self, people: np.ndarray) -> np.ndarray:
+        """Return the keys of the start floors of <people>.
+
+        In a single replica, the key of a floor is the floor itself.
+        """
+        return self._start[people]
+
+    def _elevator_keys(self) -> np.ndarray:
+        """Return the key of the floor that each elevator is on."""
+        return self.current_floor
+
+    def _waiting_keys(self) -> np.ndarray:
+        """Return the keys of the floors with at least one person waiting,
+        in order.
+        """
+        waiting = np.flatnonzero(self._state[:self._size] == WAITING)
+        return np.unique(self._floor_keys(waiting))
+
+    ############################################################################
+    # Moving algorithms
+    ############################################################################
+    def _random_steps(self) -> np.ndarray:
+        """Return a random step of -1, 0 or 1 for each elevator.
+
+        As in algorithms.RandomAlgorithm, elevators in the middle of the
+        building move up, stay or move down with equal probability, and
+        elevators at the bottom or top floor move or stay with equal
+        probability. One number is drawn for every elevator at once.
+        """
+        draws = self._rng.random(self.current_floor.shape)
+        steps = (draws * 3).astype(np.int64) - 1
+        at_bottom = self.current_floor == 1
+        at_top = self.current_floor == self.num_floors
+        steps[at_bottom] = draws[at_bottom] < 0.5
+        steps[at_top] = -(draws[at_top] < 0.5).astype(np.int64)
+        return steps
+
+    def _riders(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices of the people riding an elevator, and the
+        flattened indices of the elevators they are riding.
+        """
+        riding = np.flatnonzero(self._state[:self._size] == RIDING)
+        return riding, self._elevator[riding]
+
+    def _pushy_targets(self) -> np.ndarray:
+        """Return the target floor of each elevator under PushyPassenger.
+
+        A target of 0 means that the elevator stays where it is.
+        """
+        targets = np.zeros(self.current_floor.shape, dtype=np.int64)
+        keys = self._waiting_keys()
+        if len(keys) > 0:
+            # The first key of each replica is its lowest waiting floor.
+            replicas, first = np.unique(keys // self._stride,
+                                        return_index=True)
+            by_replica = targets.reshape(self.num_replicas, -1)
+            by_replica[replicas] = (keys[first] % self._stride)[:, np.newaxis]
+
+        riding, elevators = self._riders()
+        if len(riding) > 0:
+            # The first passenger of each elevator is the one who boarded
+            # it earliest.
+            order = np.lexsort((self._seq[riding], elevators))
+            occupied, first = np.unique(elevators[order], return_index=True)
+            targets.ravel()[occupied] = self._target[riding[order][first]]
+        return targets
+
+    def _short_sighted_targets(self) -> np.ndarray:
+        """Return the target floor of each elevator under ShortSighted.
+
+        Ties between floors that are equally close are broken in favour of
+        the lower floor. A floor below or above an elevator in the sorted
+        waiting keys only counts if it belongs to the elevator's own replica.
+        """
+        current = self.current_floor.ravel()
+        targets = current.copy()
+        keys = self._waiting_keys()
+        if len(keys) > 0:
+            elevator_keys = self._elevator_keys().ravel()
+            replicas = elevator_keys // self._stride
+            below = np.searchsorted(keys, elevator_keys, side='left') - 1
+            above = np.searchsorted(keys, elevator_keys, side='right')
+            below_key = keys[np.maximum(below, 0)]
+            above_key = keys[np.minimum(above, len(keys) - 1)]
+            has_below = (below >= 0) & (below_key // self._stride == replicas)
+            has_above = (above < len(keys)) & \
+                (above_key // self._stride == replicas)
+            below_floor = below_key % self._stride
+            above_floor = above_key % self._stride
+            use_below = has_below & (
+                ~has_above | (current - below_floor <= above_floor - current))
+            targets = np.where(use_below, below_floor,
+                               np.where(has_above, above_floor, current))
+
+        riding, elevators = self._riders()
+        if len(riding) > 0:
+            destinations = self._target[riding]
+            distances = np.abs(destinations - current[elevators])
+            order = np.lexsort((destinations, distances, elevators))
+            occupied, first = np.unique(elevators[order], return_index=True)
+            targets[occupied] = destinations[order][first]
+        return targets.reshape(self.current_floor.shape)
+
+    ############################################################################
+    # Person array storage
+    ############################################################################
+    def _reserve(self, count: int) -> None:
+        """Make room for <count> more people in the person arrays."""
+        needed = self._size + count
+        if needed <= len(self._start):
+            return
+        new_size = max(needed, 2 * len(self._start))
+        for name in self._PERSON_ARRAYS:
+            old = getattr(self, name)
+            grown = np.zeros(new_size, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
+
+    def _compact(self) -> None:
+        """Drop the people who have completed their journey from the person
+        arrays, keeping everyone else in the same relative order.
+        """
+        keep = np.flatnonzero(self._state[:self._size] != DONE)
+        for name in self._PERSON_ARRAYS:
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self._size = len(keep)
+        self._num_done = 0
+
+
+class ArraySimulation(ArrayEngine):
+    """A simulation that stores its people and elevators in NumPy arrays.
+
+    It is an ArrayEngine with a single replica, whose elevator arrays have
+    one entry per elevator.
+
+    === Attributes ===
+    arrival_generator: the algorithm used to generate new arrivals.
+    wait_stats: a summary of the wait times of the people who have
+                completed their journey
+    recorder: the recorder of per-round metrics for this simulation, or
+              None if it records none
+
+    === Private Attributes ===
+    _total_people: the number of people who have arrived
+    """
+    arrival_generator: algorithms.ArrivalGenerator
+    wait_stats: WaitStats
+    recorder: Optional[RoundRecorder]
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize a new simulation using the given configuration.
+
+        The configuration has the same keys as for simulation.Simulation,
+        plus an optional 'seed' for RandomAlgorithm and optional 'recorder'
+        and 'fast_forward' keys.
+        """
+        super().__init__(config, (config['num_elevators'],))
+        self.arrival_generator = config['arrival_generator']
+        self._total_people = 0
+        self.wait_stats = WaitStats()
+        self.recorder = config.get('recorder')
+        self._fast_forward = config.get('fast_forward', False)
+        self._stage_hooks = []
+
+    ############################################################################
+    # Handle rounds of simulation.
+    ############################################################################
+    def run(self, num_rounds: int) -> Dict[str, Any]:
+        """Run the simulation for the given number of rounds.
+
+        Return the same statistics as simulation.Simulation.run. Idle rounds
+        are skipped if the configuration set 'fast_forward' to True, and a
+        later run carries on from where this one stopped, as for
+        Simulation.run.
+
+        Precondition: num_rounds >= 1.
+        """
+        end = self.num_rounds + num_rounds
+        while self.num_rounds < end:
+            now = self.num_rounds
+            self.num_rounds += 1
+
+            # Stage 1: generate new arrivals
+            self._call_stage('arrivals', self._generate_arrivals, now)
+
+            # Stage 2: leave elevators
+            self._call_stage('leaving', self._handle_leaving, now)
+
+            # Stage 3: board elevators
+            self._call_stage('boarding', self._handle_boarding, now)
+
+            # Stage 4: move the elevators using the moving algorithm
+            self._call_stage('moving', self._move_elevators)
+
+            if self.recorder is not None:
+                self._record_round(now)
+
+            if self._fast_forward and self._is_idle():
+                self._skip_idle_rounds(end)
+
+        if self.recorder is not None:
+            self.recorder.flush()
+        finish_run(self, self._stage_hooks)
+        return self._calculate_stats()
+
+    def add_stage_hook(self, hook: Any) -> None:
+        """Register <hook> to observe the stages of this simulation's runs.
+
+        <hook> is a profiling.StageHook, or a function called with the
+        stage name, round number and time taken whenever a stage finishes.
+        """
+        self._stage_hooks.append(as_hook(hook))
+
+    def remove_stage_hook(self, hook: Any) -> None:
+        """Stop <hook> from observing this simulation's runs.
+
+        Raise ValueError if <hook> is not registered.
+        """
+        for registered in self._stage_hooks:
+            if registered is hook or getattr(registered, 'callback',
+                                             None) is hook:
+                self._stage_hooks.remove(registered)
+                return
+        raise ValueError('hook is not registered')
+
+    def _call_stage(self, stage: str, function: Callable, *args: Any) -> Any:
+        """Call <function> with <args> as <stage> of the current round, and
+        return what it returns, as for simulation.Simulation._call_stage.
+        """
+        if not self._stage_hooks:
+            return function(*args)
+        return call_stage(self._stage_hooks, stage, self.num_rounds - 1,
+                          function, *args)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this simulation for pickling, without its
+        recorder or stage hooks, as for simulation.Simulation.
+        """
+        state = self.__dict__.copy()
+        state['recorder'] = None
+        state['_stage_hooks'] = []
+        return state
+
+    def _generate_arrivals(self, now: int) -> None:
+        """Add the arrivals for round <now> to the person arrays."""
+        starts, targets = arrival_arrays(self.arrival_generator, now)
+        if len(starts) == 0:
+            return
+        self._add_people(now, starts, targets)
+        self._total_people += len(starts)
+
+    def _add_waits(self, people: np.ndarray, waits: np.ndarray) -> None:
+        """Add the wait times <waits> to this simulation's summary."""
+        waits, counts = np.unique(waits, return_counts=True)
+        self.wait_stats.add_counts(waits.tolist(), counts.tolist())
+
+    def _is_idle(self) -> bool:
+        """Return whether this simulation is idle: nobody is waiting or
+        riding, and the moving algorithm is deterministic, so the elevators
+        stay where they are until somebody arrives.
+        """
+        deterministic = getattr(self.moving_algorithm, 'deterministic',
+                                False)
+        return deterministic and self._size == self._num_done
+
+    def _skip_idle_rounds(self, end: int) -> None:
+        """Skip the rounds up to the next round in which somebody arrives,
+        or up to round <end>, if that comes first.
+
+        Precondition: this simulation is idle.
+        """
+        next_round = self.arrival_generator.next_arrival_round(
+            self.num_rounds)
+        if next_round is None or next_round > end:
+            next_round = end
+        self.num_rounds = max(self.num_rounds, next_round)
+
+    def _record_round(self, now: int) -> None:
+        """Record this round's metrics with this simulation's recorder."""
+        waiting = self._state[:self._size] == WAITING
+        counts = np.bincount(self._start[:self._size][waiting],
+                             minlength=self.num_floors + 1)
+        self.recorder.record(now, self._total_people, self.wait_stats.count,
+                             counts[1:].tolist(), self.current_floor.tolist(),
+                             self.load.tolist())
+
+    ############################################################################
+    # Statistics calculations
+    ############################################################################
+    def _calculate_stats(self) -> Dict[str, Any]:
+        """Report the statistics for the current run of this simulation.
+
+        If nobody has completed their journey, all of the wait time
+        statistics are -1.
+        """
+        stats = {
+            'num_iterations': self.num_rounds,
+            'total_people': self._total_people,
+            'people_completed': self.wait_stats.count
+        }
+        stats.update(self.wait_stats.report())
+        return stats
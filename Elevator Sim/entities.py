@@ -15,41 +15,201 @@ methods we have provided. However, you can (and should) add new attributes,
 and of course you'll have to implement the methods we've provided, as well
 as add your own methods to complete this assignment.
 
-Finally, note that Person and Elevator each inherit from a kind of sprite found
-in sprites.py; this is to enable their instances to be visualized properly.
-You may not change sprites.py, but are responsible for reading the documentation
-to understand these classes, as well as the abstract methods your classes must
-implement.
+Person and Elevator are plain data classes with no dependency on pygame, so a
+headless simulation never builds a Surface or decodes an image for them.
+When a Visualizer is rendering, it attaches a sprite from sprites.py to each
+entity the first time it is drawn (see the `sprite` attribute below); until
+then `sprite` is None. Sprites are left out when an entity is pickled (for
+example in a checkpoint), so they are attached again when it is next drawn.
 """
 from __future__ import annotations
-from typing import List
-from sprites import PersonSprite, ElevatorSprite
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 
-class Elevator(ElevatorSprite):
+def _slot_state(entity: Any) -> Dict[str, Any]:
+    """Return the pickled state of <entity>, a Person or Elevator: its slots,
+    with its sprite left out.
+    """
+    state = {name: getattr(entity, name) for name in entity.__slots__}
+    state['sprite'] = None
+    return state
+
+
+def _set_slot_state(entity: Any, state: Dict[str, Any]) -> None:
+    """Restore <entity> from the state returned by _slot_state."""
+    for name, value in state.items():
+        setattr(entity, name, value)
+
+
+class RoundClock:
+    """The current round of a simulation, shared by all of its people.
+
+    People record the rounds in which they arrive and complete their journey,
+    and compute how long they have been waiting from this clock, so no
+    per-person bookkeeping is needed as rounds pass.
+
+    === Attributes ===
+    now: the current round number, or, between runs, the number of rounds
+         simulated
+    """
+    __slots__ = ('now',)
+    now: int
+
+    def __init__(self) -> None:
+        self.now = 0
+
+
+class Elevator:
     """An elevator in the elevator simulation.
 
     Remember to add additional documentation to this class docstring
     as you add new attributes (and representation invariants).
 
     === Attributes ===
-    passengers: A list of the people currently on this elevator
+    passengers: A tuple of the people currently on this elevator, in the
+                order they boarded (computed on demand)
     max_capacity: The maximum number of people that can board the elevator
     current_floor: The current floor that the elevator is on
     target_floor: The desired floor that the elevator will move to
+    sprite: the ElevatorSprite drawing this elevator, or None if this
+            elevator has not been visualized
+
+    passengers used to be a list that callers added people to and removed
+    them from directly. It is now read-only, because the passengers are kept
+    grouped by their target floor: people get on through board and off
+    through unload. Appending to passengers or assigning to it raises an
+    error rather than being silently ignored.
+
+    === Private Attributes ===
+    _by_target: the passengers, grouped by the floor they want to go to
+                (each group in the order they boarded)
+    _targets: the keys of _by_target, in increasing order
+    _aboard: the passengers
+    _order: every passenger, in the order they boarded, possibly along with
+            people who have since left
 
     === Representation invariants ===
+    Every list in _by_target is non-empty.
+    _aboard is exactly the set of people in the lists in _by_target.
+    Every person in _aboard appears once in _order.
     """
-    passengers: List[Person]
+    __slots__ = ('max_capacity', 'current_floor', 'target_floor', 'sprite',
+                 '_by_target', '_targets', '_aboard', '_order')
     max_capacity: int
     current_floor: int
     target_floor: int
+    sprite: Any
+    _by_target: Dict[int, List[Person]]
+    _targets: List[int]
+    _aboard: Set[Person]
+    _order: Deque[Person]
 
     def __init__(self, max_capacity: int):
-        self.passengers = []
         self.current_floor = 1
         self.max_capacity = max_capacity
-        ElevatorSprite.__init__(self)
+        self.target_floor = 0
+        self.sprite = None
+        self._by_target = {}
+        self._targets = []
+        self._aboard = set()
+        self._order = deque()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this elevator for pickling, without its
+        sprite.
+        """
+        return _slot_state(self)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore this elevator from a pickled state."""
+        _set_slot_state(self, state)
+
+    @property
+    def passengers(self) -> Tuple[Person, ...]:
+        """The people on this elevator, in the order they boarded."""
+        return tuple(person for person in self._order
+                     if person in self._aboard)
+
+    def num_passengers(self) -> int:
+        """Return the number of people on this elevator."""
+        return len(self._aboard)
+
+    def board(self, person: Person) -> None:
+        """Add <person> to the passengers of this elevator.
+
+        Precondition: this elevator is not full.
+        """
+        group = self._by_target.get(person.target)
+        if group is None:
+            self._by_target[person.target] = [person]
+            self._targets.insert(bisect_left(self._targets, person.target),
+                                 person.target)
+        else:
+            group.append(person)
+        self._aboard.add(person)
+        self._order.append(person)
+
+    def unload(self, floor: int) -> List[Person]:
+        """Remove and return the passengers whose target is <floor>, in the
+        order they boarded.
+
+        >>> elevator = Elevator(3)
+        >>> ann, ben, cat = Person(1, 4), Person(1, 2), Person(1, 4)
+        >>> for person in [ann, ben, cat]:
+        ...     elevator.board(person)
+        >>> elevator.unload(4) == [ann, cat]
+        True
+        >>> elevator.passengers == (ben,)
+        True
+        """
+        group = self._by_target.pop(floor, None)
+        if group is None:
+            return []
+        del self._targets[bisect_left(self._targets, floor)]
+        self._aboard.difference_update(group)
+        if len(self._order) > 2 * len(self._aboard):
+            self._order = deque(self.passengers)
+        else:
+            self._drop_departed()
+        return group
+
+    def first_passenger(self) -> Optional[Person]:
+        """Return the passenger who boarded this elevator first, or None if
+        it is empty.
+        """
+        self._drop_departed()
+        return self._order[0] if self._order else None
+
+    def nearest_target(self, floor: int) -> Optional[int]:
+        """Return the target floor of a passenger that is closest to
+        <floor>, or None if this elevator is empty.
+
+        Ties are broken in favour of the lower floor.
+
+        >>> elevator = Elevator(3)
+        >>> for target in [2, 6, 9]:
+        ...     elevator.board(Person(1, target))
+        >>> elevator.nearest_target(4)
+        2
+        >>> elevator.nearest_target(8)
+        9
+        """
+        i = bisect_left(self._targets, floor)
+        if i == len(self._targets):
+            return self._targets[-1] if self._targets else None
+        if i == 0 or self._targets[i] == floor:
+            return self._targets[i]
+        lower, upper = self._targets[i - 1], self._targets[i]
+        return lower if floor - lower <= upper - floor else upper
+
+    def _drop_departed(self) -> None:
+        """Remove people who have left this elevator from the front of
+        _order.
+        """
+        while self._order and self._order[0] not in self._aboard:
+            self._order.popleft()
 
     def fullness(self) -> float:
         """Return the fraction that this elevator is filled.
@@ -57,34 +217,99 @@ class Elevator(ElevatorSprite):
         The value returned should be a float between 0.0 (completely empty) and
         1.0 (completely full).
         """
-        return (len(self.passengers) * 1.0) / self.max_capacity
+        return (len(self._aboard) * 1.0) / self.max_capacity
 
 
-class Person(PersonSprite):
+class Person:
     """A person in the elevator simulation.
 
     === Attributes ===
     start: the floor this person started on
     target: the floor this person wants to go to
     wait_time: the number of rounds this person has been waiting
+               (computed from arrival_round; see below)
     complete: A boolean tracking whether or not the person has completed
     their journey
+    arrival_round: the round this person arrived in
+    completion_round: the round this person completed their journey in,
+                      or None if they have not completed it
+    clock: the clock of the simulation this person is in, or None if this
+           person has not arrived in a simulation
+    sprite: the PersonSprite drawing this person, or None if this person
+            has not been visualized
+
+    wait_time is not stored: it is the number of rounds from arrival_round
+    to completion_round, or to the current round of <clock> if this person
+    is still travelling (with a missing clock counting as round 0).
+
     === Representation invariants ===
     start >= 1
     target >= 1
     wait_time >= 0
     """
+    __slots__ = ('start', 'target', 'complete', 'arrival_round',
+                 'completion_round', 'clock', 'sprite')
     start: int
     target: int
-    wait_time: int
     complete: bool
+    arrival_round: int
+    completion_round: Optional[int]
+    clock: Optional[RoundClock]
+    sprite: Any
 
     def __init__(self, start_floor: int, target_floor: int):
         self.start = start_floor
         self.target = target_floor
-        self.wait_time = 0
-        PersonSprite.__init__(self)
         self.complete = False
+        self.arrival_round = 0
+        self.completion_round = None
+        self.clock = None
+        self.sprite = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this person for pickling, without their
+        sprite.
+        """
+        return _slot_state(self)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore this person from a pickled state."""
+        _set_slot_state(self, state)
+
+    def arrive(self, clock: RoundClock) -> None:
+        """Record that this person arrives in the simulation with the given
+        clock, in its current round.
+        """
+        self.clock = clock
+        self.arrival_round = clock.now
+
+    def finish(self) -> None:
+        """Record that this person completes their journey in the current
+        round.
+        """
+        self.complete = True
+        self.completion_round = self._now()
+
+    @property
+    def wait_time(self) -> int:
+        """The number of rounds this person has been waiting."""
+        if self.completion_round is not None:
+            return self.completion_round - self.arrival_round
+        return self._now() - self.arrival_round
+
+    @wait_time.setter
+    def wait_time(self, value: int) -> None:
+        """Set the number of rounds this person has been waiting, by moving
+        their arrival round.
+        """
+        if self.completion_round is not None:
+            self.arrival_round = self.completion_round - value
+        else:
+            self.arrival_round = self._now() - value
+
+    def _now(self) -> int:
+        """Return the current round of this person's clock."""
+        return 0 if self.clock is None else self.clock.now
 
     def get_anger_level(self) -> int:
         """Return this person's anger level.
@@ -119,13 +344,14 @@ class Person(PersonSprite):
         >>> bill.get_anger_level()
         4
         """
-        if self.wait_time < 3:
+        wait_time = self.wait_time
+        if wait_time < 3:
             return 0
-        elif self.wait_time < 5:
+        elif wait_time < 5:
             return 1
-        elif self.wait_time < 7:
+        elif wait_time < 7:
             return 2
-        elif self.wait_time < 9:
+        elif wait_time < 9:
             return 3
         else:
             return 4
@@ -133,20 +359,32 @@ class Person(PersonSprite):
     def increase_wait_time(self) -> None:
         """Increases the wait time of the person by 1 for every round that
         they are not yet at their destination.
+
+        Simulations do not need to call this: a person's wait time grows on
+        its own as their clock advances.
         >>> david = Person(1,3)
         >>> david.complete = True
         >>> david.increase_wait_time()
         >>> david.wait_time
         0
+        >>> clock = RoundClock()
+        >>> eve = Person(2, 4)
+        >>> eve.arrive(clock)
+        >>> clock.now += 3
+        >>> eve.wait_time
+        3
+        >>> eve.finish()
+        >>> clock.now += 3
+        >>> eve.wait_time
+        3
         """
         if not self.complete:
-            self.wait_time += 1
+            self.arrival_round -= 1
 
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['sprites'],
         'max-nested-blocks': 4
     })
@@ -0,0 +1,191 @@
+"""CSC148 Assignment 1 - Frame export
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module renders a simulation run to a sequence of PNG frames, one per
+round, without a display, and can join them into a video with ffmpeg.
+
+The run is first simulated once to collect a renderer snapshot of every
+round (see renderer.py); this is cheap, since no drawing happens. The
+snapshots are then split into ranges of consecutive rounds, and each range
+is drawn onto an offscreen surface with renderer.draw_snapshot and saved by
+a worker process. Workers use SDL's dummy video driver, so frames can be
+exported on machines without a display. They are started with the spawn
+method rather than forked, since forking a process that has already started
+SDL can deadlock.
+
+Frames are not built from sprites.ElevatorSprite and sprites.PersonSprite:
+those draw a live Elevator or Person, which a snapshot no longer has.
+draw_snapshot draws with the same cached person images (sprites.person_image),
+colours and geometry as the sprite classes, so an elevator, person or floor
+looks the same as in the Visualizer, without building a sprite for every
+entity in every frame.
+
+Frames are named frame_000000.png, frame_000001.png, ... in round order.
+
+Run this file directly to export a run recorded with replay.py, for
+example:
+
+    python export_frames.py run.log --capacity 5 --rounds 200 \\
+        --output frames --video run.mp4
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+from typing import Any, List, Optional, Tuple
+
+from renderer import Snapshot, SnapshotPublisher, draw_snapshot, screen_size
+
+# The name of each frame file, in the %-format of its index that ffmpeg
+# also reads.
+FRAME_NAME = 'frame_%06d.png'
+
+
+def collect_snapshots(simulation: Any, num_rounds: int) -> List[Snapshot]:
+    """Run <simulation> for <num_rounds> rounds and return the snapshot of
+    every round simulated, in order.
+
+    The simulation's visualizer is put back when the run is over.
+    """
+    snapshot_queue = queue.Queue()
+    publisher = SnapshotPublisher(snapshot_queue)
+    publisher.attach(simulation)
+    visualizer = simulation.visualizer
+    simulation.visualizer = publisher
+    try:
+        simulation.run(num_rounds)
+    finally:
+        simulation.visualizer = visualizer
+    snapshots = []
+    while not snapshot_queue.empty():
+        snapshots.append(snapshot_queue.get_nowait())
+    return snapshots
+
+
+def replay_snapshots(filename: str, capacity: int,
+                     num_rounds: int) -> List[Snapshot]:
+    """Return the snapshot of every round of the run recorded in the replay
+    log <filename>, replayed for <num_rounds> rounds with elevators of the
+    given capacity.
+
+    Raise ValueError if the log records no elevator moves.
+    """
+    from replay import ReplayAlgorithm, ReplayArrivals, read_log
+    from simulation import Simulation
+    log = read_log(filename)
+    if not log.moves:
+        raise ValueError(f'{filename} records no elevator moves')
+    config = {
+        'num_floors': log.max_floor,
+        'num_elevators': len(next(iter(log.moves.values()))),
+        'elevator_capacity': capacity,
+        'arrival_generator': ReplayArrivals(log),
+        'moving_algorithm': ReplayAlgorithm(log),
+        'visualize': False
+    }
+    return collect_snapshots(Simulation(config), num_rounds)
+
+
+def _init_worker() -> None:
+    """Prepare this process to draw without a display or sound card.
+
+    This must run before pygame is imported in the process.
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+
+def _render_range(task: Tuple[int, List[Snapshot], str]) -> int:
+    """Save frames for the snapshots of a task, given as (index of the
+    first frame, snapshots, directory), and return the number saved.
+    """
+    import pygame
+    first, snapshots, directory = task
+    surface = None
+    for i, snapshot in enumerate(snapshots):
+        if surface is None:
+            surface = pygame.Surface(screen_size(snapshot[1]))
+        draw_snapshot(surface, snapshot)
+        pygame.image.save(surface,
+                          os.path.join(directory, FRAME_NAME % (first + i)))
+    return len(snapshots)
+
+
+def export_frames(snapshots: List[Snapshot], directory: str,
+                  processes: Optional[int] = None,
+                  chunk_rounds: Optional[int] = None) -> int:
+    """Save a PNG frame for each snapshot in <snapshots> into <directory>,
+    which is created if needed, and return the number of frames saved.
+
+    The frames are drawn by <processes> worker processes (by default, one
+    per CPU), each taking <chunk_rounds> consecutive rounds at a time (by
+    default, an equal share for each process). With processes == 1, they
+    are drawn in this process.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if not snapshots:
+        return 0
+    workers = processes or os.cpu_count() or 1
+    if chunk_rounds is None:
+        chunk_rounds = math.ceil(len(snapshots) / workers)
+    tasks = [(start, snapshots[start:start + chunk_rounds], directory)
+             for start in range(0, len(snapshots), chunk_rounds)]
+    if processes == 1:
+        _init_worker()
+        return sum(map(_render_range, tasks))
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=_init_worker) as pool:
+        return sum(pool.imap_unordered(_render_range, tasks))
+
+
+def encode_video(directory: str, output: str, fps: int = 10) -> None:
+    """Join the frames saved in <directory> into the video <output> with
+    ffmpeg, at <fps> frames per second.
+
+    Raise RuntimeError if ffmpeg is not installed or fails.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError('ffmpeg was not found')
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps),
+               '-i', os.path.join(directory, FRAME_NAME),
+               '-pix_fmt', 'yuv420p', output]
+    if subprocess.run(command).returncode != 0:
+        raise RuntimeError(f'ffmpeg could not encode {output}')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Export the frames of the run described by the command-line arguments
+    <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Render a recorded elevator simulation to PNG frames.')
+    parser.add_argument('log', help='replay log of the run')
+    parser.add_argument('--capacity', type=int, required=True,
+                        help='capacity of the elevators in the run')
+    parser.add_argument('--rounds', type=int, required=True)
+    parser.add_argument('--output', default='frames',
+                        help='directory to save the frames in')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--video', default=None,
+                        help='video file to encode the frames into')
+    parser.add_argument('--fps', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    snapshots = replay_snapshots(args.log, args.capacity, args.rounds)
+    count = export_frames(snapshots, args.output, args.processes)
+    print(f'{count} frames saved to {args.output}')
+    if args.video is not None:
+        encode_video(args.output, args.video, args.fps)
+        print(f'video written to {args.video}')
+
+
+if __name__ == '__main__':
+    main()
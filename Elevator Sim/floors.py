@@ -0,0 +1,308 @@
+"""CSC148 Assignment 1 - Floor queues
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains FloorQueues, the structure a Simulation uses to hold the
+people waiting for an elevator on each floor.
+
+Each floor's people are kept in a first-in-first-out queue, so arrivals and
+boardings take constant time however long the queue is. Only floors where
+somebody is waiting have a queue stored, so a tall building with a handful of
+busy floors costs no more than a short one.
+
+FloorQueues can also be used like the dictionary that Simulation.waiting used
+to be: its keys are every floor number, and looking up a floor gives the
+queue of people waiting there, earliest arrival first. The queues are
+PersonQueues, which compare equal to lists and can be sliced like them, so
+moving algorithms written against the dictionary of lists (for example,
+testing `waiting[floor] == []`) keep working.
+
+FloorQueues also keeps a FloorIndex of the floors where somebody is waiting,
+which moving algorithms use to find the lowest such floor, or the one
+nearest to an elevator, in O(log n) time for a building with n floors.
+"""
+from collections import deque
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+from entities import Person
+
+
+class FloorIndex:
+    """A set of floor numbers supporting ordered queries in O(log n) time.
+
+    The set is stored as a Fenwick (binary indexed) tree over the floors,
+    where each floor counts 1 if it is in the set and 0 otherwise.
+
+    >>> index = FloorIndex(10)
+    >>> index.add(7)
+    >>> index.add(3)
+    >>> index.lowest()
+    3
+    >>> index.nearest(6)
+    7
+    >>> index.nearest(5)
+    3
+    >>> index.discard(3)
+    >>> index.below(6) is None
+    True
+
+    === Attributes ===
+    num_floors: the highest floor number that can be in the set
+
+    === Private Attributes ===
+    _tree: the Fenwick tree; _tree[0] is unused
+    _members: whether each floor is in the set; _members[0] is unused
+    _size: the number of floors in the set
+    _top_bit: the largest power of two that is at most num_floors
+    """
+    num_floors: int
+    _tree: List[int]
+    _members: List[bool]
+    _size: int
+    _top_bit: int
+
+    def __init__(self, num_floors: int) -> None:
+        """Initialize an empty set of floors numbered 1 to <num_floors>."""
+        self.num_floors = num_floors
+        self._tree = [0] * (num_floors + 1)
+        self._members = [False] * (num_floors + 1)
+        self._size = 0
+        self._top_bit = 1
+        while self._top_bit * 2 <= num_floors:
+            self._top_bit *= 2
+
+    def add(self, floor: int) -> None:
+        """Add <floor> to this set, if it is not already in it."""
+        if not self._members[floor]:
+            self._members[floor] = True
+            self._size += 1
+            self._update(floor, 1)
+
+    def discard(self, floor: int) -> None:
+        """Remove <floor> from this set, if it is in it."""
+        if self._members[floor]:
+            self._members[floor] = False
+            self._size -= 1
+            self._update(floor, -1)
+
+    def __contains__(self, floor: int) -> bool:
+        """Return whether <floor> is in this set."""
+        return 1 <= floor <= self.num_floors and self._members[floor]
+
+    def __len__(self) -> int:
+        """Return the number of floors in this set."""
+        return self._size
+
+    def lowest(self) -> Optional[int]:
+        """Return the lowest floor in this set, or None if it is empty."""
+        if self._size == 0:
+            return None
+        return self._kth(1)
+
+    def below(self, floor: int) -> Optional[int]:
+        """Return the highest floor in this set that is at most <floor>,
+        or None if there is no such floor.
+        """
+        count = self._prefix(min(floor, self.num_floors))
+        if count == 0:
+            return None
+        return self._kth(count)
+
+    def above(self, floor: int) -> Optional[int]:
+        """Return the lowest floor in this set that is at least <floor>,
+        or None if there is no such floor.
+        """
+        count = self._prefix(min(max(floor - 1, 0), self.num_floors))
+        if count == self._size:
+            return None
+        return self._kth(count + 1)
+
+    def nearest(self, floor: int) -> Optional[int]:
+        """Return the floor in this set closest to <floor>, or None if this
+        set is empty.
+
+        Ties are broken in favour of the lower floor.
+        """
+        lower = self.below(floor)
+        upper = self.above(floor)
+        if lower is None:
+            return upper
+        if upper is None or floor - lower <= upper - floor:
+            return lower
+        return upper
+
+    def _update(self, floor: int, delta: int) -> None:
+        """Add <delta> to the count of <floor> in the tree."""
+        while floor <= self.num_floors:
+            self._tree[floor] += delta
+            floor += floor & -floor
+
+    def _prefix(self, floor: int) -> int:
+        """Return the number of floors in this set that are at most
+        <floor>.
+        """
+        total = 0
+        while floor > 0:
+            total += self._tree[floor]
+            floor -= floor & -floor
+        return total
+
+    def _kth(self, k: int) -> int:
+        """Return the <k>th lowest floor in this set.
+
+        Precondition: 1 <= k <= len(self)
+        """
+        floor = 0
+        bit = self._top_bit
+        while bit > 0:
+            step = floor + bit
+            if step <= self.num_floors and self._tree[step] < k:
+                floor = step
+                k -= self._tree[step]
+            bit //= 2
+        return floor + 1
+
+
+class PersonQueue(deque):
+    """A first-in-first-out queue of people that also behaves like a list
+    where lists used to be used.
+
+    It compares equal to any list, tuple or deque of the same people in the
+    same order, and slicing it gives a list.
+
+    >>> PersonQueue() == []
+    True
+    >>> PersonQueue([1, 2, 3])[1:]
+    [2, 3]
+    """
+    # Mutable, like a list.
+    __hash__ = None
+
+    def __eq__(self, other: Any) -> bool:
+        """Return whether <other> is a sequence of the same items in the
+        same order as this queue.
+        """
+        if not isinstance(other, (list, tuple, deque)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(mine == theirs for mine, theirs in zip(self, other))
+
+    def __ne__(self, other: Any) -> bool:
+        """Return whether <other> differs from this queue."""
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """Return the item at <index>, or a list of the items in the slice
+        <index>.
+        """
+        if isinstance(index, slice):
+            return list(self)[index]
+        return deque.__getitem__(self, index)
+
+
+class FloorQueues(Mapping[int, PersonQueue]):
+    """The queues of people waiting on each floor of a building.
+
+    The queues returned by lookups must not be modified directly: use
+    enqueue and dequeue, which also keep the counts up to date.
+
+    === Attributes ===
+    num_floors: the number of floors in the building
+    occupied_floors: the floors where somebody is waiting
+
+    === Private Attributes ===
+    _queues: the queue of each floor where somebody is waiting
+    _total: the number of people waiting on all floors
+
+    === Representation invariants ===
+    Every queue in _queues is non-empty.
+    The floors in occupied_floors are exactly the keys of _queues.
+    _total is the sum of the lengths of the queues in _queues.
+    """
+    num_floors: int
+    occupied_floors: FloorIndex
+    _queues: Dict[int, PersonQueue]
+    _total: int
+
+    def __init__(self, num_floors: int) -> None:
+        """Initialize empty queues for a building with <num_floors> floors."""
+        self.num_floors = num_floors
+        self.occupied_floors = FloorIndex(num_floors)
+        self._queues = {}
+        self._total = 0
+
+    def enqueue(self, floor: int, person: Person) -> None:
+        """Add <person> to the back of the queue on <floor>."""
+        queue = self._queues.get(floor)
+        if queue is None:
+            queue = PersonQueue()
+            self._queues[floor] = queue
+            self.occupied_floors.add(floor)
+        queue.append(person)
+        self._total += 1
+
+    def dequeue(self, floor: int) -> Person:
+        """Remove and return the person at the front of the queue on <floor>.
+
+        Precondition: somebody is waiting on <floor>.
+        """
+        queue = self._queues[floor]
+        person = queue.popleft()
+        if not queue:
+            del self._queues[floor]
+            self.occupied_floors.discard(floor)
+        self._total -= 1
+        return person
+
+    def count(self, floor: int) -> int:
+        """Return the number of people waiting on <floor>."""
+        queue = self._queues.get(floor)
+        return 0 if queue is None else len(queue)
+
+    def total(self) -> int:
+        """Return the number of people waiting on all floors."""
+        return self._total
+
+    def lowest_occupied(self) -> Optional[int]:
+        """Return the lowest floor where somebody is waiting, or None if
+        nobody is waiting.
+        """
+        return self.occupied_floors.lowest()
+
+    def nearest_occupied(self, floor: int) -> Optional[int]:
+        """Return the floor closest to <floor> where somebody is waiting, or
+        None if nobody is waiting.
+
+        Ties are broken in favour of the lower floor.
+        """
+        return self.occupied_floors.nearest(floor)
+
+    def occupied(self) -> Iterator[int]:
+        """Iterate over the floors where somebody is waiting, in no
+        particular order.
+        """
+        return iter(self._queues)
+
+    def __getitem__(self, floor: int) -> PersonQueue:
+        """Return the queue of people waiting on <floor>.
+
+        Raise KeyError if <floor> is not a floor of this building.
+        """
+        queue = self._queues.get(floor)
+        if queue is not None:
+            return queue
+        if not 1 <= floor <= self.num_floors:
+            raise KeyError(floor)
+        return PersonQueue()
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over every floor number, from the bottom up."""
+        return iter(range(1, self.num_floors + 1))
+
+    def __len__(self) -> int:
+        """Return the number of floors."""
+        return self.num_floors
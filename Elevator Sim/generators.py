@@ -0,0 +1,404 @@
+"""CSC148 Assignment 1 - Vectorized arrival generators
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains arrival generators that draw all of a round's people at
+once with NumPy, for load tests with thousands of arrivals per round.
+
+Besides generate, each generator here has a generate_arrays method returning
+the start and target floors as arrays, which engine.ArraySimulation uses to
+avoid creating Person objects at all.
+
+Every generator takes an explicit seed. Arrivals are drawn from random
+streams derived from the seed and the round (or block of rounds) they belong
+to, so a generator with a given seed produces exactly the same arrivals for
+a round whatever order rounds are generated in.
+
+PoissonArrivals models a building over a working day: each DemandProfile
+(morning up-peak, lunchtime two-way traffic, evening down-peak) contributes
+Poisson arrivals on every floor at a rate that rises and falls around its
+peak, and sends them to destinations drawn from its origin-destination
+matrix.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from algorithms import ArrivalGenerator
+from entities import Person
+
+
+def _stream(seed: int, key: int) -> np.random.Generator:
+    """Return the random stream numbered <key> for the given seed."""
+    return np.random.default_rng(
+        np.random.SeedSequence(seed, spawn_key=(key,)))
+
+
+def people_by_floor(starts: np.ndarray,
+                    targets: np.ndarray) -> Dict[int, List[Person]]:
+    """Return the people with the given start and target floors, mapped from
+    start floor to the people starting there.
+    """
+    newcomers = {}
+    for start, target in zip(starts.tolist(), targets.tolist()):
+        if start in newcomers:
+            newcomers[start].append(Person(start, target))
+        else:
+            newcomers[start] = [Person(start, target)]
+    return newcomers
+
+
+def random_targets(rng: np.random.Generator, starts: np.ndarray,
+                   max_floor: int) -> np.ndarray:
+    """Return a target floor for each start floor, uniformly chosen among
+    the other floors from 1 to <max_floor>.
+
+    The target is drawn from max_floor - 1 values and shifted past the start
+    floor, so no draws are ever rejected.
+    """
+    targets = rng.integers(1, max_floor, size=starts.shape)
+    targets += targets >= starts
+    return targets
+
+
+class VectorRandomArrivals(ArrivalGenerator):
+    """Generate a fixed number of random people each round, like
+    algorithms.RandomArrivals, drawing each round's people in one step.
+
+    People are drawn <block_rounds> rounds at a time: the first request for a
+    round in a block draws the whole block, and later rounds in the block are
+    served from it. The arrivals for a round depend only on the seed and
+    block_rounds.
+
+    === Attributes ===
+    seed: the seed for the generator's random streams
+    block_rounds: the number of rounds drawn at once
+
+    === Private Attributes ===
+    _block: the index of the block in _starts and _targets, or -1
+    _starts: the start floors for each round of the current block
+    _targets: the target floors for each round of the current block
+
+    === Representation invariants ===
+    block_rounds >= 1
+    """
+    seed: int
+    block_rounds: int
+    _block: int
+    _starts: np.ndarray
+    _targets: np.ndarray
+
+    def __init__(self, max_floor: int, num_people: Optional[int],
+                 seed: Optional[int] = None, block_rounds: int = 1) -> None:
+        """Initialize a new VectorRandomArrivals.
+
+        If <seed> is None, a random seed is chosen, so the arrivals are still
+        consistent within this generator but differ between generators.
+
+        Preconditions:
+            max_floor >= 2
+            num_people is None or num_people >= 0
+            block_rounds >= 1
+        """
+        ArrivalGenerator.__init__(self, max_floor, num_people)
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy)
+        self.seed = seed
+        self.block_rounds = block_rounds
+        self._block = -1
+        self._starts = np.zeros((0, 0), dtype=np.int64)
+        self._targets = np.zeros((0, 0), dtype=np.int64)
+
+    def generate_arrays(self, round_num: int) -> Tuple[np.ndarray,
+                                                       np.ndarray]:
+        """Return the start and target floors of the people arriving at the
+        given round.
+        """
+        block, row = divmod(round_num, self.block_rounds)
+        if block != self._block:
+            rng = _stream(self.seed, block)
+            shape = (self.block_rounds, self.num_people or 0)
+            self._starts = rng.integers(1, self.max_floor + 1, size=shape)
+            self._targets = random_targets(rng, self._starts, self.max_floor)
+            self._block = block
+        return self._starts[row], self._targets[row]
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return <round_num> if people arrive every round, or None if
+        nobody ever arrives.
+        """
+        return round_num if self.num_people else None
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        The returned dictionary maps floor number to the people who
+        arrived starting at that floor.
+        """
+        return people_by_floor(*self.generate_arrays(round_num))
+
+
+class DemandProfile:
+    """A pattern of traffic whose intensity rises and falls around a peak.
+
+    The expected number of people arriving on floor f in round r is
+        rate(r) * origins[f - 1]
+    where rate(r) follows a bell curve centred on <peak_round>, and each of
+    them travels to floor g with probability destinations[f - 1, g - 1].
+
+    === Attributes ===
+    name: a short description of this profile
+    peak_round: the round in which traffic is heaviest
+    width: the standard deviation of the bell curve, in rounds
+    peak_rate: the expected number of arrivals in the whole building in
+               <peak_round>
+    origins: the share of this profile's arrivals starting on each floor
+    destinations: the origin-destination matrix
+
+    === Private Attributes ===
+    _floors: the floor numbers, from 1 to the number of floors
+    _cdf: the cumulative sums of each row of <destinations>, with row i
+          shifted up by i, flattened; see sample_destinations
+
+    === Representation invariants ===
+    width > 0
+    peak_rate >= 0
+    origins sums to 1.
+    Every row of destinations sums to 1 and has a 0 on the diagonal.
+    """
+    name: str
+    peak_round: float
+    width: float
+    peak_rate: float
+    origins: np.ndarray
+    destinations: np.ndarray
+    _floors: np.ndarray
+    _cdf: np.ndarray
+
+    def __init__(self, name: str, peak_round: float, width: float,
+                 peak_rate: float, origins: np.ndarray,
+                 destinations: np.ndarray) -> None:
+        """Initialize a new profile.
+
+        <origins> and the rows of <destinations> are rescaled to sum to 1,
+        and travel from a floor to itself is removed.
+
+        Preconditions:
+            width > 0
+            peak_rate >= 0
+            origins and every row of destinations have a positive entry
+            (apart from the diagonal)
+        """
+        self.name = name
+        self.peak_round = peak_round
+        self.width = width
+        self.peak_rate = peak_rate
+        self.origins = np.asarray(origins, dtype=float)
+        self.origins = self.origins / self.origins.sum()
+        destinations = np.array(destinations, dtype=float)
+        np.fill_diagonal(destinations, 0.0)
+        self.destinations = \
+            destinations / destinations.sum(axis=1, keepdims=True)
+
+        num_floors = len(self.origins)
+        self._floors = np.arange(1, num_floors + 1)
+        cdf = np.cumsum(self.destinations, axis=1)
+        cdf[:, -1] = 1.0
+        self._cdf = (cdf + np.arange(num_floors)[:, np.newaxis]).ravel()
+
+    def rate(self, rounds: np.ndarray) -> np.ndarray:
+        """Return the expected number of arrivals in the whole building in
+        each of <rounds>.
+        """
+        return self.peak_rate * np.exp(
+            -0.5 * ((rounds - self.peak_round) / self.width) ** 2)
+
+    def sample(self, rng: np.random.Generator, rounds: np.ndarray
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the arrivals of this profile in each of <rounds>.
+
+        Three arrays are returned, with one entry per person: the index in
+        <rounds> of the round they arrive in, and their start and target
+        floors. People are listed in order of round.
+        """
+        counts = rng.poisson(np.outer(self.rate(rounds), self.origins))
+        starts = np.repeat(np.tile(self._floors, len(rounds)),
+                           counts.ravel())
+        indices = np.repeat(np.arange(len(rounds)), counts.sum(axis=1))
+        return indices, starts, self.sample_destinations(rng, starts)
+
+    def sample_destinations(self, rng: np.random.Generator,
+                            starts: np.ndarray) -> np.ndarray:
+        """Return a destination for each of <starts>, drawn from its row of
+        the origin-destination matrix.
+
+        All of the rows are searched at once: row i of the cumulative sums is
+        shifted up by i, so start floor f with a uniform draw u in [0, 1)
+        lands in row f - 1 when searching for f - 1 + u.
+        """
+        rows = starts - 1
+        positions = np.searchsorted(self._cdf, rows + rng.random(len(rows)),
+                                    side='right')
+        return positions - rows * len(self._floors) + 1
+
+
+def up_peak(num_floors: int, peak_round: float, width: float,
+            peak_rate: float, lobby: int = 1) -> DemandProfile:
+    """Return a morning up-peak profile: everyone arrives at <lobby> and
+    travels to one of the other floors, chosen uniformly.
+    """
+    origins = np.zeros(num_floors)
+    origins[lobby - 1] = 1.0
+    return DemandProfile('up-peak', peak_round, width, peak_rate, origins,
+                         np.ones((num_floors, num_floors)))
+
+
+def down_peak(num_floors: int, peak_round: float, width: float,
+              peak_rate: float, lobby: int = 1) -> DemandProfile:
+    """Return an evening down-peak profile: people arrive uniformly on the
+    floors other than <lobby>, and all travel to <lobby>.
+    """
+    origins = np.ones(num_floors)
+    origins[lobby - 1] = 0.0
+    destinations = np.zeros((num_floors, num_floors))
+    destinations[:, lobby - 1] = 1.0
+    destinations[lobby - 1, :] = 1.0
+    return DemandProfile('down-peak', peak_round, width, peak_rate, origins,
+                         destinations)
+
+
+def lunch_peak(num_floors: int, peak_round: float, width: float,
+               peak_rate: float, lobby: int = 1,
+               interfloor: float = 0.1) -> DemandProfile:
+    """Return a lunchtime two-way profile.
+
+    Half of the people arrive at <lobby> and travel to the other floors
+    uniformly. The other half arrive uniformly on the other floors, and
+    travel to <lobby>, except for a fraction <interfloor> of them who travel
+    to another non-lobby floor.
+
+    Precondition: 0 <= interfloor < 1
+    """
+    origins = np.full(num_floors, 0.5 / max(num_floors - 1, 1))
+    origins[lobby - 1] = 0.5
+    destinations = np.full((num_floors, num_floors),
+                           interfloor / max(num_floors - 2, 1))
+    destinations[:, lobby - 1] = 1.0 - interfloor
+    destinations[lobby - 1, :] = 1.0
+    return DemandProfile('lunch', peak_round, width, peak_rate, origins,
+                         destinations)
+
+
+def office_day(num_floors: int, peak_rate: float,
+               rounds_per_hour: float = 3600.0,
+               lobby: int = 1) -> List[DemandProfile]:
+    """Return the profiles of an office day starting at midnight (round 0):
+    an up-peak around 8:30, lunch traffic around 12:30 and a down-peak
+    around 17:30, each with <peak_rate> expected arrivals per round at its
+    peak.
+
+    With the default of 3600 rounds per hour, each round is one second.
+    """
+    return [
+        up_peak(num_floors, 8.5 * rounds_per_hour, 0.5 * rounds_per_hour,
+                peak_rate, lobby),
+        lunch_peak(num_floors, 12.5 * rounds_per_hour,
+                   0.6 * rounds_per_hour, 0.6 * peak_rate, lobby),
+        down_peak(num_floors, 17.5 * rounds_per_hour, 0.5 * rounds_per_hour,
+                  peak_rate, lobby)
+    ]
+
+
+class PoissonArrivals(ArrivalGenerator):
+    """Generate Poisson arrivals whose rates follow demand profiles.
+
+    Every profile draws the number of people arriving on each floor in each
+    round from a Poisson distribution, then draws all of their destinations
+    together. Like VectorRandomArrivals, rounds are drawn <block_rounds> at
+    a time, and the arrivals for a round depend only on the seed and
+    block_rounds. Within a round, the arrivals of each profile are listed in
+    the order of <profiles>.
+
+    === Attributes ===
+    profiles: the demand profiles making up the traffic
+    seed: the seed for the generator's random streams
+    block_rounds: the number of rounds drawn at once
+
+    === Private Attributes ===
+    _block: the index of the block in _starts and _targets, or -1
+    _offsets: where the arrivals of each round of the current block start
+              in _starts and _targets, with a final entry for the end
+    _starts: the start floors of the arrivals in the current block
+    _targets: the target floors of the arrivals in the current block
+
+    === Representation invariants ===
+    block_rounds >= 1
+    """
+    profiles: List[DemandProfile]
+    seed: int
+    block_rounds: int
+    _block: int
+    _offsets: np.ndarray
+    _starts: np.ndarray
+    _targets: np.ndarray
+
+    def __init__(self, max_floor: int, profiles: Sequence[DemandProfile],
+                 seed: Optional[int] = None, block_rounds: int = 60) -> None:
+        """Initialize a new PoissonArrivals.
+
+        As for FileArrivals, num_people is set to None. If <seed> is None, a
+        random seed is chosen.
+
+        Preconditions:
+            every profile covers <max_floor> floors
+            block_rounds >= 1
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy)
+        self.profiles = list(profiles)
+        self.seed = seed
+        self.block_rounds = block_rounds
+        self._block = -1
+        self._offsets = np.zeros(block_rounds + 1, dtype=np.int64)
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._targets = np.zeros(0, dtype=np.int64)
+
+    def generate_arrays(self, round_num: int) -> Tuple[np.ndarray,
+                                                       np.ndarray]:
+        """Return the start and target floors of the people arriving at the
+        given round.
+        """
+        block, row = divmod(round_num, self.block_rounds)
+        if block != self._block:
+            self._draw_block(block)
+        begin, end = self._offsets[row], self._offsets[row + 1]
+        return self._starts[begin:end], self._targets[begin:end]
+
+    def _draw_block(self, block: int) -> None:
+        """Draw the arrivals for every round in <block>."""
+        rng = _stream(self.seed, block)
+        rounds = np.arange(block * self.block_rounds,
+                           (block + 1) * self.block_rounds)
+        samples = [profile.sample(rng, rounds) for profile in self.profiles]
+        indices = np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [i for i, _, _ in samples])
+        order = np.argsort(indices, kind='stable')
+        self._starts = np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [s for _, s, _ in samples])[order]
+        self._targets = np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [t for _, _, t in samples])[order]
+        self._offsets = np.searchsorted(indices[order],
+                                        np.arange(self.block_rounds + 1))
+        self._block = block
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the new arrivals for the simulation at the given round.
+
+        The returned dictionary maps floor number to the people who
+        arrived starting at that floor.
+        """
+        return people_by_floor(*self.generate_arrays(round_num))
@@ -0,0 +1,326 @@
+"""CSC148 Assignment 1 - Stage profiling hooks
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module lets callers observe each stage of a simulation round. A stage
+hook is told when every stage starts and finishes; StageProfiler is a hook
+that times the stages and reports their total, mean and maximum time, and
+MemoryProfiler is one that tracks their memory use with tracemalloc.
+
+Register hooks with Simulation.add_stage_hook (or the same method of
+engine.ArraySimulation). The stages are:
+    arrivals: _generate_arrivals
+    leaving: _handle_leaving
+    boarding: _handle_boarding
+    moving: _move_elevators
+    algorithm: the moving algorithm's move_elevators, which runs inside the
+               moving stage (ArraySimulation never calls it)
+
+A simulation calls each stage through call_stage when it has hooks, and
+directly when it has none. Neither the simulation nor its moving algorithm
+is modified, so an algorithm may use __slots__, be shared by several
+simulations, or already be wrapped by other code.
+"""
+import json
+import tracemalloc
+from array import array
+from collections import Counter
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StageHook:
+    """An observer of the stages of a simulation run.
+
+    Every method does nothing; subclasses override the ones they need.
+    """
+
+    def stage_started(self, stage: str, round_num: int) -> None:
+        """Called just before <stage> of round <round_num> starts."""
+
+    def stage_finished(self, stage: str, round_num: int,
+                       seconds: float) -> None:
+        """Called just after <stage> of round <round_num> finishes, with
+        the time it took in seconds.
+        """
+
+    def run_finished(self, simulation: Any) -> None:
+        """Called at the end of each run of <simulation>."""
+
+
+class CallbackHook(StageHook):
+    """A stage hook that calls a function whenever a stage finishes.
+
+    === Attributes ===
+    callback: the function, called with the same arguments as
+              StageHook.stage_finished
+    """
+    callback: Callable[[str, int, float], Any]
+
+    def __init__(self, callback: Callable[[str, int, float], Any]) -> None:
+        """Initialize a new hook calling <callback>."""
+        self.callback = callback
+
+    def stage_finished(self, stage: str, round_num: int,
+                       seconds: float) -> None:
+        """Pass the finished stage on to this hook's callback."""
+        self.callback(stage, round_num, seconds)
+
+
+class StageProfiler(StageHook):
+    """A stage hook that accumulates the time spent in each stage.
+
+    === Attributes ===
+    calls: the number of times each stage has run
+    totals: the total time spent in each stage, in seconds
+    maxima: the longest time any one run of each stage took, in seconds
+    """
+    calls: Dict[str, int]
+    totals: Dict[str, float]
+    maxima: Dict[str, float]
+
+    def __init__(self) -> None:
+        """Initialize a new profiler with no timings."""
+        self.calls = {}
+        self.totals = {}
+        self.maxima = {}
+
+    def stage_finished(self, stage: str, round_num: int,
+                       seconds: float) -> None:
+        """Add the time taken by the finished stage."""
+        if stage in self.calls:
+            self.calls[stage] += 1
+            self.totals[stage] += seconds
+            self.maxima[stage] = max(self.maxima[stage], seconds)
+        else:
+            self.calls[stage] = 1
+            self.totals[stage] = seconds
+            self.maxima[stage] = seconds
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Return the calls, total, mean and max time of each stage, with
+        times in seconds.
+        """
+        return {stage: {'calls': self.calls[stage],
+                        'total': self.totals[stage],
+                        'mean': self.totals[stage] / self.calls[stage],
+                        'max': self.maxima[stage]}
+                for stage in self.calls}
+
+    def format_report(self) -> str:
+        """Return the report as a table, with times in milliseconds."""
+        lines = [f'{"stage":<10} {"calls":>8} {"total ms":>11} '
+                 f'{"mean ms":>9} {"max ms":>9}']
+        for stage, row in self.report().items():
+            lines.append(f'{stage:<10} {row["calls"]:>8} '
+                         f'{row["total"] * 1000:>11.3f} '
+                         f'{row["mean"] * 1000:>9.4f} '
+                         f'{row["max"] * 1000:>9.4f}')
+        return '\n'.join(lines)
+
+
+class MemoryProfiler(StageHook):
+    """A stage hook that tracks memory allocated by each stage with
+    tracemalloc.
+
+    For every stage, the profiler records the net number of bytes it
+    allocated (what is still allocated when it finishes) and the highest
+    amount of traced memory while it ran. A stage's peak includes the peak
+    of the algorithm stage nested in it. The peak of a round is the highest
+    peak of its stages.
+
+    On every <snapshot_rounds>th round (starting with the first), the
+    profiler also takes a tracemalloc snapshot before and after each stage,
+    and adds up the memory allocated by each source line in between; the
+    <top_sites> lines allocating the most are reported for each stage.
+    Snapshots are slow, so a snapshot_rounds of 0 turns them off. The
+    memory held by the snapshots themselves is left out of the peaks, but
+    the profiler's own records are counted.
+
+    If tracemalloc is not already tracing when a stage starts, the profiler
+    starts it, and stops it again when the run finishes. If <filename> is
+    given, the report is written there as JSON at the end of every run.
+
+    === Attributes ===
+    filename: the file the report is written to, or None
+    snapshot_rounds: the number of rounds between snapshot rounds, or 0
+    top_sites: the number of allocation sites reported for each stage
+    calls: the number of times each stage has run
+    allocated: the net number of bytes allocated by each stage
+    peaks: the highest traced memory seen during each stage, in bytes
+    first_round: the first round profiled, or None
+    round_peaks: the highest traced memory seen during each round profiled,
+                 in bytes
+    sites: the bytes allocated by each (file, line) during each stage, in
+           snapshot rounds
+
+    === Private Attributes ===
+    _started: whether this profiler started tracemalloc
+    _open: the stages that have started but not finished, innermost last,
+           each as [stage, traced memory at its start, highest peak of the
+           stages nested in it, snapshot at its start or None, bytes held
+           by that snapshot]
+    """
+    filename: Optional[str]
+    snapshot_rounds: int
+    top_sites: int
+    calls: Dict[str, int]
+    allocated: Dict[str, int]
+    peaks: Dict[str, int]
+    first_round: Optional[int]
+    round_peaks: array
+    sites: Dict[str, Counter]
+
+    def __init__(self, filename: Optional[str] = None,
+                 snapshot_rounds: int = 100, top_sites: int = 10) -> None:
+        """Initialize a new profiler with no measurements."""
+        self.filename = filename
+        self.snapshot_rounds = snapshot_rounds
+        self.top_sites = top_sites
+        self.calls = {}
+        self.allocated = {}
+        self.peaks = {}
+        self.first_round = None
+        self.round_peaks = array('q')
+        self.sites = {}
+        self._started = False
+        self._open = []
+
+    def stage_started(self, stage: str, round_num: int) -> None:
+        """Start measuring the memory used by <stage>."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        if self.first_round is None:
+            self.first_round = round_num
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1][2] = max(self._open[-1][2], peak - self._held())
+        snapshot = None
+        held = 0
+        if self.snapshot_rounds and \
+                (round_num - self.first_round) % self.snapshot_rounds == 0:
+            snapshot = self._snapshot()
+            held = tracemalloc.get_traced_memory()[0] - current
+            current += held
+        tracemalloc.reset_peak()
+        self._open.append([stage, current, 0, snapshot, held])
+
+    def stage_finished(self, stage: str, round_num: int,
+                       seconds: float) -> None:
+        """Record the memory used by the finished stage."""
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak - self._held(), self._open[-1][2])
+        _, start, _, snapshot, _ = self._open.pop()
+        if self._open:
+            self._open[-1][2] = max(self._open[-1][2], peak)
+
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.allocated[stage] = self.allocated.get(stage, 0) + current - start
+        self.peaks[stage] = max(self.peaks.get(stage, 0), peak)
+        index = round_num - self.first_round
+        while len(self.round_peaks) <= index:
+            self.round_peaks.append(0)
+        self.round_peaks[index] = max(self.round_peaks[index], peak)
+
+        if snapshot is not None:
+            counter = self.sites.setdefault(stage, Counter())
+            for stat in self._snapshot().compare_to(snapshot, 'lineno'):
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    counter[(frame.filename, frame.lineno)] += stat.size_diff
+            tracemalloc.reset_peak()
+
+    def _held(self) -> int:
+        """Return the number of bytes held by the snapshots of the open
+        stages.
+        """
+        return sum(entry[4] for entry in self._open)
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Return a snapshot of the traced memory, leaving out the memory
+        allocated by tracemalloc and this module.
+        """
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+
+    def run_finished(self, simulation: Any) -> None:
+        """Stop tracemalloc if this profiler started it, and write the
+        report if this profiler has a file.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+        if self.filename is not None:
+            self.write(self.filename)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the measurements as a dictionary of plain values.
+
+        The report has the keys
+            stages: for each stage, its number of calls, the total and mean
+                    net bytes it allocated, and its peak
+            first_round: the first round profiled
+            round_peaks: the peak of each round, starting at first_round
+            peak_bytes: the highest traced memory seen
+            top_sites: for each stage, its top allocation sites as
+                       dictionaries with the keys file, line and bytes
+        """
+        stages = {stage: {'calls': self.calls[stage],
+                          'allocated_bytes': self.allocated[stage],
+                          'mean_allocated_bytes':
+                              self.allocated[stage] / self.calls[stage],
+                          'peak_bytes': self.peaks[stage]}
+                  for stage in self.calls}
+        top_sites = {stage: [{'file': filename, 'line': line, 'bytes': size}
+                             for (filename, line), size
+                             in counter.most_common(self.top_sites)]
+                     for stage, counter in self.sites.items()}
+        return {
+            'stages': stages,
+            'first_round': self.first_round,
+            'round_peaks': self.round_peaks.tolist(),
+            'peak_bytes': max(self.round_peaks, default=0),
+            'top_sites': top_sites
+        }
+
+    def write(self, filename: str) -> None:
+        """Write the report to <filename> as JSON."""
+        with open(filename, 'w') as output:
+            json.dump(self.report(), output, indent=2)
+
+
+def as_hook(hook: Any) -> StageHook:
+    """Return <hook> if it is a StageHook, or a CallbackHook calling it if
+    it is a function.
+    """
+    if isinstance(hook, StageHook):
+        return hook
+    return CallbackHook(hook)
+
+
+def call_stage(hooks: List[StageHook], stage: str, round_num: int,
+               function: Callable, *args: Any) -> Any:
+    """Call <function> with <args> as <stage> of round <round_num>,
+    reporting it to <hooks>, and return what it returns.
+    """
+    for hook in hooks:
+        hook.stage_started(stage, round_num)
+    start = perf_counter()
+    try:
+        return function(*args)
+    finally:
+        seconds = perf_counter() - start
+        for hook in hooks:
+            hook.stage_finished(stage, round_num, seconds)
+
+
+def finish_run(simulation: Any, hooks: List[StageHook]) -> None:
+    """Tell <hooks> that a run of <simulation> has finished."""
+    for hook in hooks:
+        hook.run_finished(simulation)
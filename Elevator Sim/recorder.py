@@ -0,0 +1,220 @@
+"""CSC148 Assignment 1 - Per-round metrics
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains RoundRecorder, which records a time series of metrics
+for a simulation: one row per round, holding
+
+    round: the round number
+    arrivals, boardings, completions: the number of people who arrived,
+        boarded an elevator and completed their journey in the round
+    waiting_F: the number of people waiting on floor F at the end of the
+        round, for each floor
+    floor_E, load_E, move_E: the floor of elevator E, the number of people
+        on it, and how far it moved (-1, 0 or 1), at the end of the round,
+        for each elevator (numbered from 1)
+
+Give a recorder to a simulation with the 'recorder' key of its
+configuration. Simulations without one do no recording work at all.
+
+Rows are appended to a growable stdlib array of 32-bit integers, and written
+out in bulk every <flush_rounds> rounds (and at the end of each run) as CSV,
+or in a compact binary format:
+    header: the magic bytes b'ELVROUND', then the version, the number of
+            floors and the number of elevators (uint32 each)
+    rows: int32[number of columns] per round, in the column order above
+with all numbers little-endian. read_binary reads such a file back. Without
+a file, every row is kept in memory.
+"""
+import csv
+import struct
+import sys
+from array import array
+from typing import Any, List, Optional, Sequence, Tuple
+
+MAGIC = b'ELVROUND'
+VERSION = 1
+_HEADER = struct.Struct('<8sIII')
+
+
+def column_names(num_floors: int, num_elevators: int) -> List[str]:
+    """Return the names of the columns recorded for a building with the
+    given number of floors and elevators.
+    """
+    names = ['round', 'arrivals', 'boardings', 'completions']
+    names.extend(f'waiting_{floor}' for floor in range(1, num_floors + 1))
+    for kind in ('floor', 'load', 'move'):
+        names.extend(f'{kind}_{e}' for e in range(1, num_elevators + 1))
+    return names
+
+
+class RoundRecorder:
+    """A recorder of per-round simulation metrics.
+
+    === Attributes ===
+    filename: the file rows are written to, or None to keep them in memory
+    binary: whether the file is in the binary format rather than CSV
+    flush_rounds: the number of rounds buffered before they are written
+    columns: the names of the recorded columns, or None before the first
+             round is recorded
+    rows: the recorded rows that have not been written yet, flattened
+
+    === Private Attributes ===
+    _file: the open output file, or None
+    _previous_total: the number of people who had arrived after the last
+                     recorded round
+    _previous_completed: the number of people who had completed their
+                         journey after the last recorded round
+    _previous_riders: the number of people on elevators after the last
+                      recorded round
+    _previous_floors: the floor of each elevator after the last recorded
+                      round
+    """
+    filename: Optional[str]
+    binary: bool
+    flush_rounds: int
+    columns: Optional[List[str]]
+    rows: array
+
+    def __init__(self, filename: Optional[str] = None, binary: bool = False,
+                 flush_rounds: int = 4096) -> None:
+        """Initialize a new recorder writing to <filename>, if given.
+
+        Precondition: flush_rounds >= 1
+        """
+        self.filename = filename
+        self.binary = binary
+        self.flush_rounds = flush_rounds
+        self.columns = None
+        self.rows = array('i')
+        self._file = None
+        self._previous_total = 0
+        self._previous_completed = 0
+        self._previous_riders = 0
+        self._previous_floors = []
+
+    def record(self, round_num: int, total_people: int, completed: int,
+               waiting: Sequence[int], floors: Sequence[int],
+               loads: Sequence[int]) -> None:
+        """Record the state of a simulation at the end of round <round_num>.
+
+        <total_people> and <completed> are the number of people who have
+        arrived and completed their journey so far. <waiting> is the number
+        of people waiting on each floor, from the bottom up, and <floors> and
+        <loads> the floor of, and number of people on, each elevator. The
+        counts for the round itself are the differences from the previous
+        round; elevators start the first round on floor 1.
+        """
+        if self.columns is None:
+            self.columns = column_names(len(waiting), len(floors))
+            self._previous_floors = [1] * len(floors)
+        riders = sum(loads)
+        completions = completed - self._previous_completed
+        self.rows.extend((round_num, total_people - self._previous_total,
+                          riders - self._previous_riders + completions,
+                          completions))
+        self.rows.extend(waiting)
+        self.rows.extend(floors)
+        self.rows.extend(loads)
+        self.rows.extend([now - before for now, before
+                          in zip(floors, self._previous_floors)])
+        self._previous_total = total_people
+        self._previous_completed = completed
+        self._previous_riders = riders
+        self._previous_floors = list(floors)
+
+        if self.filename is not None and \
+                len(self.rows) >= self.flush_rounds * len(self.columns):
+            self.flush()
+
+    def num_rows(self) -> int:
+        """Return the number of rows buffered in this recorder."""
+        if self.columns is None:
+            return 0
+        return len(self.rows) // len(self.columns)
+
+    def column(self, name: str) -> List[int]:
+        """Return the buffered values of the column called <name>.
+
+        Raise ValueError if there is no such column.
+        """
+        if self.columns is None:
+            raise ValueError(f'no column {name!r} has been recorded')
+        index = self.columns.index(name)
+        return self.rows[index::len(self.columns)].tolist()
+
+    def flush(self) -> None:
+        """Write the buffered rows to this recorder's file, if it has one,
+        and empty the buffer.
+        """
+        if self.filename is None or self.columns is None:
+            return
+        if self._file is None:
+            self._open()
+        if self.binary:
+            if sys.byteorder != 'little':
+                self.rows.byteswap()
+            self.rows.tofile(self._file)
+        else:
+            width = len(self.columns)
+            values = self.rows.tolist()
+            csv.writer(self._file).writerows(
+                values[i:i + width] for i in range(0, len(values), width))
+        self._file.flush()
+        del self.rows[:]
+
+    def _open(self) -> None:
+        """Open this recorder's file and write its header."""
+        if self.binary:
+            self._file = open(self.filename, 'wb')
+            num_floors = sum(name.startswith('waiting_')
+                             for name in self.columns)
+            num_elevators = sum(name.startswith('floor_')
+                                for name in self.columns)
+            self._file.write(_HEADER.pack(MAGIC, VERSION, num_floors,
+                                          num_elevators))
+        else:
+            self._file = open(self.filename, 'w', newline='')
+            csv.writer(self._file).writerow(self.columns)
+
+    def close(self) -> None:
+        """Write any buffered rows and close this recorder's file."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'RoundRecorder':
+        """Return this recorder, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close this recorder at the end of a with statement."""
+        self.close()
+
+
+def read_binary(filename: str) -> Tuple[List[str], array]:
+    """Return the column names and the flattened rows of the binary
+    recording in <filename>.
+
+    Raise ValueError if <filename> is not a binary recording of a version
+    this module can read.
+    """
+    with open(filename, 'rb') as recording:
+        header = recording.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f'{filename} is not a round recording')
+        magic, version, num_floors, num_elevators = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f'{filename} is not a round recording')
+        if version != VERSION:
+            raise ValueError(f'{filename} has unsupported recording version '
+                             f'{version}')
+        rows = array('i')
+        rows.frombytes(recording.read())
+    if sys.byteorder != 'little':
+        rows.byteswap()
+    return column_names(num_floors, num_elevators), rows
@@ -0,0 +1,306 @@
+"""CSC148 Assignment 1 - Decoupled renderer
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module lets a simulation run at full speed while it is displayed by a
+separate process. Instead of a Visualizer, the simulation is given a
+SnapshotPublisher (with the 'publisher' key of its configuration), which
+puts a compact snapshot of the simulation on a queue at the end of every
+round, where Simulation.run would otherwise wait a second. The renderer
+process started by start_renderer takes the snapshots off the queue and
+draws them at its own pace:
+
+    publisher = start_renderer(num_floors, speed=4)
+    config['publisher'] = publisher
+    Simulation(config).run(num_rounds)
+    publisher.close()
+
+The renderer shows <speed> rounds per second. Whenever it falls behind, it
+skips straight to the newest snapshot on the queue, and the publisher
+drops snapshots rather than wait while the queue is full, so the simulation
+never waits for the display. The final snapshot is always shown.
+
+A snapshot is a tuple (round_num, num_floors, waiting, elevators,
+people_completed), where
+    waiting: a (floor, count, anger levels) tuple for each floor where
+             somebody is waiting, giving the anger levels of the first
+             MAX_DRAWN people there
+    elevators: a (floor, load, capacity) tuple for each elevator
+so it pickles to a few hundred bytes, whatever the number of people.
+draw_snapshot draws one onto any pygame surface.
+
+Pygame is only imported by the functions that draw, so the simulation's own
+process does not load it.
+"""
+from __future__ import annotations
+import multiprocessing
+import queue
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# The number of waiting people drawn on each floor; the rest are counted.
+MAX_DRAWN = 10
+
+# Rendered floor numbers, keyed by the text, so that each is rendered once.
+_TEXT: Dict[str, Any] = {}
+
+Snapshot = Tuple[int, int, List[Tuple[int, int, List[int]]],
+                 List[Tuple[int, int, int]], int]
+
+
+class SnapshotPublisher:
+    """A stand-in for a Visualizer that publishes snapshots of a simulation
+    to a queue.
+
+    It has the same public methods as visualizer.Visualizer; all of them do
+    nothing, except wait, which publishes the current snapshot instead of
+    waiting.
+
+    === Attributes ===
+    queue: the queue snapshots are put on
+    process: the renderer process taking them off, or None
+    published: the number of snapshots put on the queue
+    dropped: the number of snapshots dropped because the queue was full
+
+    === Private Attributes ===
+    _simulation: the simulation being published, or None before attach
+    _round_num: the round being simulated
+    _last: the last snapshot taken, or None
+    """
+    queue: Any
+    process: Optional[multiprocessing.Process]
+    published: int
+    dropped: int
+
+    def __init__(self, snapshot_queue: Any,
+                 process: Optional[multiprocessing.Process] = None) -> None:
+        """Initialize a new publisher putting snapshots on
+        <snapshot_queue>, which is read by <process>, if given.
+        """
+        self.queue = snapshot_queue
+        self.process = process
+        self.published = 0
+        self.dropped = 0
+        self._simulation = None
+        self._round_num = 0
+        self._last = None
+
+    def attach(self, simulation: Any) -> None:
+        """Publish snapshots of <simulation>, a simulation.Simulation."""
+        self._simulation = simulation
+
+    def snapshot(self) -> Snapshot:
+        """Return a snapshot of the attached simulation."""
+        sim = self._simulation
+        waiting = []
+        for floor in sorted(sim.waiting.occupied()):
+            people = sim.waiting[floor]
+            angers = [people[i].get_anger_level()
+                      for i in range(min(len(people), MAX_DRAWN))]
+            waiting.append((floor, len(people), angers))
+        elevators = [(elevator.current_floor, elevator.num_passengers(),
+                      elevator.max_capacity) for elevator in sim.elevators]
+        return (self._round_num, sim.num_floors, waiting, elevators,
+                sim.wait_stats.count)
+
+    def publish(self) -> None:
+        """Put a snapshot of the attached simulation on the queue, or drop
+        it if the queue is full.
+        """
+        self._last = self.snapshot()
+        try:
+            self.queue.put_nowait(self._last)
+            self.published += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Make sure the renderer shows the final snapshot, then tell it
+        to stop, and wait up to <timeout> seconds for its process to end.
+        """
+        items = [None]
+        if self._last is not None:
+            items.insert(0, self._last)
+        try:
+            for item in items:
+                self.queue.put(item, timeout=timeout)
+        except queue.Full:
+            pass
+        if self.process is not None:
+            self.process.join(timeout)
+
+    def __enter__(self) -> 'SnapshotPublisher':
+        """Return this publisher, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close this publisher at the end of a with statement."""
+        self.close()
+
+    def render_header(self, round_num: int) -> None:
+        """Remember the round being simulated."""
+        self._round_num = round_num
+
+    def show_arrivals(self, arrivals: Dict[int, List[Any]]) -> None:
+        """Do nothing."""
+
+    def show_boarding(self, person: Any, elevator: Any) -> None:
+        """Do nothing."""
+
+    def show_disembarking(self, person: Any, elevator: Any) -> None:
+        """Do nothing."""
+
+    def show_boarding_batch(self, boarding: List[Tuple[Any, Any]]) -> None:
+        """Do nothing."""
+
+    def show_disembarking_batch(self,
+                                leaving: List[Tuple[Any, Any]]) -> None:
+        """Do nothing."""
+
+    def show_elevator_moves(self, elevators: List[Any],
+                            directions: List[Any]) -> None:
+        """Do nothing."""
+
+    def wait(self, wait_time: int) -> None:
+        """Publish the round's snapshot instead of waiting."""
+        self.publish()
+
+
+def screen_size(num_floors: int) -> Tuple[int, int]:
+    """Return the size of the screen for a building with <num_floors>
+    floors.
+    """
+    import sprites
+    return (sprites.WIDTH,
+            num_floors * sprites.FLOOR_HEIGHT + sprites.STAT_WINDOW_HEIGHT)
+
+
+def _text(text: str) -> Any:
+    """Return <text> rendered in black, rendering it on first use."""
+    image = _TEXT.get(text)
+    if image is None:
+        import sprites
+        image = sprites.comic_sans().render(text, True, sprites.BLACK)
+        _TEXT[text] = image
+    return image
+
+
+def draw_snapshot(surface: Any, snapshot: Snapshot) -> None:
+    """Draw <snapshot> onto the pygame surface <surface>, which has the
+    screen size for its building.
+    """
+    import pygame
+    import sprites
+
+    round_num, num_floors, waiting, elevators, completed = snapshot
+    height = surface.get_height()
+    surface.fill(sprites.WHITE)
+    font = sprites.comic_sans()
+    surface.blit(font.render(f'Round {round_num}    Completed {completed}',
+                             True, sprites.BLACK), (5, 0))
+
+    def floor_y(floor: int) -> int:
+        """Return the y-coordinate of the border of <floor>."""
+        return height - (floor - 1) * sprites.FLOOR_HEIGHT - \
+            sprites.FLOOR_BORDER_HEIGHT
+
+    for floor in range(1, num_floors + 1):
+        y = floor_y(floor)
+        pygame.draw.rect(surface, sprites.BLUE,
+                         [0, y, sprites.WIDTH, sprites.FLOOR_BORDER_HEIGHT])
+        label = _text(str(floor))
+        surface.blit(label, label.get_rect(bottom=y - 20,
+                                           right=sprites.WIDTH - 20))
+
+    for floor, count, angers in waiting:
+        y = floor_y(floor)
+        for i, anger in enumerate(angers):
+            image = sprites.person_image(anger, sprites.PERSON_WIDTH,
+                                         sprites.PERSON_HEIGHT)
+            surface.blit(image, image.get_rect(
+                bottom=y, left=5 + i * sprites.PERSON_WIDTH // 2))
+        if count > len(angers):
+            surface.blit(font.render(f'+{count - len(angers)}', True,
+                                     sprites.BLACK),
+                         (10 + (len(angers) + 1) * sprites.PERSON_WIDTH // 2,
+                          y - sprites.PERSON_HEIGHT))
+
+    for i, (floor, load, capacity) in enumerate(elevators):
+        rect = pygame.Rect(0, 0, sprites.ELEVATOR_WIDTH,
+                           sprites.ELEVATOR_HEIGHT)
+        rect.centerx = (i + 1) * sprites.WIDTH // (len(elevators) + 1)
+        rect.bottom = floor_y(floor)
+        # As drawn by sprites.ElevatorSprite.update.
+        pygame.draw.rect(surface, sprites.GREEN, rect)
+        empty = int(sprites.ELEVATOR_HEIGHT * (1 - load / capacity))
+        pygame.draw.rect(surface, sprites.DARK_GREEN,
+                         [rect.left, rect.top + empty, rect.width,
+                          sprites.ELEVATOR_HEIGHT - empty])
+
+
+def run_renderer(snapshot_queue: Any, num_floors: int,
+                 speed: float = 1.0) -> None:
+    """Draw the snapshots on <snapshot_queue> in a window, showing <speed>
+    rounds per second, until None is taken off the queue.
+
+    Snapshots that arrive faster than they can be shown are skipped. If
+    the window is closed, the remaining snapshots are discarded.
+    """
+    import pygame
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size(num_floors))
+    interval = 1 / speed
+    next_frame = time.perf_counter()
+    showing = True
+    while True:
+        snapshot = snapshot_queue.get()
+        # Skip to the newest snapshot, but stop at the end.
+        while snapshot is not None:
+            try:
+                newer = snapshot_queue.get_nowait()
+            except queue.Empty:
+                break
+            if newer is None:
+                snapshot_queue.put(None)
+                break
+            snapshot = newer
+        if snapshot is None:
+            break
+        if not showing:
+            continue
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            showing = False
+            pygame.display.quit()
+            continue
+        draw_snapshot(screen, snapshot)
+        pygame.display.flip()
+
+        next_frame += interval
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_frame = time.perf_counter()
+    pygame.quit()
+
+
+def start_renderer(num_floors: int, speed: float = 1.0,
+                   max_pending: int = 2) -> SnapshotPublisher:
+    """Start a renderer process for a building with <num_floors> floors,
+    and return a publisher feeding it.
+
+    At most <max_pending> snapshots wait on the queue; <speed> is the
+    number of rounds shown per second.
+
+    Precondition: speed > 0 and max_pending >= 1
+    """
+    context = multiprocessing.get_context('spawn')
+    snapshot_queue = context.Queue(max_pending)
+    process = context.Process(target=run_renderer,
+                              args=(snapshot_queue, num_floors, speed),
+                              daemon=True)
+    process.start()
+    return SnapshotPublisher(snapshot_queue, process)
@@ -0,0 +1,407 @@
+"""CSC148 Assignment 1 - Record and replay
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module records the arrivals and elevator decisions of a simulation run
+to a compact log, and replays them later without calling the original
+arrival generator or moving algorithm at all.
+
+To record a run, wrap the generator and algorithm of its configuration:
+
+    with LogWriter('run.log', num_floors) as log:
+        config['arrival_generator'] = RecordingArrivals(generator, log)
+        config['moving_algorithm'] = RecordingAlgorithm(algorithm, log)
+        Simulation(config).run(num_rounds)
+
+and to replay it, read the log back and drive a new simulation from it:
+
+    log = read_log('run.log')
+    config['arrival_generator'] = ReplayArrivals(log)
+    config['moving_algorithm'] = ReplayAlgorithm(log)
+
+A replayed run gives the same statistics as the recorded one, even for
+RandomArrivals and RandomAlgorithm, and can be visualized like any other.
+It is also faster, since an expensive algorithm is replaced by a lookup.
+diff_logs lists the rounds in which two recorded runs differ.
+
+The log is append-only: recording into an existing log (for example, after
+restoring a checkpoint of the recorded simulation) carries it on. It is a
+header, the magic bytes b'ELVRPLAY' then the version and the number of
+floors (uint32 each), followed by int32 records of two kinds:
+
+    ARRIVALS, round, n, then the start and target floor of n people
+    MOVES, round, n, then the direction of each of n elevators
+             (1 up, 0 stay, -1 down)
+
+with all numbers little-endian. Only rounds in which somebody arrives have an
+ARRIVALS record, and rounds skipped by fast_forward have no MOVES record:
+every elevator stays put in them.
+"""
+from bisect import bisect_left
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from algorithms import ArrivalGenerator, Direction, MovingAlgorithm
+from entities import Elevator, Person
+
+MAGIC = b'ELVRPLAY'
+VERSION = 1
+_HEADER = struct.Struct('<8sII')
+
+# The kinds of record in a log.
+ARRIVALS = 0
+MOVES = 1
+
+
+class LogWriter:
+    """A writer of arrival and move records to a log file.
+
+    === Attributes ===
+    filename: the log file records are appended to
+    max_floor: the number of floors of the recorded building
+    flush_records: the number of records buffered before they are written
+    round_num: the round whose arrivals were recorded last, or -1
+
+    === Private Attributes ===
+    _buffer: the records that have not been written yet, flattened
+    _num_buffered: the number of records in _buffer
+    """
+    filename: str
+    max_floor: int
+    flush_records: int
+    round_num: int
+
+    def __init__(self, filename: str, max_floor: int,
+                 flush_records: int = 4096) -> None:
+        """Initialize a new writer appending to the log <filename>, which is
+        created if it does not exist.
+
+        Raise ValueError if <filename> is a log of a different building, or
+        not a log at all.
+
+        Precondition: flush_records >= 1
+        """
+        self.filename = filename
+        self.max_floor = max_floor
+        self.flush_records = flush_records
+        self.round_num = -1
+        self._buffer = array('i')
+        self._num_buffered = 0
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            if _read_header(filename) != max_floor:
+                raise ValueError(f'{filename} is a log of a building with '
+                                 f'a different number of floors')
+        else:
+            with open(filename, 'wb') as log:
+                log.write(_HEADER.pack(MAGIC, VERSION, max_floor))
+
+    def write_arrivals(self, round_num: int,
+                       arrivals: Dict[int, List[Person]]) -> None:
+        """Record the people in <arrivals> as arriving in round
+        <round_num>.
+        """
+        self.round_num = round_num
+        people = [person for floor_people in arrivals.values()
+                  for person in floor_people]
+        if not people:
+            return
+        self._buffer.extend((ARRIVALS, round_num, len(people)))
+        for person in people:
+            self._buffer.extend((person.start, person.target))
+        self._added()
+
+    def write_moves(self, round_num: int, moves: List[Direction]) -> None:
+        """Record the directions <moves> as the elevators' moves in round
+        <round_num>.
+        """
+        self._buffer.extend((MOVES, round_num, len(moves)))
+        self._buffer.extend([move.value for move in moves])
+        self._added()
+
+    def _added(self) -> None:
+        """Count a record added to the buffer, writing the buffer out if it
+        is full.
+        """
+        self._num_buffered += 1
+        if self._num_buffered >= self.flush_records:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered records to the log and empty the buffer."""
+        if not self._buffer:
+            return
+        if sys.byteorder != 'little':
+            self._buffer.byteswap()
+        with open(self.filename, 'ab') as log:
+            self._buffer.tofile(log)
+        del self._buffer[:]
+        self._num_buffered = 0
+
+    def close(self) -> None:
+        """Write any buffered records to the log."""
+        self.flush()
+
+    def __enter__(self) -> 'LogWriter':
+        """Return this writer, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Write any buffered records at the end of a with statement."""
+        self.close()
+
+
+class RecordingArrivals(ArrivalGenerator):
+    """An arrival generator that records the arrivals of another.
+
+    === Attributes ===
+    generator: the generator whose arrivals are recorded
+    log: the writer that records them
+    """
+    generator: ArrivalGenerator
+    log: LogWriter
+
+    def __init__(self, generator: ArrivalGenerator, log: LogWriter) -> None:
+        """Initialize a new generator recording the arrivals of <generator>
+        to <log>.
+        """
+        ArrivalGenerator.__init__(self, generator.max_floor,
+                                  generator.num_people)
+        self.generator = generator
+        self.log = log
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return and record the arrivals of self.generator at the given
+        round.
+        """
+        arrivals = self.generator.generate(round_num)
+        self.log.write_arrivals(round_num, arrivals)
+        return arrivals
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the next arrival round of self.generator."""
+        return self.generator.next_arrival_round(round_num)
+
+
+class RecordingAlgorithm(MovingAlgorithm):
+    """A moving algorithm that records the decisions of another.
+
+    Moves are recorded for the round whose arrivals were generated last, so
+    the simulation's arrival generator must be a RecordingArrivals writing
+    to the same log.
+
+    === Attributes ===
+    algorithm: the algorithm whose decisions are recorded
+    log: the writer that records them
+    """
+    algorithm: MovingAlgorithm
+    log: LogWriter
+
+    def __init__(self, algorithm: MovingAlgorithm, log: LogWriter) -> None:
+        """Initialize a new algorithm recording the decisions of <algorithm>
+        to <log>.
+        """
+        self.algorithm = algorithm
+        self.log = log
+        self.deterministic = getattr(algorithm, 'deterministic', False)
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return and record the directions chosen by self.algorithm."""
+        moves = self.algorithm.move_elevators(elevators, waiting, max_floor)
+        self.log.write_moves(self.log.round_num, moves)
+        return moves
+
+
+class ReplayLog:
+    """The records of a log, read into memory.
+
+    === Attributes ===
+    max_floor: the number of floors of the recorded building
+    arrivals: the (start, target) floors of the people arriving in each
+              round, for the rounds in which anybody arrives
+    moves: the directions of the elevators in each recorded round
+    round_num: the round being replayed, as set by ReplayArrivals
+    """
+    max_floor: int
+    arrivals: Dict[int, List[Tuple[int, int]]]
+    moves: Dict[int, List[Direction]]
+    round_num: int
+
+    def __init__(self, max_floor: int) -> None:
+        """Initialize a new log with no records."""
+        self.max_floor = max_floor
+        self.arrivals = {}
+        self.moves = {}
+        self.round_num = -1
+
+    def arrival_rounds(self) -> List[int]:
+        """Return the rounds in which anybody arrives, in increasing
+        order.
+        """
+        return sorted(self.arrivals)
+
+
+def _read_header(filename: str) -> int:
+    """Return the number of floors in the header of the log <filename>.
+
+    Raise ValueError if <filename> is not a log of a version this module
+    can read.
+    """
+    with open(filename, 'rb') as log:
+        header = log.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f'{filename} is not a replay log')
+    magic, version, max_floor = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f'{filename} is not a replay log')
+    if version != VERSION:
+        raise ValueError(f'{filename} has unsupported log version {version}')
+    return max_floor
+
+
+def read_log(filename: str) -> ReplayLog:
+    """Return the records of the log <filename>.
+
+    Raise ValueError if <filename> is not a log of a version this module
+    can read.
+    """
+    log = ReplayLog(_read_header(filename))
+    values = array('i')
+    with open(filename, 'rb') as log_file:
+        log_file.seek(_HEADER.size)
+        values.frombytes(log_file.read())
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    directions = {direction.value: direction for direction in Direction}
+    i = 0
+    while i < len(values):
+        kind, round_num, count = values[i:i + 3]
+        i += 3
+        if kind == ARRIVALS:
+            people = values[i:i + 2 * count]
+            log.arrivals.setdefault(round_num, []).extend(
+                zip(people[::2], people[1::2]))
+            i += 2 * count
+        elif kind == MOVES:
+            log.moves[round_num] = [directions[value]
+                                    for value in values[i:i + count]]
+            i += count
+        else:
+            raise ValueError(f'{filename} has an unknown record kind {kind}')
+    return log
+
+
+class ReplayArrivals(ArrivalGenerator):
+    """An arrival generator replaying the arrivals recorded in a log.
+
+    Simulations running with fast_forward skip the rounds before the next
+    arrival round; the rounds in which the log moves an elevator count as
+    arrival rounds too, so that none of them is skipped.
+
+    === Attributes ===
+    log: the log being replayed
+
+    === Private Attributes ===
+    _rounds: the rounds in which anybody arrives or any elevator moves, in
+             increasing order
+    """
+    log: ReplayLog
+
+    def __init__(self, log: ReplayLog) -> None:
+        """Initialize a new generator replaying the arrivals in <log>."""
+        ArrivalGenerator.__init__(self, log.max_floor, None)
+        self.log = log
+        self._rounds = sorted(
+            set(log.arrivals) |
+            {round_num for round_num, moves in log.moves.items()
+             if not _all_stay(moves)})
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Return the arrivals recorded for the given round."""
+        self.log.round_num = round_num
+        arrivals = {}
+        for start, target in self.log.arrivals.get(round_num, []):
+            arrivals.setdefault(start, []).append(Person(start, target))
+        return arrivals
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        """Return the first round at or after <round_num> in which the log
+        records an arrival or an elevator move.
+        """
+        i = bisect_left(self._rounds, round_num)
+        return self._rounds[i] if i < len(self._rounds) else None
+
+
+class ReplayAlgorithm(MovingAlgorithm):
+    """A moving algorithm replaying the decisions recorded in a log.
+
+    The decisions replayed are those of the round whose arrivals were
+    generated last, so the simulation's arrival generator must be a
+    ReplayArrivals of the same log. Every elevator stays put in rounds with
+    no recorded decisions.
+
+    A replayed decision depends on the round rather than on the state of the
+    simulation, but it is marked deterministic so that replays can be
+    fast-forwarded: ReplayArrivals makes sure no round with a recorded move
+    is skipped.
+
+    === Attributes ===
+    log: the log being replayed
+    """
+    log: ReplayLog
+    deterministic = True
+
+    def __init__(self, log: ReplayLog) -> None:
+        """Initialize a new algorithm replaying the decisions in <log>."""
+        self.log = log
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Move the elevators in the directions recorded for the current
+        round, and return those directions.
+        """
+        moves = self.log.moves.get(self.log.round_num)
+        if moves is None:
+            return [Direction.STAY] * len(elevators)
+        for elevator, move in zip(elevators, moves):
+            elevator.current_floor += move.value
+        return list(moves)
+
+
+def diff_logs(first: ReplayLog,
+              second: ReplayLog) -> List[Tuple[int, str]]:
+    """Return the rounds in which the runs recorded in <first> and <second>
+    differ, as (round, kind) pairs in increasing order of round, where kind
+    is 'arrivals' or 'moves'.
+
+    Rounds in which every elevator stays put match rounds with no recorded
+    moves.
+    """
+    differences = []
+    for round_num in set(first.arrivals) | set(second.arrivals):
+        if first.arrivals.get(round_num) != second.arrivals.get(round_num):
+            differences.append((round_num, 'arrivals'))
+    for round_num in set(first.moves) | set(second.moves):
+        first_moves = first.moves.get(round_num)
+        second_moves = second.moves.get(round_num)
+        if first_moves != second_moves and not (
+                _all_stay(first_moves) and _all_stay(second_moves)):
+            differences.append((round_num, 'moves'))
+    differences.sort()
+    return differences
+
+
+def _all_stay(moves: Optional[List[Direction]]) -> bool:
+    """Return whether <moves> is missing or keeps every elevator put."""
+    return moves is None or all(move == Direction.STAY for move in moves)
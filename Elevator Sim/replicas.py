@@ -0,0 +1,208 @@
+"""CSC148 Assignment 1 - Lockstep replicas
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains ReplicaSimulation, which runs many independent copies
+("replicas") of the same building side by side, for Monte Carlo studies that
+would otherwise call Simulation.run thousands of times in a Python loop.
+
+It is an engine.ArrayEngine with a replica dimension added to the elevator
+arrays, which have one row per replica, and every person records the replica
+they belong to. Each round, every stage is one set of array operations over
+all replicas at once.
+
+Each replica has its own arrival generator, and replicas never interact, so
+replica r gives exactly the statistics that an ArraySimulation using r's
+generator would give (apart from the random choices of RandomAlgorithm,
+which are drawn for the elevators of every replica at once; a single replica
+makes the same choices as an ArraySimulation with the same seed).
+
+The wait times of each replica are summarized by a stats.WaitStats.
+confidence_intervals summarizes the statistics of all replicas.
+"""
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import algorithms
+from engine import ArrayEngine, arrival_arrays
+from stats import QUANTILES, WaitStats
+
+# The statistics that confidence_intervals summarizes.
+SUMMARY_KEYS = ['total_people', 'people_completed', 'max_time', 'min_time',
+                'avg_time', 'std_time'] + list(QUANTILES)
+
+
+class ReplicaSimulation(ArrayEngine):
+    """Independent copies of one building, simulated in lockstep.
+
+    Elevator e of replica r is described by entry [r, e] of each elevator
+    array, and by entry r * num_elevators + e of the flattened arrays.
+
+    === Attributes ===
+    arrival_generators: the arrival generator of each replica
+
+    === Private Attributes ===
+    _replica: the replica each person belongs to
+    _total_people: the number of people who have arrived in each replica
+    _wait_stats: a summary of the wait times of the people who have
+                 completed their journey in each replica
+
+    === Representation invariants ===
+    current_floor, load and capacity have shape
+        (num_replicas, number of elevators)
+    """
+    arrival_generators: List[algorithms.ArrivalGenerator]
+
+    _PERSON_ARRAYS = ArrayEngine._PERSON_ARRAYS + ('_replica',)
+
+    def __init__(self, config: Dict[str, Any],
+                 arrival_generators: Sequence[algorithms.ArrivalGenerator]
+                 ) -> None:
+        """Initialize one replica of the building described by <config> for
+        each of the given arrival generators.
+
+        The configuration has the same keys as for engine.ArraySimulation;
+        its 'arrival_generator', if any, is ignored.
+
+        Raise ValueError under the same conditions as ArraySimulation.
+        """
+        self.arrival_generators = list(arrival_generators)
+        super().__init__(config, (len(self.arrival_generators),
+                                  config['num_elevators']))
+        self._total_people = np.zeros(self.num_replicas, dtype=np.int64)
+        self._wait_stats = [WaitStats() for _ in range(self.num_replicas)]
+
+    ############################################################################
+    # Handle rounds of simulation.
+    ############################################################################
+    def run(self, num_rounds: int) -> List[Dict[str, Any]]:
+        """Run every replica for the given number of rounds.
+
+        Return a list with the statistics of each replica, in the format
+        returned by simulation.Simulation.run.
+
+        Precondition: num_rounds >= 1.
+        """
+        for now in range(self.num_rounds, self.num_rounds + num_rounds):
+            self.num_rounds += 1
+
+            # Stage 1: generate new arrivals
+            self._generate_arrivals(now)
+
+            # Stage 2: leave elevators
+            self._handle_leaving(now)
+
+            # Stage 3: board elevators
+            self._handle_boarding(now)
+
+            # Stage 4: move the elevators using the moving algorithm
+            self._move_elevators()
+
+        return self._calculate_stats()
+
+    def _generate_arrivals(self, now: int) -> None:
+        """Add every replica's arrivals for round <now> to the person
+        arrays.
+        """
+        arrivals = [arrival_arrays(generator, now)
+                    for generator in self.arrival_generators]
+        counts = np.array([len(starts) for starts, _ in arrivals],
+                          dtype=np.int64)
+        if counts.sum() == 0:
+            return
+        new = self._add_people(
+            now, np.concatenate([starts for starts, _ in arrivals]),
+            np.concatenate([targets for _, targets in arrivals]))
+        self._replica[new] = np.repeat(np.arange(self.num_replicas), counts)
+        self._total_people += counts
+
+    def _add_waits(self, people: np.ndarray, waits: np.ndarray) -> None:
+        """Add the wait times <waits> to the summaries of the replicas of
+        <people>.
+        """
+        pairs, counts = np.unique(
+            np.column_stack((self._replica[people], waits)), axis=0,
+            return_counts=True)
+        # The pairs are sorted by replica; split them where it changes.
+        splits = np.flatnonzero(np.diff(pairs[:, 0])) + 1
+        for group, group_counts in zip(np.split(pairs, splits),
+                                       np.split(counts, splits)):
+            self._wait_stats[group[0, 0]].add_counts(group[:, 1].tolist(),
+                                                     group_counts.tolist())
+
+    ############################################################################
+    # Floor keys
+    ############################################################################
+    def _floor_keys(self, people: np.ndarray) -> np.ndarray:
+        """Return the keys of the start floors of <people>."""
+        return self._replica[people] * self._stride + self._start[people]
+
+    def _elevator_keys(self) -> np.ndarray:
+        """Return the key of the floor that each elevator is on."""
+        replicas = np.arange(self.num_replicas)[:, np.newaxis]
+        return replicas * self._stride + self.current_floor
+
+    ############################################################################
+    # Statistics calculations
+    ############################################################################
+    def wait_stats(self, replica: int) -> WaitStats:
+        """Return a summary of the wait times of the people who have
+        completed their journey in <replica>.
+
+        Summaries of several replicas can be merged to study them as one
+        population.
+        """
+        summary = WaitStats()
+        summary.merge(self._wait_stats[replica])
+        return summary
+
+    def _calculate_stats(self) -> List[Dict[str, Any]]:
+        """Report the statistics of each replica for the current run.
+
+        As for Simulation, the wait time statistics of a replica are -1 if
+        nobody has completed their journey in it.
+        """
+        stats = []
+        for r in range(self.num_replicas):
+            row = {
+                'num_iterations': self.num_rounds,
+                'total_people': int(self._total_people[r]),
+                'people_completed': self._wait_stats[r].count
+            }
+            row.update(self._wait_stats[r].report())
+            stats.append(row)
+        return stats
+
+
+def confidence_intervals(stats: List[Dict[str, Any]], z: float = 1.96
+                         ) -> Dict[str, Tuple[float, float, float]]:
+    """Return the mean of each statistic in SUMMARY_KEYS over the replica
+    statistics <stats>, with a normal-approximation confidence interval.
+
+    Each statistic is mapped to (mean, low, high), where low and high are
+    the mean minus and plus <z> standard errors; the default z of 1.96 gives
+    a 95% interval. Replicas where nobody completed their journey are left
+    out of the wait time statistics. A statistic with no values is mapped to
+    (-1, -1, -1), and one with a single value has an interval of width 0.
+    """
+    summary = {}
+    for key in SUMMARY_KEYS:
+        values = np.array([row[key] for row in stats
+                           if row['people_completed'] > 0
+                           or not key.endswith('_time')], dtype=float)
+        if len(values) == 0:
+            summary[key] = (-1, -1, -1)
+            continue
+        mean = float(values.mean())
+        if len(values) == 1:
+            half_width = 0.0
+        else:
+            half_width = z * float(values.std(ddof=1)) / math.sqrt(
+                len(values))
+        summary[key] = (mean, mean - half_width, mean + half_width)
+    return summary
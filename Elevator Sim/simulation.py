@@ -13,14 +13,28 @@ your simulation on a small configuration.
 Note that we have provided a fairly comprehensive list of attributes for
 Simulation already. You may add your own *private* attributes, but should not
 remove any of the existing attributes.
+
+Pygame is only imported when a simulation is created with visualize set to
+True: headless simulations use a NullVisualizer instead, so this module and
+algorithms can be imported and run on machines without a display (or without
+pygame at all). Run startup.py to measure how long these imports take.
 """
 # You may import more things from these modules (e.g., additional types from
 # typing), but you may not import from any other modules.
-from typing import Dict, List, Any
+from __future__ import annotations
+from typing import (Dict, List, Any, Callable, Optional, Tuple,
+                    TYPE_CHECKING)
 
 import algorithms
-from entities import Person, Elevator
-from visualizer import Visualizer
+from entities import Person, Elevator, RoundClock
+from floors import FloorQueues
+from profiling import as_hook, call_stage, finish_run
+from stats import WaitStats
+
+if TYPE_CHECKING:
+    from recorder import RoundRecorder
+    from renderer import SnapshotPublisher
+    from visualizer import Visualizer
 
 
 class Simulation:
@@ -31,24 +45,46 @@ class Simulation:
     elevators: a list of the elevators in the simulation
     moving_algorithm: the algorithm used to decide how to move elevators
     num_floors: the number of floors
-    visualizer: the Pygame visualizer used to visualize this simulation
-    waiting: a dictionary of people waiting for an elevator
-             (keys are floor numbers, values are the list of waiting people)
-    completed: a list of people who have completed their journey
+    visualizer: the Pygame visualizer used to visualize this simulation,
+                the renderer.SnapshotPublisher it was given, or a
+                NullVisualizer if this simulation is not visualized
+    waiting: the people waiting for an elevator on each floor
+             (used like a dictionary: keys are floor numbers, values are
+             the queue of people waiting there, earliest arrival first)
+    completed: a list of people who have completed their journey, if the
+               configuration sets 'record_completed' to True; otherwise
+               people are discarded as soon as they complete it, and this
+               list stays empty
     num_rounds:
+    wait_stats: a summary of the wait times of the people who have
+                completed their journey
+    recorder: the recorder of per-round metrics for this simulation, or
+              None if it records none
     """
     arrival_generator: algorithms.ArrivalGenerator
     elevators: List[Elevator]
     moving_algorithm: algorithms.MovingAlgorithm
     num_floors: int
-    visualizer: Visualizer
-    waiting: Dict[int, List[Person]]
+    visualizer: Visualizer | SnapshotPublisher | NullVisualizer
+    waiting: FloorQueues
     completed: List[Person]
     num_rounds: int
+    wait_stats: WaitStats
+    recorder: Optional[RoundRecorder]
 
     def __init__(self,
                  config: Dict[str, Any]) -> None:
-        """Initialize a new simulation using the given configuration."""
+        """Initialize a new simulation using the given configuration.
+
+        Besides the keys described in the assignment handout, the
+        configuration may set 'record_completed' to True to keep every
+        person who completes their journey in self.completed, and
+        'recorder' to a recorder.RoundRecorder to record metrics for every
+        round, and 'fast_forward' to True to skip idle rounds (see run).
+        It may also set 'publisher' to a renderer.SnapshotPublisher, which
+        is used instead of a visualizer to display the simulation from
+        another process without slowing it down.
+        """
 
         self.arrival_generator = config["arrival_generator"]
         self.moving_algorithm = config["moving_algorithm"]
@@ -58,20 +94,30 @@ class Simulation:
             self.elevators.append(Elevator(config["elevator_capacity"]))
             count += 1
         self.num_floors = config["num_floors"]
-        count2 = 0
-        self.waiting = {}
-        while not count2 == config["num_floors"]:
-            self.waiting[count2 + 1] = []
-            count2 += 1
+        self.waiting = FloorQueues(self.num_floors)
         self.completed = []
         self.num_rounds = 0
+        self.wait_stats = WaitStats()
+        self._record_completed = config.get('record_completed', False)
+        self.recorder = config.get('recorder')
+        self._fast_forward = config.get('fast_forward', False)
+        self._clock = RoundClock()
+        self._stage_hooks = []
 
         # Initialize the visualizer.
         # Note that this should be called *after* the other attributes
         # have been initialized.
-        self.visualizer = Visualizer(self.elevators
-                                     , self.num_floors
-                                     , config['visualize'])
+        if config.get('publisher') is not None:
+            self.visualizer = config['publisher']
+            self.visualizer.attach(self)
+        elif config['visualize']:
+            # Imported here so that headless runs never load pygame.
+            from visualizer import Visualizer
+            self.visualizer = Visualizer(self.elevators
+                                         , self.num_floors
+                                         , config['visualize'])
+        else:
+            self.visualizer = NullVisualizer()
 
     ############################################################################
     # Handle rounds of simulation.
@@ -84,116 +130,263 @@ class Simulation:
 
         Precondition: num_rounds >= 1.
 
-        Note: each run of the simulation starts from the same initial state
-        (no people, all elevators are empty and start at floor 1).
+        Note: the first run of the simulation starts from the initial state
+        (no people, all elevators are empty and start at floor 1). Later runs
+        carry on from where the previous run stopped, so running for 5 rounds
+        twice is the same as running for 10 rounds once: round numbers count
+        from the start of the first run.
+
+        If the configuration set 'fast_forward' to True, rounds in which
+        nothing can happen are skipped rather than simulated: see
+        _skip_idle_rounds. Skipped rounds still count towards num_rounds and
+        wait times, but are not visualized or recorded.
         """
-        for i in range(num_rounds):
+        end = self.num_rounds + num_rounds
+        while self.num_rounds < end:
+            round_num = self.num_rounds
+            # People's wait times are measured against this clock, so they
+            # grow by one each round without being updated individually.
+            self._clock.now = round_num
             self.num_rounds += 1
 
-            self.visualizer.render_header(i)
+            self.visualizer.render_header(round_num)
 
             # Stage 1: generate new arrivals
-            self._generate_arrivals(i)
+            self._call_stage('arrivals', self._generate_arrivals, round_num)
 
             # Stage 2: leave elevators
-            self._handle_leaving()
+            self._call_stage('leaving', self._handle_leaving)
 
             # Stage 3: board elevators
-            self._handle_boarding()
-
-            for elevator in self.elevators:
-                for person in elevator.passengers:
-                    person.increase_wait_time()
-
-            for floor in self.waiting:
-                for person in self.waiting[floor]:
-                    person.increase_wait_time()
+            self._call_stage('boarding', self._handle_boarding)
 
             # Stage 4: move the elevators using the moving algorithm
-            self._move_elevators()
+            moves = self._call_stage('moving', self._move_elevators)
+
+            if self.recorder is not None:
+                self._record_round()
 
             # Pause for 1 second
             self.visualizer.wait(1)
 
+            if self._fast_forward and self._is_idle(moves):
+                self._skip_idle_rounds(end)
+
+        # Everybody still travelling has now waited through the last round
+        # as well.
+        self._clock.now = end
+        if self.recorder is not None:
+            self.recorder.flush()
+        finish_run(self, self._stage_hooks)
         return self._calculate_stats()
 
+    def add_stage_hook(self, hook: Any) -> None:
+        """Register <hook> to observe the stages of this simulation's runs.
+
+        <hook> is a profiling.StageHook, or a function called with the
+        stage name, round number and time taken whenever a stage finishes.
+        """
+        self._stage_hooks.append(as_hook(hook))
+
+    def remove_stage_hook(self, hook: Any) -> None:
+        """Stop <hook> from observing this simulation's runs.
+
+        Raise ValueError if <hook> is not registered.
+        """
+        for registered in self._stage_hooks:
+            if registered is hook or getattr(registered, 'callback',
+                                             None) is hook:
+                self._stage_hooks.remove(registered)
+                return
+        raise ValueError('hook is not registered')
+
+    def _call_stage(self, stage: str, function: Callable, *args: Any) -> Any:
+        """Call <function> with <args> as <stage> of the current round, and
+        return what it returns.
+
+        The stage is reported to this simulation's stage hooks, if it has
+        any; see profiling.py.
+        """
+        if not self._stage_hooks:
+            return function(*args)
+        return call_stage(self._stage_hooks, stage, self.num_rounds - 1,
+                          function, *args)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of this simulation for pickling (see
+        checkpoint.py).
+
+        The visualizer, recorder and stage hooks are left out: a restored
+        simulation is headless, records nothing and has no hooks until they
+        are given to it again.
+        """
+        state = self.__dict__.copy()
+        state['visualizer'] = None
+        state['recorder'] = None
+        state['_stage_hooks'] = []
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore this simulation from a pickled state."""
+        self.__dict__.update(state)
+        self.visualizer = NullVisualizer()
+
     def _generate_arrivals(self, round_num: int) -> None:
         """Generate and visualize new arrivals."""
         new_people = self.arrival_generator.generate(round_num)
-        for _, people in new_people.items():
-            if not people == []:
-                for floor in new_people:
-                    count = 0
-                    while not count == len(new_people[floor]):
-                        self.waiting[floor] = [new_people[floor].pop()] + \
-                                          self.waiting[floor]
-                self.visualizer.show_arrivals(self.waiting)
-            else:
-                return None
+        arrived = False
+        for floor, people in new_people.items():
+            for person in people:
+                person.arrive(self._clock)
+                self.waiting.enqueue(floor, person)
+                arrived = True
+        if arrived:
+            self.visualizer.show_arrivals(new_people)
 
     def _handle_leaving(self) -> None:
-        """Handle people leaving elevators."""
-        count = 0
+        """Handle people leaving elevators.
+
+        Everybody leaving in this round is visualized together.
+        """
+        leaving = []
         for elevator in self.elevators:
-            for person in elevator.passengers:
-                count += 1
-                if person.target == elevator.current_floor:
-                    self.visualizer.show_disembarking(person, elevator)
-                    elevator.passengers.remove(person)
+            for person in elevator.unload(elevator.current_floor):
+                leaving.append((person, elevator))
+                person.finish()
+                self.wait_stats.add(person.wait_time)
+                if self._record_completed:
                     self.completed.append(person)
+        if leaving:
+            self.visualizer.show_disembarking_batch(leaving)
 
     def _handle_boarding(self) -> None:
-        """Handle boarding of people and visualize."""
-        for elevator in self.elevators:
-            while not len(self.waiting.get(elevator.current_floor)) == 0 and \
-                    not len(elevator.passengers) == elevator.max_capacity:
-                person = self.waiting.get(elevator.current_floor).pop()
-                self.visualizer.show_boarding(person, elevator)
-                elevator.passengers += [person]
+        """Handle boarding of people and visualize.
 
-    def _move_elevators(self) -> None:
+        Everybody boarding in this round is visualized together.
+        """
+        boarding = []
+        for elevator in self.elevators:
+            while self.waiting.count(elevator.current_floor) > 0 and \
+                    not elevator.num_passengers() == elevator.max_capacity:
+                person = self.waiting.dequeue(elevator.current_floor)
+                boarding.append((person, elevator))
+                elevator.board(person)
+        if boarding:
+            self.visualizer.show_boarding_batch(boarding)
+
+    def _move_elevators(self) -> List[algorithms.Direction]:
         """Move the elevators in this simulation.
         Use this simulation's moving algorithm to move the elevators.
+
+        Return the directions the elevators moved in.
         """
-        moves = self.moving_algorithm.move_elevators(self.elevators,
-                                                     self.waiting,
-                                                     self.num_floors)
+        moves = self._call_stage('algorithm',
+                                 self.moving_algorithm.move_elevators,
+                                 self.elevators, self.waiting,
+                                 self.num_floors)
         self.visualizer.show_elevator_moves(self.elevators, moves)
+        return moves
+
+    def _is_idle(self, moves: List[algorithms.Direction]) -> bool:
+        """Return whether this simulation is idle after a round in which the
+        elevators moved in directions <moves>.
+
+        The simulation is idle if nobody is waiting or riding, every elevator
+        stayed put, and the moving algorithm is deterministic: until somebody
+        arrives, every round would then be exactly the same as the last.
+        """
+        deterministic = getattr(self.moving_algorithm, 'deterministic',
+                                False)
+        return deterministic and \
+            self.waiting.total() == 0 and \
+            all(elevator.num_passengers() == 0
+                for elevator in self.elevators) and \
+            all(move == algorithms.Direction.STAY for move in moves)
+
+    def _skip_idle_rounds(self, end: int) -> None:
+        """Skip the rounds up to the next round in which somebody arrives,
+        or up to round <end>, if that comes first.
+
+        Precondition: this simulation is idle.
+        """
+        next_round = self.arrival_generator.next_arrival_round(
+            self.num_rounds)
+        if next_round is None or next_round > end:
+            next_round = end
+        self.num_rounds = max(self.num_rounds, next_round)
+
+    def _record_round(self) -> None:
+        """Record this round's metrics with this simulation's recorder."""
+        waiting = [0] * self.num_floors
+        for floor in self.waiting.occupied():
+            waiting[floor - 1] = self.waiting.count(floor)
+        loads = [elevator.num_passengers() for elevator in self.elevators]
+        self.recorder.record(
+            self.num_rounds - 1,
+            self.waiting.total() + sum(loads) + self.wait_stats.count,
+            self.wait_stats.count, waiting,
+            [elevator.current_floor for elevator in self.elevators], loads)
 
     ############################################################################
     # Statistics calculations
     ############################################################################
 
-    def _calculate_stats(self) -> Dict[str, int]:
+    def _calculate_stats(self) -> Dict[str, Any]:
         """Report the statistics for the current run of this simulation.
-        """
-        total_people = 0
-        sum_wait_time = 0
-        max_wait = 0
-        min_wait = self.num_rounds
-        for floor in self.waiting:
-            total_people += len(self.waiting[floor])
 
+        Besides the statistics in the assignment handout, the standard
+        deviation of the wait times (std_time) and their 50th, 90th and 99th
+        percentiles (p50_time, p90_time and p99_time) are reported; see
+        stats.WaitStats. If nobody has completed their journey, all of the
+        wait time statistics are -1.
+        """
+        total_people = self.waiting.total() + self.wait_stats.count
         for elevator in self.elevators:
-            total_people += len(elevator.passengers)
-
-        for person in self.completed:
-            sum_wait_time += person.wait_time
-            if min_wait > person.wait_time:
-                min_wait = person.wait_time
-            if max_wait < person.wait_time:
-                max_wait = person.wait_time
-        total_people += len(self.completed)
-        avg_time = sum_wait_time / len(self.completed)
-        print(f'{min_wait}  {avg_time}  {max_wait}')
-        return {
+            total_people += elevator.num_passengers()
+
+        stats = {
             'num_iterations': self.num_rounds,
             'total_people': total_people,
-            'people_completed': len(self.completed),
-            'max_time': max_wait,
-            'min_time': min_wait,
-            'avg_time': avg_time
+            'people_completed': self.wait_stats.count
         }
+        stats.update(self.wait_stats.report())
+        return stats
+
+
+class NullVisualizer:
+    """A visualizer that draws nothing, used when visualize is False.
+
+    It has the same public methods as visualizer.Visualizer, but does not
+    depend on pygame.
+    """
+
+    def render_header(self, round_num: int) -> None:
+        """Do nothing."""
+
+    def show_arrivals(self, arrivals: Dict[int, List[Person]]) -> None:
+        """Do nothing."""
+
+    def show_boarding(self, person: Person, elevator: Elevator) -> None:
+        """Do nothing."""
+
+    def show_disembarking(self, person: Person, elevator: Elevator) -> None:
+        """Do nothing."""
+
+    def show_boarding_batch(self,
+                            boarding: List[Tuple[Person, Elevator]]) -> None:
+        """Do nothing."""
+
+    def show_disembarking_batch(
+            self, leaving: List[Tuple[Person, Elevator]]) -> None:
+        """Do nothing."""
+
+    def show_elevator_moves(self,
+                            elevators: List[Elevator],
+                            directions: List[algorithms.Direction]) -> None:
+        """Do nothing."""
+
+    def wait(self, wait_time: int) -> None:
+        """Do nothing."""
 
 
 def sample_run() -> Dict[str, int]:
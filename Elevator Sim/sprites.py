@@ -14,17 +14,32 @@ DO NOT CHANGE ANY CODE IN THIS FILE. You don't need to for this assignment,
 and in fact you aren't even submitting this file!
 
 The two classes whose documentation you are required to read are ElevatorSprite
-and PersonSprite, as you'll be implementing their subclasses.
+and PersonSprite. Each one draws a single entity from entities.py: the
+Visualizer creates them lazily, the first time it renders a given Person or
+Elevator, so headless simulations never construct any of these sprites.
 You can completely ignore the other Sprite classes in this file.
+
+Every sprite is a pygame DirtySprite: the Visualizer only redraws a sprite
+when its dirty flag is set, so whatever changes a sprite's image or position
+must set it.
 """
+from __future__ import annotations
 import random
-from typing import Any
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
 import pygame
 
+if TYPE_CHECKING:
+    from entities import Person, Elevator
+
 
 # Images for people
 FIGURES = [f'people/person{i}.png' for i in range(1, 6)]
 
+# Scaled images for people, keyed by (anger level, width, height).
+# Every PersonSprite shares these surfaces, so each image file is decoded and
+# scaled at most once per process; see person_image().
+_PERSON_IMAGES: Dict[Tuple[int, int, int], pygame.Surface] = {}
+
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -49,26 +64,55 @@ PERSON_WIDTH = 32         # Person width
 
 # Fonts
 FONT_HEIGHT = 30
-pygame.init()
-COMIC_SANS = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+# Loaded on first use by comic_sans(); scanning the system fonts is slow, so
+# importing this module must not do it.
+_COMIC_SANS: Optional[pygame.font.Font] = None
+
+
+def comic_sans() -> pygame.font.Font:
+    """Return the font used for all text sprites, loading it on first use."""
+    global _COMIC_SANS
+    if _COMIC_SANS is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        _COMIC_SANS = pygame.font.SysFont('Comic Sans MS', FONT_HEIGHT)
+    return _COMIC_SANS
+
+
+def person_image(anger_level: int, width: int, height: int) -> pygame.Surface:
+    """Return the image for a person with the given anger level, scaled to
+    <width> x <height>.
+
+    The surface is shared by every caller, and must not be drawn on.
+    """
+    key = (anger_level, width, height)
+    image = _PERSON_IMAGES.get(key)
+    if image is None:
+        image = pygame.transform.scale(
+            pygame.image.load(FIGURES[anger_level]), (width, height))
+        _PERSON_IMAGES[key] = image
+    return image
 
 
 ###############################################################################
 # Sprites
 ###############################################################################
-class ElevatorSprite(pygame.sprite.Sprite):
+class ElevatorSprite(pygame.sprite.DirtySprite):
     """Sprite representing an elevator.
 
     === Attributes ===
+    elevator: the elevator drawn by this sprite
     image: the Pygame surface on which to draw this sprite
     rect: the rectangle representing the dimensions of this sprite
     """
+    elevator: Elevator
     image: pygame.Surface
     rect: pygame.Rect
 
-    def __init__(self) -> None:
-        """Initialize a new ElevatorSprite."""
-        pygame.sprite.Sprite.__init__(self)
+    def __init__(self, elevator: Elevator) -> None:
+        """Initialize a new ElevatorSprite for the given elevator."""
+        pygame.sprite.DirtySprite.__init__(self)
+        self.elevator = elevator
         self.image = pygame.Surface([ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
         self.image.fill(GREEN)
         self.image.set_colorkey(WHITE)
@@ -81,62 +125,82 @@ class ElevatorSprite(pygame.sprite.Sprite):
         pygame.draw.rect(self.image, DARK_GREEN,
                          [0, ELEVATOR_HEIGHT * (1 - self.fullness()),
                           ELEVATOR_WIDTH, ELEVATOR_HEIGHT])
+        self.dirty = 1
 
     def fullness(self) -> float:
-        """Return the fraction that this elevator is filled.
+        """Return the fraction that this sprite's elevator is filled.
 
         The value returned should be a float between 0.0 (completely empty) and
         1.0 (completely full).
         """
-        raise NotImplementedError
+        return self.elevator.fullness()
 
 
-class PersonSprite(pygame.sprite.Sprite):
+class PersonSprite(pygame.sprite.DirtySprite):
     """Sprite representing a person.
 
     === Attributes ===
+    person: the person drawn by this sprite
     height: the height of the person sprite
     width: the width of the person sprite
     image: the Pygame surface on which to draw this sprite
     rect: the rectangle representing the dimensions of this sprite
+    image_level: the anger level that <image> was loaded for
 
     === Representation Invariants ===
     height >= 0
     width >= 0
+    0 <= image_level <= 4
     """
+    person: Person
     height: int
     width: int
     image: pygame.Surface
     rect: pygame.Rect
+    image_level: int
 
-    def __init__(self) -> None:
-        """Initialize a new person sprite."""
+    def __init__(self, person: Person) -> None:
+        """Initialize a new sprite for the given person."""
         super().__init__()
+        self.person = person
         self.width, self.height = PERSON_WIDTH, PERSON_HEIGHT
+        self.image_level = self.get_anger_level()
         self.image = self.load_image()
         self.rect = self.image.get_rect()
         self.rect.bottom = 0
         self.rect.centerx = random.randint(-2, 2)
 
     def load_image(self) -> Any:
-        """Load the image for this sprite and redraws it
+        """Return the image for this sprite's current anger level.
         Lower indices are happier :)
         """
-        image = pygame.image.load(FIGURES[self.get_anger_level()])
-        return pygame.transform.scale(image, (self.width, self.height))
+        return person_image(self.get_anger_level(), self.width, self.height)
+
+    def refresh_image(self) -> bool:
+        """Swap this sprite's image if its person's anger level has changed.
+
+        Return whether the image was swapped.
+        """
+        level = self.get_anger_level()
+        if level == self.image_level:
+            return False
+        self.image_level = level
+        self.image = person_image(level, self.width, self.height)
+        self.dirty = 1
+        return True
 
     def get_anger_level(self) -> int:
-        """Return the anger level of this sprite.
+        """Return the anger level of this sprite's person.
 
         This determines the image used to render this sprite.
 
         Anger level must be an integer between 0 and 4, inclusive.
         (0 means not at all angry, 4 is very angry)
         """
-        raise NotImplementedError
+        return self.person.get_anger_level()
 
 
-class FloorSprite(pygame.sprite.Sprite):
+class FloorSprite(pygame.sprite.DirtySprite):
     """Sprite that draws a floor of the building.
     """
     def __init__(self, width: int, height: int, y: int) -> None:
@@ -149,25 +213,31 @@ class FloorSprite(pygame.sprite.Sprite):
         self.rect.top = y
 
 
-class FloorNum(pygame.sprite.Sprite):
+class FloorNum(pygame.sprite.DirtySprite):
     """Text Sprite to Label the floor number.
     """
     def __init__(self, floor_y: int, text: str) -> None:
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = comic_sans()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.bottom = floor_y
         self.rect.right = WIDTH - 20
 
 
-class StatLine(pygame.sprite.Sprite):
+class StatLine(pygame.sprite.DirtySprite):
     """Text Sprite for displaying some text.
     """
     def __init__(self, y: int, text: str):
         super().__init__()
-        self.floor_font = COMIC_SANS
+        self.floor_font = comic_sans()
         self.image = self.floor_font.render(text, True, BLACK)
         self.rect = self.image.get_rect()
         self.rect.top = y
         self.rect.left = 5
+
+    def set_text(self, text: str) -> None:
+        """Change the text displayed by this sprite."""
+        self.image = self.floor_font.render(text, True, BLACK)
+        self.rect.size = self.image.get_size()
+        self.dirty = 1
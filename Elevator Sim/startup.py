@@ -0,0 +1,73 @@
+"""CSC148 Assignment 1 - Startup timing
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module measures how long it takes a fresh Python process to import the
+simulation modules, and whether doing so loads pygame.
+
+Each module is imported in its own interpreter (started with -X importtime),
+so the numbers match what a newly started worker process would pay. Run this
+file directly to print a report:
+
+    python startup.py [module ...]
+"""
+import subprocess
+import sys
+from typing import Dict, List, Union
+
+# Modules timed when none are given on the command line.
+DEFAULT_MODULES = ['algorithms', 'entities', 'simulation', 'visualizer']
+
+
+def measure_import_time(module: str) -> Dict[str, Union[str, float, bool]]:
+    """Return import statistics for <module>, measured in a new interpreter.
+
+    The returned dictionary has these keys:
+        module: the module name
+        import_ms: the cumulative time spent importing <module>, in
+                   milliseconds (as reported by -X importtime)
+        pygame_loaded: whether pygame was imported as a side effect
+        error: the last line of the error output if the import failed,
+               or '' if it succeeded
+    """
+    code = (f'import sys; import {module}; '
+            f'print("pygame" in sys.modules)')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True)
+    import_us = 0
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:  self [us] | cumulative | name".
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            import_us = int(fields[1])
+    error = ''
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1]
+    return {
+        'module': module,
+        'import_ms': import_us / 1000,
+        'pygame_loaded': result.stdout.strip() == 'True',
+        'error': error
+    }
+
+
+def report(modules: List[str]) -> str:
+    """Return a table of import statistics for each module in <modules>."""
+    lines = [f'{"module":<14}{"import (ms)":>12}  pygame loaded']
+    for module in modules:
+        stats = measure_import_time(module)
+        if stats['error']:
+            lines.append(f'{module:<14}{"failed":>12}  {stats["error"]}')
+        else:
+            lines.append(f'{module:<14}{stats["import_ms"]:>12.1f}  '
+                         f'{stats["pygame_loaded"]}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(report(sys.argv[1:] or DEFAULT_MODULES))
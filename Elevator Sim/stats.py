@@ -0,0 +1,211 @@
+"""CSC148 Assignment 1 - Streaming wait time statistics
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains WaitStats, which summarizes the wait times of the people
+who complete their journey as they complete it, so that a simulation does not
+need to keep them around until the end of a run.
+
+Wait times are whole numbers of rounds, so their count, total and sum of
+squares are kept exactly as integers; the mean and standard deviation are
+computed from these, and two WaitStats can be merged without any loss.
+
+Quantiles (the median, the 90th and the 99th percentile, ...) are read from a
+log-linear histogram, in the style of HdrHistogram: every wait time below
+SUB_BUCKETS has a bucket of its own, and each larger power of two is split
+into SUB_BUCKETS // 2 buckets of equal width. A run of any length therefore
+uses a few hundred counters at most, and a reported quantile is never below
+the true one and exceeds it by less than 2 / SUB_BUCKETS of its value.
+"""
+import math
+from typing import Any, Dict, Iterable, List
+
+# The number of wait times with a bucket of their own. Must be a power of 2.
+SUB_BUCKETS = 128
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+_HALF = SUB_BUCKETS // 2
+
+# The quantiles reported by WaitStats.report, with their statistic names.
+QUANTILES = {'p50_time': 0.5, 'p90_time': 0.9, 'p99_time': 0.99}
+
+
+def bucket_index(value: int) -> int:
+    """Return the histogram bucket of the wait time <value>.
+
+    >>> bucket_index(5)
+    5
+    >>> bucket_index(SUB_BUCKETS) == bucket_index(SUB_BUCKETS + 1)
+    True
+
+    Precondition: value >= 0
+    """
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BITS
+    return SUB_BUCKETS + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+
+def bucket_high(index: int) -> int:
+    """Return the largest wait time in the histogram bucket <index>.
+
+    >>> bucket_high(5)
+    5
+    >>> bucket_high(bucket_index(SUB_BUCKETS))
+    129
+    """
+    if index < SUB_BUCKETS:
+        return index
+    shift, top = divmod(index - SUB_BUCKETS, _HALF)
+    shift += 1
+    return ((top + _HALF + 1) << shift) - 1
+
+
+class WaitStats:
+    """A constant-memory summary of a stream of wait times.
+
+    >>> stats = WaitStats()
+    >>> for wait in [3, 1, 4, 1, 5]:
+    ...     stats.add(wait)
+    >>> stats.count, stats.minimum, stats.maximum, stats.mean()
+    (5, 1, 5, 2.8)
+    >>> stats.quantile(0.5)
+    3
+
+    === Attributes ===
+    count: the number of wait times added
+    total: the sum of the wait times added
+    squares: the sum of the squares of the wait times added
+    minimum: the smallest wait time added, or None if there are none
+    maximum: the largest wait time added, or None if there are none
+    buckets: the number of wait times added in each histogram bucket
+
+    === Representation invariants ===
+    count == sum(buckets)
+    """
+    count: int
+    total: int
+    squares: int
+    minimum: Any
+    maximum: Any
+    buckets: List[int]
+
+    def __init__(self) -> None:
+        """Initialize an empty summary."""
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.minimum = None
+        self.maximum = None
+        self.buckets = []
+
+    def add(self, value: int) -> None:
+        """Add the wait time <value> to this summary.
+
+        Precondition: value >= 0
+        """
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self._count_bucket(bucket_index(value), 1)
+
+    def add_counts(self, values: Iterable[int],
+                   counts: Iterable[int]) -> None:
+        """Add counts[i] copies of the wait time values[i] to this summary,
+        for each i.
+
+        This lets callers that have many wait times at once (such as
+        engine.ArraySimulation) add each distinct value only once.
+
+        Precondition: every value is >= 0 and every count is >= 1
+        """
+        for value, count in zip(values, counts):
+            self.count += count
+            self.total += value * count
+            self.squares += value * value * count
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+            self._count_bucket(bucket_index(value), count)
+
+    def merge(self, other: 'WaitStats') -> None:
+        """Add all of the wait times summarized by <other> to this
+        summary.
+        """
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+        for index, count in enumerate(other.buckets):
+            if count:
+                self._count_bucket(index, count)
+
+    def _count_bucket(self, index: int, count: int) -> None:
+        """Add <count> to the histogram bucket <index>."""
+        if index >= len(self.buckets):
+            self.buckets.extend([0] * (index + 1 - len(self.buckets)))
+        self.buckets[index] += count
+
+    def mean(self) -> float:
+        """Return the mean wait time.
+
+        Precondition: self.count > 0
+        """
+        return self.total / self.count
+
+    def std(self) -> float:
+        """Return the (population) standard deviation of the wait times.
+
+        Precondition: self.count > 0
+        """
+        spread = self.count * self.squares - self.total * self.total
+        return math.sqrt(spread) / self.count
+
+    def quantile(self, q: float) -> int:
+        """Return the wait time at quantile <q>: the smallest wait time that
+        at least a fraction <q> of the wait times are at most.
+
+        Wait times from SUB_BUCKETS up are rounded up to the end of their
+        histogram bucket, but never past the largest wait time.
+
+        Precondition: self.count > 0 and 0 <= q <= 1
+        """
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bucket_high(index), self.maximum)
+        return self.maximum
+
+    def report(self) -> Dict[str, Any]:
+        """Return the wait time statistics reported by a simulation run.
+
+        If no wait times have been added, every statistic is -1.
+        """
+        if self.count == 0:
+            report = {'max_time': -1, 'min_time': -1, 'avg_time': -1,
+                      'std_time': -1}
+            report.update({name: -1 for name in QUANTILES})
+            return report
+        report = {
+            'max_time': self.maximum,
+            'min_time': self.minimum,
+            'avg_time': self.mean(),
+            'std_time': self.std()
+        }
+        for name, q in QUANTILES.items():
+            report[name] = self.quantile(q)
+        return report
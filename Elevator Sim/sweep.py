@@ -0,0 +1,219 @@
+"""CSC148 Assignment 1 - Parameter sweeps
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs a simulation for every point of a grid of configurations,
+spreading the points over a pool of worker processes, and collects their
+statistics into one table.
+
+Each point is a dictionary with the keys num_floors, num_elevators,
+elevator_capacity, moving_algorithm, arrivals, seed and engine. Since
+points are sent to other processes, algorithms and arrival generators are
+given by name rather than as objects:
+    moving_algorithm: one of the keys of MOVING_ALGORITHMS
+    arrivals: an arrival specification (see build_arrivals)
+    engine: 'objects' for simulation.Simulation, or 'arrays' for
+            engine.ArraySimulation
+
+Every worker is headless, and every point is seeded on its own, so a sweep
+gives the same results however it is split between processes.
+
+Run this file directly to run a sweep from the command line, for example:
+
+    python sweep.py --floors 5,10 --elevators 2,4 --capacity 1,4 \\
+        --algorithms pushy,short_sighted --arrivals random:4 \\
+        --seeds 0,1,2 --rounds 200 --output results.csv
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import random
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import algorithms
+from simulation import Simulation
+
+MOVING_ALGORITHMS = {
+    'random': algorithms.RandomAlgorithm,
+    'pushy': algorithms.PushyPassenger,
+    'short_sighted': algorithms.ShortSighted
+}
+
+# The keys of each grid point, in the order they appear in result tables.
+POINT_KEYS = ['num_floors', 'num_elevators', 'elevator_capacity',
+              'moving_algorithm', 'arrivals', 'seed', 'engine']
+# The statistics reported for each point, in table order.
+STAT_KEYS = ['num_iterations', 'total_people', 'people_completed',
+             'max_time', 'min_time', 'avg_time', 'std_time', 'p50_time',
+             'p90_time', 'p99_time']
+
+
+def make_grid(num_floors: Iterable[int],
+              num_elevators: Iterable[int],
+              elevator_capacity: Iterable[int],
+              moving_algorithm: Iterable[str],
+              arrivals: Iterable[str],
+              seed: Iterable[int],
+              engine: Iterable[str] = ('objects',)) -> List[Dict[str, Any]]:
+    """Return every combination of the given values as a list of grid
+    points.
+    """
+    axes = [list(num_floors), list(num_elevators), list(elevator_capacity),
+            list(moving_algorithm), list(arrivals), list(seed), list(engine)]
+    return [dict(zip(POINT_KEYS, values))
+            for values in itertools.product(*axes)]
+
+
+def build_arrivals(spec: str, num_floors: int,
+                   seed: int) -> algorithms.ArrivalGenerator:
+    """Return the arrival generator described by <spec>, seeded with <seed>
+    if it is random.
+
+    <spec> is one of:
+        random:N        algorithms.RandomArrivals with N people per round
+        vector:N        generators.VectorRandomArrivals with N people per
+                        round
+        file:PATH       algorithms.StreamingFileArrivals reading PATH
+        trace:PATH      arrival_trace.MappedArrivals mapping PATH
+        poisson:RATE    generators.PoissonArrivals over an office day, with
+                        RATE arrivals per round at each peak
+        poisson:RATE:H  as above, with H rounds per hour
+
+    Raise ValueError if <spec> is not one of these.
+    """
+    kind, _, argument = spec.partition(':')
+    if kind == 'random':
+        return algorithms.RandomArrivals(num_floors, int(argument), seed)
+    if kind == 'file':
+        return algorithms.StreamingFileArrivals(num_floors, argument)
+    if kind == 'vector':
+        from generators import VectorRandomArrivals
+        return VectorRandomArrivals(num_floors, int(argument), seed)
+    if kind == 'trace':
+        from arrival_trace import MappedArrivals
+        return MappedArrivals(num_floors, argument)
+    if kind == 'poisson':
+        from generators import PoissonArrivals, office_day
+        rate, _, per_hour = argument.partition(':')
+        profiles = office_day(num_floors, float(rate),
+                              float(per_hour or 3600))
+        return PoissonArrivals(num_floors, profiles, seed)
+    raise ValueError(f'unknown arrival specification {spec!r}')
+
+
+def build_simulation(point: Dict[str, Any]) -> Any:
+    """Return a new headless simulation of the given grid point, with the
+    random module and the arrival generator seeded from the point.
+    """
+    seed = point['seed']
+    # RandomAlgorithm uses the random module directly.
+    random.seed(seed)
+    config = {
+        'num_floors': point['num_floors'],
+        'num_elevators': point['num_elevators'],
+        'elevator_capacity': point['elevator_capacity'],
+        'arrival_generator': build_arrivals(point['arrivals'],
+                                            point['num_floors'], seed),
+        'moving_algorithm': MOVING_ALGORITHMS[point['moving_algorithm']](),
+        'seed': seed,
+        'visualize': False
+    }
+    if point['engine'] == 'arrays':
+        from engine import ArraySimulation
+        return ArraySimulation(config)
+    return Simulation(config)
+
+
+def run_point(point: Dict[str, Any], num_rounds: int) -> Dict[str, Any]:
+    """Run a headless simulation of the given grid point for <num_rounds>
+    rounds, and return the point together with its statistics.
+    """
+    row = dict(point)
+    row.update(build_simulation(point).run(num_rounds))
+    return row
+
+
+def _run_task(task: tuple) -> Dict[str, Any]:
+    """Run one (point, num_rounds) task in a worker process."""
+    return run_point(*task)
+
+
+def run_sweep(points: List[Dict[str, Any]], num_rounds: int,
+              processes: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run every point in <points> for <num_rounds> rounds and yield their
+    results as they finish, in no particular order.
+
+    The points are spread over <processes> worker processes (by default, one
+    per CPU). With processes == 1, the points are run in this process.
+    """
+    tasks = [(point, num_rounds) for point in points]
+    if processes == 1:
+        yield from map(_run_task, tasks)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(_run_task, tasks)
+
+
+def write_table(rows: Iterable[Dict[str, Any]], output: Any) -> int:
+    """Write <rows> as CSV to the open file <output>, flushing after each
+    row, and return the number of rows written.
+    """
+    writer = csv.DictWriter(output, fieldnames=POINT_KEYS + STAT_KEYS,
+                            extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        output.flush()
+        count += 1
+    return count
+
+
+def _int_list(text: str) -> List[int]:
+    """Return the comma-separated integers in <text>."""
+    return [int(value) for value in text.split(',')]
+
+
+def _str_list(text: str) -> List[str]:
+    """Return the comma-separated values in <text>."""
+    return text.split(',')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a sweep described by the command-line arguments <argv>."""
+    parser = argparse.ArgumentParser(
+        description='Run the elevator simulation over a grid of '
+                    'configurations.')
+    parser.add_argument('--floors', type=_int_list, default=[5])
+    parser.add_argument('--elevators', type=_int_list, default=[2])
+    parser.add_argument('--capacity', type=_int_list, default=[1])
+    parser.add_argument('--algorithms', type=_str_list,
+                        default=['short_sighted'])
+    parser.add_argument('--arrivals', type=_str_list, default=['random:2'])
+    parser.add_argument('--seeds', type=_int_list, default=[0])
+    parser.add_argument('--engines', type=_str_list, default=['objects'])
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default=None,
+                        help='CSV file to write (default: standard output)')
+    args = parser.parse_args(argv)
+
+    points = make_grid(args.floors, args.elevators, args.capacity,
+                       args.algorithms, args.arrivals, args.seeds,
+                       args.engines)
+    results = run_sweep(points, args.rounds, args.processes)
+    if args.output is None:
+        write_table(results, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            count = write_table(results, output)
+        print(f'{count} results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,14 +12,22 @@ There's quite a bit in this file, but you aren't responsible for most of it.
 
 DO NOT CHANGE ANY CODE IN THIS FILE. You don't need to for this assignment,
 and in fact you aren't even submitting this file!
+
+Every sprite is drawn from one layered group of dirty sprites: each frame
+only redraws the sprites that moved or changed, over the background where
+they were, and only those parts of the screen are updated. All of a round's
+boardings (and all of its disembarkings) play in a single animation, so a
+busy round takes no longer to show than a quiet one. People are removed
+from the screen once they have walked out of their elevator.
 """
 from __future__ import annotations
 import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import pygame
 from algorithms import Direction
+from entities import Person, Elevator
 import sprites
 
 
@@ -35,6 +43,15 @@ FLOOR_BORDER_HEIGHT = 10  # The height of the border
 # FPS based on config speed
 FPS = 60
 
+# The number of frames in each animation.
+ANIMATION_FRAMES = 20
+
+# Drawing layers, from the back.
+FLOOR_LAYER = 0
+ELEVATOR_LAYER = 1
+PERSON_LAYER = 2
+STAT_LAYER = 3
+
 
 class Visualizer:
     """Visualizer for the current state of a simulation.
@@ -43,7 +60,7 @@ class Visualizer:
     understanding them, and they are left undocumented.
     """
     def __init__(self,
-                 elevators: List[sprites.ElevatorSprite],
+                 elevators: List[Elevator],
                  num_floors: int,
                  visualize: bool) -> None:
         """Initialize this visualization.
@@ -61,27 +78,29 @@ class Visualizer:
         pygame.init()
         self._clock = pygame.time.Clock()
 
-        self._screen = pygame.display.set_mode(
-            (WIDTH, self._total_height()), pygame.HWSURFACE | pygame.DOUBLEBUF)
-        self._screen.fill(WHITE)
+        self._screen = pygame.display.set_mode((WIDTH, self._total_height()))
+        self._background = pygame.Surface(self._screen.get_size())
+        self._background.fill(WHITE)
+        self._screen.blit(self._background, (0, 0))
 
         # Contains all sprites in the simulation
-        self._sprite_group = pygame.sprite.Group()
-        self._stats_group = pygame.sprite.Group()
+        self._sprite_group = pygame.sprite.LayeredDirty()
+        self._sprite_group.clear(self._screen, self._background)
+        self._header = sprites.StatLine(0, '')
+        self._sprite_group.add(self._header, layer=STAT_LAYER)
 
         self._setup_sprites(elevators)
         # Initial render.
+        pygame.display.flip()
         self.render()
 
     def render_header(self, round_num: int) -> None:
         """Render text displaying the round number for this simulation."""
         if not self._visualize:
             return
-        self._stats_group.remove(list(self._stats_group))
-        self._stats_group.add(sprites.StatLine(0, f'Round {round_num}'))
-        for sprite in self._sprite_group:
-            if isinstance(sprite, sprites.PersonSprite):
-                sprite.image = sprite.load_image()
+        self._header.set_text(f'Round {round_num}')
+        for sprite in self._sprite_group.get_sprites_from_layer(PERSON_LAYER):
+            sprite.refresh_image()
         self.render()
 
     def _total_height(self) -> int:
@@ -98,7 +117,8 @@ class Visualizer:
         )
 
     def render(self) -> None:
-        """Draw the current state of the simulation to the screen.
+        """Draw the parts of the simulation that changed since the last
+        render to the screen.
         """
         if not self._visualize:
             return
@@ -106,14 +126,12 @@ class Visualizer:
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
 
-        self._screen.fill(WHITE)
-        self._sprite_group.draw(self._screen)
-        self._stats_group.draw(self._screen)
+        changed = self._sprite_group.draw(self._screen)
         self._clock.tick(FPS)
-        pygame.display.flip()
+        pygame.display.update(changed)
 
     def show_arrivals(self,
-                      arrivals: Dict[int, List[sprites.PersonSprite]]) -> None:
+                      arrivals: Dict[int, List[Person]]) -> None:
         """Show new arrivals."""
         if not self._visualize:
             return
@@ -122,64 +140,97 @@ class Visualizer:
         for floor, people in arrivals.items():
             y = self.get_y_of_floor(floor)
             for person in people:
-                person.rect.bottom = y
-                person.rect.centerx = x + random.randint(-3, 3)
-                self._sprite_group.add(person)
+                sprite = self._person_sprite(person)
+                sprite.rect.bottom = y
+                sprite.rect.centerx = x + random.randint(-3, 3)
+                sprite.dirty = 1
+                self._sprite_group.add(sprite, layer=PERSON_LAYER)
         self.render()
 
-    def show_boarding(self, person: sprites.PersonSprite,
-                      elevator: sprites.ElevatorSprite) -> None:
+    def show_boarding(self, person: Person, elevator: Elevator) -> None:
         """Show boarding of the given person onto the given elevator.
 
         Precondition: the given person is on the same floor as the elevator.
         """
+        self.show_boarding_batch([(person, elevator)])
+
+    def show_disembarking(self, person: Person, elevator: Elevator) -> None:
+        """Show disembarking of the given person from the given elevator."""
+        self.show_disembarking_batch([(person, elevator)])
+
+    def show_boarding_batch(self,
+                            boarding: List[Tuple[Person, Elevator]]) -> None:
+        """Show each (person, elevator) pair in <boarding>: the person
+        boarding the elevator. All of them move at once.
+
+        Precondition: each person is on the same floor as their elevator.
+        """
         if not self._visualize:
             return
 
-        from_x = 10
-        target_x = elevator.rect.centerx + random.randint(-3, 3)
+        moves = [(self._person_sprite(person), 10,
+                  elevator.sprite.rect.centerx + random.randint(-3, 3))
+                 for person, elevator in boarding]
+        self._animate(moves)
 
-        for frame in range(21):  # Move in 20 seconds
-            person.rect.centerx = from_x + (target_x - from_x) * frame // 20
-            self.render()
-
-        elevator.update()
+        for _, elevator in boarding:
+            elevator.sprite.update()
         self.render()
 
-    def show_disembarking(self, person: sprites.PersonSprite,
-                          elevator: sprites.ElevatorSprite) -> None:
-        """Show disembarking of the given person from the given elevator."""
+    def show_disembarking_batch(
+            self, leaving: List[Tuple[Person, Elevator]]) -> None:
+        """Show each (person, elevator) pair in <leaving>: the person
+        leaving the elevator. All of them move at once, and are removed
+        from the screen once they have left.
+        """
         if not self._visualize:
             return
 
-        from_x = person.rect.centerx
-        target_x = WIDTH - 10
+        for _, elevator in leaving:
+            elevator.sprite.update()
+
+        moves = []
+        for person, _ in leaving:
+            sprite = self._person_sprite(person)
+            moves.append((sprite, sprite.rect.centerx, WIDTH - 10))
+        self._animate(moves)
 
-        elevator.update()
+        self._sprite_group.remove([sprite for sprite, _, _ in moves])
+        self.render()
 
-        for frame in range(21):  # Move in 20 seconds
-            x = from_x + (target_x - from_x) * frame // 20
-            person.rect.centerx = x
+    def _animate(self, moves: List[Tuple[sprites.PersonSprite, int,
+                                         int]]) -> None:
+        """Move each sprite in <moves> from its start x to its target x
+        together, given as (sprite, start x, target x) triples.
+        """
+        for frame in range(ANIMATION_FRAMES + 1):
+            for sprite, from_x, target_x in moves:
+                sprite.rect.centerx = \
+                    from_x + (target_x - from_x) * frame // ANIMATION_FRAMES
+                sprite.dirty = 1
             self.render()
 
     def show_elevator_moves(self,
-                            elevators: List['Elevator'],
+                            elevators: List[Elevator],
                             directions: List[Direction]) -> None:
         """Show elevator moves. Note that all the elevators move at once."""
         if not self._visualize:
             return
 
-        for _ in range(20):  # Move in 20 seconds
+        for _ in range(ANIMATION_FRAMES):
             for elevator, direction in zip(elevators, directions):
                 if direction == Direction.UP:
-                    step = - FLOOR_HEIGHT / 20
+                    step = - FLOOR_HEIGHT / ANIMATION_FRAMES
                 elif direction == Direction.DOWN:
-                    step = FLOOR_HEIGHT / 20
+                    step = FLOOR_HEIGHT / ANIMATION_FRAMES
                 else:
-                    step = 0
-                elevator.rect.bottom += step
+                    continue
+                elevator.sprite.rect.bottom += step
+                elevator.sprite.dirty = 1
                 for passenger in elevator.passengers:
-                    passenger.rect.bottom += step
+                    sprite = self._person_sprite(passenger)
+                    sprite.rect.bottom += step
+                    sprite.dirty = 1
 
             self.render()
 
@@ -192,7 +243,17 @@ class Visualizer:
         if self._visualize:
             time.sleep(wait_time)
 
-    def _setup_sprites(self, elevators: List[sprites.ElevatorSprite]) -> None:
+    def _person_sprite(self, person: Person) -> sprites.PersonSprite:
+        """Return the sprite for the given person, attaching one if needed.
+
+        Sprites are only created once a person is actually drawn, so
+        simulations that never visualize a person never pay for one.
+        """
+        if person.sprite is None:
+            person.sprite = sprites.PersonSprite(person)
+        return person.sprite
+
+    def _setup_sprites(self, elevators: List[Elevator]) -> None:
         """Set up the initial sprites for this visualization.
 
         Position them on the screen and spaces them based on:
@@ -203,20 +264,24 @@ class Visualizer:
             y = self.get_y_of_floor(i)
             floor = sprites.FloorSprite(WIDTH, FLOOR_HEIGHT, y)
             floor_num = sprites.FloorNum(y - 20, str(i))
-            self._sprite_group.add(floor_num)
-            self._sprite_group.add(floor)
+            self._sprite_group.add(floor_num, layer=FLOOR_LAYER)
+            self._sprite_group.add(floor, layer=FLOOR_LAYER)
 
         for i, elevator in enumerate(elevators):
-            elevator.rect.centerx =\
+            if elevator.sprite is None:
+                elevator.sprite = sprites.ElevatorSprite(elevator)
+            sprite = elevator.sprite
+            sprite.rect.centerx =\
                 (i + 1) * WIDTH // (self._num_elevators + 1)
-            elevator.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
+            sprite.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
 
-            self._sprite_group.add(elevator)
+            self._sprite_group.add(sprite, layer=ELEVATOR_LAYER)
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['random', 'pygame', 'time', 'algorithms'],
+        'extra-imports': ['random', 'pygame', 'time', 'algorithms',
+                          'entities'],
         'generated-members': 'pygame.*'
     })